@@ -0,0 +1,204 @@
+"""
+Actualizaciones incrementales de un archivo de empleados
+Las altas, reemplazos y bajas no reescriben el .bin: se agregan al final de
+un archivo de cambios (filename + '.delta'). lector_con_busqueda lo carga
+como memtable ordenada y lo mezcla con el .bin en las búsquedas y rangos.
+compactar() incorpora los cambios en un .bin nuevo y lo reemplaza de forma
+atómica.
+Quien agrega cambios y compactar() se coordinan con un bloqueo exclusivo
+(fcntl.flock) sobre filename + '.delta.lock'.
+"""
+
+import math
+import os
+import struct
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
+import generador_ordenado as generador
+import lector_con_busqueda as lector
+
+
+def _a_registro_generador(reg: dict) -> dict:
+    """Adapta un registro del lector (fecha_nacimiento) al formato del generador (fecha_ordinal)"""
+    fecha_ordinal = reg.get('fecha_ordinal')
+    if fecha_ordinal is None:
+        fecha_ordinal = reg['fecha_nacimiento'].toordinal()
+    return {
+        'nombre': reg['nombre'],
+        'edad': reg['edad'],
+        'fecha_ordinal': fecha_ordinal,
+        'provincia': reg['provincia'],
+        'canton': reg['canton'],
+        'distrito': reg['distrito'],
+        'num_empleado': reg['num_empleado']
+    }
+
+
+BLOQUEO_EXTENSION = ".lock"  # se agrega a la ruta del .delta
+
+
+@contextmanager
+def bloquear_cambios(filename: str):
+    """
+    Bloqueo exclusivo del archivo de cambios de un .bin, compartido por
+    todos los procesos que lo modifican. Sin fcntl (Windows) no bloquea.
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(filename + lector.DELTA_EXTENSION + BLOQUEO_EXTENSION, "ab") as bloqueo:
+        fcntl.flock(bloqueo.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(bloqueo.fileno(), fcntl.LOCK_UN)
+
+
+def aplicar_cambios(filename: str, altas=(), bajas=()):
+    """
+    Agrega al archivo de cambios las altas (registros nuevos o que reemplazan
+    a uno con el mismo num_empleado) y las bajas (números de empleado), en
+    una sola escritura sincronizada con el disco.
+    Los registros pueden venir del lector (fecha_nacimiento) o del generador
+    (fecha_ordinal).
+    """
+    formato = lector.leer_disposicion_archivo(filename)['formato']
+
+    operaciones = bytearray()
+    for reg in altas:
+        reg = _a_registro_generador(reg)
+        try:
+            if formato == 2:
+                generador.empaquetar_registro(reg, 2)  # la ubicación debe estar en el diccionario
+            operaciones += lector.OP_INSERTAR + generador.empaquetar_registro(reg)
+        except struct.error as e:
+            raise ValueError(f"Registro inválido para el empleado {reg['num_empleado']}: {e}")
+    for num_empleado in bajas:
+        if not 0 <= num_empleado <= generador.CLAVE_MAX_PERMITIDA:
+            raise ValueError(f"Número de empleado inválido: {num_empleado}.")
+        operaciones += lector.OP_ELIMINAR + lector.KEY_STRUCT.pack(num_empleado)
+    if not operaciones:
+        return
+
+    # Con el bloqueo, compactar() nunca ve una operación a medias ni se
+    # escribe sobre un .delta que está por reemplazar o borrar
+    with bloquear_cambios(filename), open(filename + lector.DELTA_EXTENSION, "ab") as f:
+        if f.tell() == 0:
+            f.write(lector.DELTA_HEADER_STRUCT.pack(lector.DELTA_MAGIC, lector.DELTA_VERSION))
+        f.write(operaciones)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def insertar(filename: str, registro: dict):
+    """Da de alta (o reemplaza) un registro"""
+    aplicar_cambios(filename, altas=(registro,))
+
+
+def eliminar(filename: str, num_empleado: int):
+    """Da de baja el registro de un número de empleado"""
+    aplicar_cambios(filename, bajas=(num_empleado,))
+
+
+def _indices_existentes(filename: str) -> dict:
+    """Parámetros de guardar_indices para volver a generar los índices que ya tenía el .bin"""
+    parametros = {}
+    try:
+        with open(filename + generador.IDX_EXTENSION, "rb") as f:
+            parametros['indice_cada'] = generador.IDX_HEADER_STRUCT.unpack(
+                f.read(generador.IDX_HEADER_STRUCT.size))[2]
+    except (OSError, struct.error):
+        pass
+    parametros['indice_ubicacion'] = os.path.exists(filename + generador.UBI_EXTENSION)
+    parametros['indice_posiciones'] = os.path.exists(filename + generador.POS_EXTENSION)
+    try:
+        with open(filename + generador.BLM_EXTENSION, "rb") as f:
+            _, _, bits, _, n, _, _ = generador.BLM_HEADER_STRUCT.unpack(f.read(generador.BLM_HEADER_STRUCT.size))
+        # Tasa de falsos positivos con la que se dimensionó el filtro
+        tasa = math.exp(-bits / max(n, 1) * math.log(2) ** 2)
+        parametros['filtro_bloom'] = min(max(tasa, 1e-9), 0.5)
+    except (OSError, struct.error):
+        pass
+    return parametros
+
+
+def compactar(filename: str) -> int:
+    """
+    Mezcla el .bin con sus cambios pendientes en un .bin nuevo (mismo formato),
+    lo reemplaza de forma atómica y vuelve a generar los índices auxiliares
+    (y la cola de agregados) que existían.
+    El bloqueo de cambios se toma solo al principio (para leer el .delta
+    completo) y al final (para quitar lo ya compactado): las altas y bajas
+    de otros procesos que usen aplicar_cambios/insertar/eliminar pueden
+    seguir durante la mezcla y quedan en el .delta. Las que escriban el
+    .delta sin el bloqueo (o en Windows, sin fcntl) no están protegidas.
+    Retorna la cantidad de registros del nuevo .bin.
+    """
+    ruta_delta = filename + lector.DELTA_EXTENSION
+    indices = _indices_existentes(filename)
+    directorio = os.path.dirname(os.path.abspath(filename))
+
+    with bloquear_cambios(filename):
+        try:
+            compactado = os.path.getsize(ruta_delta)
+        except FileNotFoundError:
+            return lector.leer_cabecera(filename)  # nada que compactar
+        # La sesión carga el .delta ahora, con exactamente 'compactado' bytes
+        base = lector.ArchivoEmpleados(filename, usar_indice=False)
+
+    fd, temporal = tempfile.mkstemp(suffix=".tmp", dir=directorio)
+    try:
+        with os.fdopen(fd, "wb") as f, base:
+            formato = base.formato
+            agregados = base.tamano_agregados > 0  # la cola se vuelve a calcular con los cambios
+            generador.escribir_cabecera(f, 0, formato)  # la cantidad se corrige al final
+            with generador.EscritorRegistros(f, formato=formato, agregados=agregados) as escritor:
+                escritor.agregar_todos(_a_registro_generador(reg) for reg in
+                                       base.rango_por_empleado(0, generador.CLAVE_MAX_PERMITIDA))
+                if agregados:
+                    escritor.escribir_agregados()
+            f.seek(0)
+            generador.escribir_cabecera(f, escritor.cantidad, formato)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporal, filename)
+    except BaseException:
+        base.cerrar()
+        os.remove(temporal)
+        raise
+
+    # Conservar solo las operaciones agregadas después de empezar
+    with bloquear_cambios(filename):
+        with open(ruta_delta, "rb") as f:
+            f.seek(compactado)
+            resto = f.read()
+        if resto:
+            fd, temporal = tempfile.mkstemp(suffix=".tmp", dir=directorio)
+            with os.fdopen(fd, "wb") as f:
+                f.write(lector.DELTA_HEADER_STRUCT.pack(lector.DELTA_MAGIC, lector.DELTA_VERSION))
+                f.write(resto)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporal, ruta_delta)
+        else:
+            os.remove(ruta_delta)
+
+    generador.guardar_indices(filename, **indices)  # también descarta lo cargado en memoria
+    return escritor.cantidad
+
+if __name__ == "__main__":
+    print("=== COMPACTAR ARCHIVO DE EMPLEADOS ===")
+    archivo = input("Archivo .bin a compactar: ").strip()
+    try:
+        total = compactar(archivo)
+        print(f"¡OK! '{archivo}' compactado con {total} registros.")
+    except FileNotFoundError:
+        print(f"Error: El archivo '{archivo}' no existe.")
+    except Exception as e:
+        print(f"Error al compactar: {e}")
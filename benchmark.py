@@ -0,0 +1,234 @@
+"""
+Banco de pruebas de rendimiento
+Genera archivos con generador_ordenado de distintos tamaños y mide:
+velocidad de generación, latencia de leer_por_posicion y buscar_por_empleado
+(p50/p95/p99 con la caché de páginas fría y caliente), velocidad de recorrido
+(MB/s) y memoria máxima del proceso. Guarda los resultados en JSON y puede
+compararlos con una corrida anterior para marcar regresiones.
+
+Uso: python benchmark.py --tamanos 1000 100000 --salida actual.json --base anterior.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows: sin memoria máxima
+    resource = None
+
+import generador_ordenado as generador
+import lector_con_busqueda as lector
+
+TAMANOS = (10**3, 10**4, 10**5, 10**6)   # 10**7 se puede pedir con --tamanos
+MUESTRAS_CALIENTE = 2000
+MUESTRAS_FRIO = 200
+TOLERANCIA = 0.10                         # 10% peor que la base = regresión
+SEMILLA = 12345
+FORMATO_RESULTADOS = 1
+
+
+def percentiles(tiempos: list) -> dict:
+    """
+    p50, p95 y p99 (en microsegundos) de una lista de tiempos en segundos.
+    Lanza ValueError si la lista está vacía.
+    """
+    if not tiempos:
+        raise ValueError("No hay tiempos para calcular percentiles (cero muestras).")
+    ordenados = sorted(tiempos)
+    resultado = {}
+    for p in (50, 95, 99):
+        indice = min(len(ordenados) - 1, max(0, round(p / 100 * len(ordenados)) - 1))
+        resultado[f"p{p}_us"] = round(ordenados[indice] * 1e6, 2)
+    return resultado
+
+
+def vaciar_cache_paginas(filename: str) -> bool:
+    """
+    Pide al sistema que descarte de la caché de páginas el archivo y sus
+    índices, y vacía la caché de bloques del lector. Retorna False si el
+    sistema no lo permite (la medición en frío no está disponible).
+    """
+    lector.CACHE_COMPARTIDA.invalidar()
+    if not hasattr(os, "posix_fadvise"):
+        return False
+    for ruta in [filename] + [filename + ext for ext in (lector.IDX_EXTENSION, lector.POS_EXTENSION,
+                                                         lector.BLM_EXTENSION)]:
+        try:
+            fd = os.open(ruta, os.O_RDONLY)
+        except FileNotFoundError:
+            continue
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+    return True
+
+
+def medir_latencias(filename: str, funcion, argumentos: list, muestras_frio: int) -> dict:
+    """Latencias de funcion(filename, argumento) con la caché caliente y fría"""
+    for argumento in argumentos[:100]:  # calentar
+        funcion(filename, argumento)
+    tiempos = []
+    for argumento in argumentos:
+        inicio = time.perf_counter()
+        funcion(filename, argumento)
+        tiempos.append(time.perf_counter() - inicio)
+    resultado = {'caliente': percentiles(tiempos)}
+
+    tiempos = []
+    for argumento in argumentos[:muestras_frio]:
+        if not vaciar_cache_paginas(filename):
+            break
+        inicio = time.perf_counter()
+        funcion(filename, argumento)
+        tiempos.append(time.perf_counter() - inicio)
+    resultado['frio'] = percentiles(tiempos) if tiempos else None
+    return resultado
+
+
+def memoria_maxima_kb() -> int or None:
+    """Memoria residente máxima (RSS) del proceso en KiB, o None si no se puede medir"""
+    if resource is None:
+        return None
+    maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maximo // 1024 if sys.platform == "darwin" else maximo  # macOS la da en bytes
+
+
+def medir_tamano(n: int, directorio: str, muestras: int, muestras_frio: int, formato: int) -> dict:
+    """Todas las mediciones para un archivo de n registros"""
+    filename = os.path.join(directorio, f"bench_{n}.bin")
+    rng = random.Random(SEMILLA)
+
+    inicio = time.perf_counter()
+    generador.generar_archivo_por_lotes(filename, n, rng, clave_max=max(generador.CLAVE_MAX, 2 * n),
+                                        formato=formato)
+    segundos = time.perf_counter() - inicio
+    resultado = {
+        'generacion': {'segundos': round(segundos, 3), 'registros_por_s': round(n / segundos)},
+        'tamano_bytes': os.path.getsize(filename),
+    }
+
+    posiciones = [rng.randint(1, n) for _ in range(muestras)]
+    with lector.ArchivoEmpleados(filename) as datos:
+        claves = [datos.leer_por_posicion(pos)['num_empleado'] for pos in posiciones]
+    resultado['leer_por_posicion'] = medir_latencias(filename, lector.leer_por_posicion,
+                                                     posiciones, muestras_frio)
+    resultado['buscar_por_empleado'] = medir_latencias(filename, lector.buscar_por_empleado,
+                                                       claves, muestras_frio)
+
+    vaciar_cache_paginas(filename)
+    inicio = time.perf_counter()
+    for _ in lector.iterar_registros(filename):
+        pass
+    segundos = time.perf_counter() - inicio
+    resultado['recorrido'] = {'segundos': round(segundos, 3),
+                              'mb_por_s': round(resultado['tamano_bytes'] / segundos / 2**20, 2)}
+    resultado['rss_max_kb'] = memoria_maxima_kb()
+
+    os.remove(filename)
+    return resultado
+
+
+def _aplanar(datos: dict, prefijo: str = "") -> dict:
+    """{'a': {'b': 1}} -> {'a.b': 1}, solo valores numéricos"""
+    plano = {}
+    for clave, valor in datos.items():
+        ruta = f"{prefijo}{clave}"
+        if isinstance(valor, dict):
+            plano.update(_aplanar(valor, ruta + "."))
+        elif isinstance(valor, (int, float)) and not isinstance(valor, bool):
+            plano[ruta] = valor
+    return plano
+
+
+def comparar(actual: dict, base: dict, tolerancia: float = TOLERANCIA) -> list:
+    """
+    Compara dos corridas y retorna las regresiones como (métrica, base,
+    actual, cambio relativo). Se comparan las velocidades ('_por_s', más es
+    mejor), las latencias ('_us') y la memoria ('_kb'), donde menos es mejor.
+    """
+    regresiones = []
+    plano_base = _aplanar(base.get('resultados', {}))
+    for metrica, valor in sorted(_aplanar(actual.get('resultados', {})).items()):
+        anterior = plano_base.get(metrica)
+        if anterior is None or anterior == 0 or not metrica.endswith(("_por_s", "_us", "_kb")):
+            continue
+        cambio = (valor - anterior) / anterior
+        peor = -cambio if metrica.endswith("_por_s") else cambio
+        if peor > tolerancia:
+            regresiones.append((metrica, anterior, valor, cambio))
+    return regresiones
+
+
+def ejecutar(tamanos, muestras: int = MUESTRAS_CALIENTE, muestras_frio: int = MUESTRAS_FRIO,
+             formato: int = 1) -> dict:
+    """Corre el banco de pruebas completo y retorna los resultados"""
+    if muestras < 1:
+        raise ValueError("La cantidad de muestras debe ser al menos 1.")
+    resultados = {}
+    with tempfile.TemporaryDirectory(prefix="bench_") as directorio:
+        for n in tamanos:
+            print(f"Midiendo {n} registros...", file=sys.stderr)
+            resultados[str(n)] = medir_tamano(n, directorio, muestras, muestras_frio, formato)
+    return {
+        'version': FORMATO_RESULTADOS,
+        'fecha': datetime.now().isoformat(timespec="seconds"),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'formato_archivo': formato,
+        'resultados': resultados,
+    }
+
+
+def main():
+    """Punto de entrada del banco de pruebas"""
+    parser = argparse.ArgumentParser(description="Banco de pruebas de generación y búsqueda")
+    parser.add_argument("--tamanos", type=int, nargs="+", default=list(TAMANOS),
+                        help="cantidades de registros a medir")
+    parser.add_argument("--muestras", type=int, default=MUESTRAS_CALIENTE,
+                        help="búsquedas/lecturas por medición con la caché caliente")
+    parser.add_argument("--muestras-frio", type=int, default=MUESTRAS_FRIO,
+                        help="búsquedas/lecturas por medición con la caché fría")
+    parser.add_argument("--formato", type=int, choices=generador.FORMATOS, default=1,
+                        help="formato de los archivos generados")
+    parser.add_argument("--salida", help="archivo JSON donde guardar los resultados")
+    parser.add_argument("--base", help="resultados JSON anteriores para detectar regresiones")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA,
+                        help="empeoramiento relativo permitido (0.10 = 10%%)")
+    args = parser.parse_args()
+    if args.muestras < 1:
+        parser.error("--muestras debe ser al menos 1")
+
+    actual = ejecutar(args.tamanos, args.muestras, args.muestras_frio, args.formato)
+    texto = json.dumps(actual, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(texto + "\n")
+        print(f"Resultados guardados en '{args.salida}'")
+    else:
+        print(texto)
+
+    if args.base:
+        with open(args.base, encoding="utf-8") as f:
+            base = json.load(f)
+        regresiones = comparar(actual, base, args.tolerancia)
+        if not regresiones:
+            print(f"Sin regresiones respecto a '{args.base}'.")
+            return 0
+        print(f"\n⚠️  {len(regresiones)} regresiones respecto a '{args.base}':")
+        for metrica, anterior, valor, cambio in regresiones:
+            print(f"  {metrica}: {anterior} -> {valor} ({cambio:+.1%})")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""
+Cliente del servidor local de búsquedas (servidor.py)
+ClienteEmpleados tiene la misma interfaz que lector_con_busqueda.ArchivoEmpleados
+(leer_por_posicion, buscar_por_empleado, rango_por_empleado,
+obtener_info_archivo), así que puede reemplazarlo sin cambiar el código que
+lo usa. La dirección es la ruta de un socket Unix ("unix:/tmp/emp.sock" o
+cualquier ruta con '/') o "host:puerto" / "puerto" para TCP.
+"""
+
+import json
+import socket
+from datetime import date
+
+import servidor
+
+
+def conectar(direccion: str) -> socket.socket:
+    """Abre la conexión con el servidor según la dirección"""
+    if direccion.startswith("unix:") or "/" in direccion:
+        conexion = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        conexion.connect(direccion[len("unix:"):] if direccion.startswith("unix:") else direccion)
+        return conexion
+    host, _, puerto = direccion.rpartition(":")
+    return socket.create_connection((host or servidor.HOST, int(puerto)))
+
+
+def _desde_json(registro: dict or None) -> dict or None:
+    """Registro recibido con la fecha como date (igual que el lector)"""
+    if registro is not None:
+        registro['fecha_nacimiento'] = date.fromisoformat(registro['fecha_nacimiento'])
+    return registro
+
+
+class ClienteEmpleados:
+    """Sesión remota sobre un archivo servido por servidor.py"""
+
+    def __init__(self, direccion: str, filename: str):
+        self.filename = filename
+        self._conexion = conectar(direccion)
+        self._entrada = self._conexion.makefile("rb")
+        self._siguiente_id = 0
+        self.ultimos_sondeos = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.cerrar()
+
+    def cerrar(self):
+        """Cierra la conexión"""
+        self._entrada.close()
+        self._conexion.close()
+
+    def _enviar(self, op: str, **argumentos) -> int:
+        self._siguiente_id += 1
+        pedido = dict(argumentos, id=self._siguiente_id, op=op, archivo=self.filename)
+        cuerpo = json.dumps(pedido, ensure_ascii=False).encode("utf-8")
+        self._conexion.sendall(servidor.LARGO_STRUCT.pack(len(cuerpo)) + cuerpo)
+        return self._siguiente_id
+
+    def _recibir(self) -> dict:
+        cabecera = self._entrada.read(servidor.LARGO_STRUCT.size)
+        if len(cabecera) < servidor.LARGO_STRUCT.size:
+            raise ConnectionError("El servidor cerró la conexión.")
+        (largo,) = servidor.LARGO_STRUCT.unpack(cabecera)
+        return json.loads(self._entrada.read(largo))
+
+    def _pedir_varios(self, op: str, pedidos: list) -> list:
+        """
+        Envía todos los pedidos sin esperar (el servidor los agrupa) y
+        retorna los resultados en el mismo orden
+        """
+        ids = [self._enviar(op, **argumentos) for argumentos in pedidos]
+        respuestas = {}
+        while len(respuestas) < len(ids):
+            respuesta = self._recibir()
+            respuestas[respuesta['id']] = respuesta
+        resultados = []
+        for id_pedido in ids:
+            respuesta = respuestas[id_pedido]
+            if not respuesta['ok']:
+                raise ValueError(respuesta['error'])
+            resultados.append(respuesta['resultado'])
+        return resultados
+
+    def _pedir(self, op: str, **argumentos):
+        return self._pedir_varios(op, [argumentos])[0]
+
+    def leer_por_posicion(self, posicion: int) -> dict:
+        """Lee el registro en la posición dada (1-based)"""
+        return _desde_json(self._pedir("leer", posicion=posicion))
+
+    def buscar_por_empleado(self, num_empleado: int, traza=None, estrategia: str = "auto") -> dict or None:
+        """
+        Busca un empleado en el servidor. La estrategia la elige el servidor
+        y 'traza' no se usa (los sondeos ocurren en el otro proceso); la
+        cantidad de sondeos queda en ultimos_sondeos (None si la búsqueda se
+        resolvió en un lote).
+        """
+        resultado = self._pedir("buscar", num_empleado=num_empleado)
+        self.ultimos_sondeos = resultado['sondeos']
+        return _desde_json(resultado['registro'])
+
+    def buscar_muchos_por_empleado(self, claves) -> dict:
+        """Busca muchas claves en un solo viaje; retorna {clave: registro o None}"""
+        claves = list(dict.fromkeys(claves))
+        resultados = self._pedir_varios("buscar", [{'num_empleado': clave} for clave in claves])
+        return {clave: _desde_json(resultado['registro']) for clave, resultado in zip(claves, resultados)}
+
+    def rango_por_empleado(self, desde: int, hasta: int):
+        """Registros con num_empleado entre desde y hasta (pedidos por páginas de servidor.MAX_RANGO)"""
+        while desde <= hasta:
+            registros = self._pedir("rango", desde=desde, hasta=hasta, limite=servidor.MAX_RANGO)
+            for registro in registros:
+                yield _desde_json(registro)
+            if len(registros) < servidor.MAX_RANGO:
+                return
+            desde = registros[-1]['num_empleado'] + 1
+
+    def obtener_info_archivo(self) -> dict:
+        """Información del archivo servido"""
+        return self._pedir("info")
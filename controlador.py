@@ -6,15 +6,51 @@ Controlador principal para el Sistema de Gestión de Empleados
 Tarea Programada 1 - Estructuras de Datos
 """
 
+import argparse
+import json
 import os
+import random
 import sys
+import time
+import cliente_empleados
 import generador_ordenado as generador
+import ingesta
 import lector_con_busqueda as lector
+import metricas
+import migracion
+from servidor import registro_a_json, valor_entero
+
+# Dirección de servidor.py; si está definida, las lecturas y búsquedas se le piden a él
+VARIABLE_SERVIDOR = "EMPLEADOS_SERVIDOR"
+# Si está definida (y no es "0"), el menú interactivo mide búsquedas, lecturas y generación
+VARIABLE_METRICAS = "EMPLEADOS_METRICAS"
+
+
+def abrir_archivo(archivo: str, servidor: str = None):
+    """
+    Sesión sobre el archivo (.bin o manifiesto de un conjunto particionado):
+    local (lector_con_busqueda, mmap propio) o, si hay dirección de
+    servidor (parámetro o variable EMPLEADOS_SERVIDOR), remota por medio de
+    cliente_empleados. Todas tienen la misma interfaz.
+    """
+    servidor = servidor or os.environ.get(VARIABLE_SERVIDOR)
+    if servidor:
+        return cliente_empleados.ClienteEmpleados(servidor, archivo)
+    return lector.abrir_sesion(archivo)
+
+
+def tamano_en_disco(archivo: str, info: dict) -> int:
+    """Bytes que ocupa el archivo (o la suma de las particiones de un conjunto)"""
+    return sum(os.path.getsize(ruta) for ruta in info.get('archivos', [archivo]))
 
 
 def limpiar_pantalla():
     """Limpia la pantalla según el sistema operativo"""
-    os.system('cls' if os.name == 'nt' else 'clear')
+    if os.name == 'nt':
+        os.system('cls')
+    else:
+        # Secuencia ANSI: cursor al inicio y borrar pantalla (sin lanzar un proceso)
+        print("\033[H\033[2J", end="", flush=True)
 
 
 def pausar():
@@ -65,12 +101,13 @@ def opcion_leer_por_posicion():
         return
     
     try:
-        # Mostrar información del archivo
-        info = lector.obtener_info_archivo(archivo)
-        print(f"El archivo contiene {info['num_registros']} registros.")
-        
-        pos = int(input("Posición del registro a leer (1-based): "))
-        registro = lector.leer_por_posicion(archivo, pos)
+        # Una sola apertura del archivo para la información y la lectura
+        with abrir_archivo(archivo) as datos:
+            info = datos.obtener_info_archivo()
+            print(f"El archivo contiene {info['num_registros']} registros.")
+            
+            pos = int(input("Posición del registro a leer (1-based): "))
+            registro = datos.leer_por_posicion(pos)
         
         # Mostrar el registro
         print("\n" + "="*50)
@@ -105,14 +142,16 @@ def opcion_buscar_por_empleado():
         return
     
     try:
-        # Mostrar información del archivo
-        info = lector.obtener_info_archivo(archivo)
-        print(f"Buscando en {info['num_registros']} registros...")
-        
-        num_empleado = int(input("Número de empleado a buscar: "))
-        
-        print("\nRealizando búsqueda binaria...")
-        registro = lector.buscar_por_empleado(archivo, num_empleado)
+        # Una sola apertura del archivo para la información y la búsqueda
+        with abrir_archivo(archivo) as datos:
+            info = datos.obtener_info_archivo()
+            print(f"Buscando en {info['num_registros']} registros...")
+            
+            num_empleado = int(input("Número de empleado a buscar: "))
+            
+            print("\nRealizando búsqueda binaria...")
+            registro = datos.buscar_por_empleado(num_empleado, traza=lector.mostrar_comparacion)
+            print(f"Comparaciones realizadas: {datos.ultimos_sondeos}")
         
         if registro:
             print("\n" + "="*50)
@@ -151,16 +190,24 @@ def opcion_info_archivo():
     
     try:
         info = lector.obtener_info_archivo(archivo)
-        tamano_real = os.path.getsize(archivo)
+        tamano_real = tamano_en_disco(archivo, info)
         
         print(f"\nInformación del archivo: {archivo}")
         print("-" * 30)
         print(f"Número de registros: {info['num_registros']}")
         print(f"Tamaño del registro: {info['tamano_registro']} bytes")
-        print(f"Tamaño de cabecera: {lector.COUNT_STRUCT.size} bytes")
+        print(f"Formato: v{info['formato']}")
+        if 'particiones' in info:
+            print(f"Particiones: {info['particiones']}")
+        print(f"Tamaño de cabecera: {info['tamano_cabecera']} bytes")
         print(f"Tamaño total (calculado): {info['tamano_total']} bytes")
         print(f"Tamaño real en disco: {tamano_real} bytes")
         print(f"Rango de posiciones: 1 - {info['num_registros']}")
+        print(f"Índice de bloques (.idx): {'sí' if info['indice_bloques'] else 'no'}")
+        print(f"Tabla de posiciones (.pos): {'sí' if info['tabla_posiciones'] else 'no'}")
+        print(f"Filtro de Bloom (.blm): {'sí' if info['filtro_bloom'] else 'no'}")
+        print(f"Estadísticas precalculadas: {'sí' if info['agregados'] else 'no'}")
+        print(f"Cambios pendientes (.delta): {info['cambios_pendientes']}")
         
         # Verificar integridad básica
         if tamano_real == info['tamano_total']:
@@ -171,11 +218,22 @@ def opcion_info_archivo():
     except Exception as e:
         print(f"Error al leer información: {e}")
     
+    # Resumen de lo medido en esta sesión (búsquedas, lecturas, generación)
+    print("\n--- MÉTRICAS DE LA SESIÓN ---")
+    if metricas.activas:
+        print(metricas.formatear_resumen())
+        cache = lector.estadisticas_cache()
+        print(f"  caché de bloques: {cache['aciertos']} aciertos, {cache['fallos']} fallos")
+    else:
+        print(f"  Desactivadas. Defina {VARIABLE_METRICAS}=1 antes de iniciar para medir la sesión.")
+    
     pausar()
 
 
-def main():
-    """Función principal del controlador"""
+def menu_interactivo():
+    """Menú interactivo del controlador"""
+    if os.environ.get(VARIABLE_METRICAS, "0") != "0":
+        metricas.activar()
     while True:
         limpiar_pantalla()
         mostrar_banner()
@@ -197,9 +255,308 @@ def main():
             pausar()
 
 
+# --------- Modo por lotes (línea de comandos) ----------
+
+def leer_consultas(entrada, campos: tuple):
+    """
+    Produce (línea, valores) por cada consulta no vacía de 'entrada'.
+    Cada línea puede ser JSON ({"campo": valor, ...}) o los valores
+    separados por espacios, en el orden de 'campos'.
+    """
+    for linea in entrada:
+        linea = linea.strip()
+        if not linea:
+            continue
+        try:
+            if linea.startswith("{"):
+                datos = json.loads(linea)
+                valores = tuple(valor_entero(datos[campo], campo) for campo in campos)
+            else:
+                partes = linea.split()
+                if len(partes) != len(campos):
+                    raise ValueError(f"se esperaban {len(campos)} valores ({', '.join(campos)})")
+                valores = tuple(valor_entero(parte, campo) for parte, campo in zip(partes, campos))
+        except (ValueError, KeyError, TypeError) as e:
+            yield linea, ValueError(f"Consulta inválida ({e}).")
+            continue
+        yield linea, valores
+
+
+def _escribir_json(salida, datos: dict):
+    salida.write(json.dumps(datos, ensure_ascii=False) + "\n")
+
+
+def indices_de(args) -> dict:
+    """Parámetros de guardar_indices según las opciones de la línea de comandos"""
+    return {'indice_cada': args.indice_cada, 'indice_ubicacion': args.ubicacion,
+            'indice_posiciones': args.posiciones, 'filtro_bloom': args.bloom}
+
+
+def comando_generar(args, entrada, salida) -> int:
+    """Genera un archivo sin preguntas (por lotes, en paralelo o como conjunto particionado)"""
+    semilla = args.semilla if args.semilla is not None else int(time.time())
+    indices = indices_de(args)
+    inicio = time.perf_counter()
+    if args.particiones:
+        generador.generar_conjunto_particionado(args.archivo, args.cantidad, semilla, args.particiones,
+                                                args.procesos, clave_max=args.clave_max, formato=args.formato,
+                                                agregados=args.agregados, **indices)
+    elif args.procesos > 1:
+        generador.generar_archivo_paralelo(args.archivo, args.cantidad, semilla, args.procesos,
+                                           clave_max=args.clave_max, formato=args.formato,
+                                           agregados=args.agregados, **indices)
+    else:
+        generador.generar_archivo_por_lotes(args.archivo, args.cantidad, random.Random(semilla),
+                                            clave_max=args.clave_max, formato=args.formato,
+                                            agregados=args.agregados, **indices)
+    _escribir_json(salida, {'archivo': args.archivo, 'num_registros': args.cantidad, 'semilla': semilla,
+                            'formato': args.formato, 'segundos': round(time.perf_counter() - inicio, 3)})
+    return 0
+
+
+def comando_ingerir(args, entrada, salida) -> int:
+    """
+    Carga un CSV o JSONL en un .bin ordenado y escribe el reporte como una
+    línea JSON; retorna 1 si alguna fila se rechazó o estaba repetida
+    """
+    reporte = ingesta.ingerir(args.origen, args.archivo, formato=args.formato, tipo=args.tipo,
+                              registros_por_lote=args.por_lote, estricto=args.estricto,
+                              codificacion=args.codificacion, delimitador=args.delimitador,
+                              agregados=args.agregados, **indices_de(args))
+    reporte = dict({'origen': args.origen, 'archivo': args.archivo}, **reporte)
+    _escribir_json(salida, reporte)
+    return 1 if reporte['rechazadas'] or reporte['duplicadas'] else 0
+
+
+def comando_migrar(args, entrada, salida) -> int:
+    """Convierte un archivo del formato anterior (sin num_empleado) y escribe el resultado como JSON"""
+    resultado = migracion.migrar(args.origen, args.archivo, formato=args.formato, claves=args.claves,
+                                 semilla=args.semilla, clave_min=args.clave_min, clave_max=args.clave_max,
+                                 registros_por_lote=args.por_lote, agregados=args.agregados,
+                                 **indices_de(args))
+    _escribir_json(salida, dict({'origen': args.origen, 'archivo': args.archivo}, **resultado))
+    return 0
+
+
+def comando_leer(args, entrada, salida) -> int:
+    """Lee las posiciones pedidas (una por línea) con una sola apertura del archivo"""
+    errores = 0
+    with abrir_archivo(args.archivo, args.servidor) as datos:
+        for linea, valores in leer_consultas(entrada, ("posicion",)):
+            try:
+                if isinstance(valores, Exception):
+                    raise valores
+                registro = datos.leer_por_posicion(valores[0])
+                registro['posicion'] = valores[0]
+                _escribir_json(salida, registro_a_json(registro))
+            except Exception as e:
+                errores += 1
+                _escribir_json(salida, {'consulta': linea, 'error': str(e)})
+    return 1 if errores else 0
+
+
+def comando_buscar(args, entrada, salida) -> int:
+    """Busca los números de empleado pedidos (uno por línea) con una sola apertura del archivo"""
+    errores = 0
+    with abrir_archivo(args.archivo, args.servidor) as datos:
+        for linea, valores in leer_consultas(entrada, ("num_empleado",)):
+            try:
+                if isinstance(valores, Exception):
+                    raise valores
+                registro = datos.buscar_por_empleado(valores[0], estrategia=args.estrategia)
+                _escribir_json(salida, {
+                    'num_empleado': valores[0],
+                    'encontrado': registro is not None,
+                    'sondeos': datos.ultimos_sondeos,
+                    'registro': registro_a_json(registro)
+                })
+            except Exception as e:
+                errores += 1
+                _escribir_json(salida, {'consulta': linea, 'error': str(e)})
+    return 1 if errores else 0
+
+
+def comando_rango(args, entrada, salida) -> int:
+    """
+    Escribe los registros de cada rango de números de empleado pedido
+    ('desde hasta' por línea, o --desde/--hasta) con una sola apertura
+    """
+    if args.desde is not None or args.hasta is not None:
+        consultas = [("", (args.desde or 0, generador.CLAVE_MAX_PERMITIDA if args.hasta is None else args.hasta))]
+    else:
+        consultas = leer_consultas(entrada, ("desde", "hasta"))
+    errores = 0
+    with abrir_archivo(args.archivo, args.servidor) as datos:
+        for linea, valores in consultas:
+            try:
+                if isinstance(valores, Exception):
+                    raise valores
+                for registro in datos.rango_por_empleado(*valores):
+                    _escribir_json(salida, registro_a_json(registro))
+            except Exception as e:
+                errores += 1
+                _escribir_json(salida, {'consulta': linea, 'error': str(e)})
+    return 1 if errores else 0
+
+
+def comando_info(args, entrada, salida) -> int:
+    """Una línea JSON con la información de cada archivo"""
+    errores = 0
+    for archivo in args.archivos:
+        try:
+            info = lector.obtener_info_archivo(archivo)
+            info['archivo'] = archivo
+            info['tamano_real'] = tamano_en_disco(archivo, info)
+            info['intacto'] = info['tamano_real'] == info['tamano_total']
+            _escribir_json(salida, info)
+        except Exception as e:
+            errores += 1
+            _escribir_json(salida, {'archivo': archivo, 'error': str(e)})
+    return 1 if errores else 0
+
+
+def comando_estadisticas(args, entrada, salida) -> int:
+    """Una línea JSON con los conteos por provincia, edad y año de nacimiento de cada archivo"""
+    errores = 0
+    for archivo in args.archivos:
+        try:
+            datos = lector.estadisticas(archivo)
+            datos['archivo'] = archivo
+            _escribir_json(salida, datos)
+        except Exception as e:
+            errores += 1
+            _escribir_json(salida, {'archivo': archivo, 'error': str(e)})
+    return 1 if errores else 0
+
+
+def crear_parser() -> argparse.ArgumentParser:
+    """Subcomandos del modo por lotes"""
+    parser = argparse.ArgumentParser(
+        description="Sistema de Gestión de Empleados. Sin argumentos abre el menú interactivo.")
+    subcomandos = parser.add_subparsers(dest="comando", required=True)
+
+    def con_entrada_salida(sub, entrada: bool = True):
+        if entrada:
+            sub.add_argument("--entrada", default="-", help="archivo de consultas (por defecto stdin)")
+        else:
+            sub.set_defaults(entrada="-")  # no lee consultas
+        sub.add_argument("--salida", default="-", help="archivo JSONL de resultados (por defecto stdout)")
+        return sub
+
+    def con_servidor(sub):
+        sub.add_argument("--servidor", help="dirección de servidor.py (socket Unix o host:puerto) "
+                                            f"en vez de abrir el archivo; también {VARIABLE_SERVIDOR}")
+        return sub
+
+    def con_indices(sub):
+        sub.add_argument("--indice-cada", type=int, help="escribir .idx con una entrada cada N registros")
+        sub.add_argument("--ubicacion", action="store_true", help="escribir el índice de ubicación (.ubi)")
+        sub.add_argument("--posiciones", action="store_true", help="escribir la tabla de posiciones (.pos)")
+        sub.add_argument("--bloom", type=float, help="escribir filtro de Bloom con esta tasa de falsos positivos")
+        sub.add_argument("--agregados", action="store_true", help="guardar los conteos precalculados al final del .bin")
+        return sub
+
+    sub = con_entrada_salida(subcomandos.add_parser("generar", help="generar un archivo .bin o un conjunto particionado"),
+                             entrada=False)
+    sub.add_argument("archivo")
+    sub.add_argument("-n", "--cantidad", type=int, required=True, help="cantidad de registros")
+    sub.add_argument("--semilla", type=int, help="semilla (por defecto la hora actual)")
+    sub.add_argument("--clave-max", type=int, default=generador.CLAVE_MAX, help="número de empleado máximo")
+    sub.add_argument("--formato", type=int, choices=generador.FORMATOS, default=1)
+    sub.add_argument("--procesos", type=int, default=1, help="procesos en paralelo")
+    sub.add_argument("--particiones", type=int,
+                     help=f"generar un conjunto particionado (archivo con extensión {generador.MANIFIESTO_EXTENSION})")
+    sub = con_indices(sub)
+    sub.set_defaults(funcion=comando_generar)
+
+    sub = con_entrada_salida(subcomandos.add_parser(
+        "ingerir", help="cargar un CSV o JSONL en un .bin ordenado"), entrada=False)
+    sub.add_argument("origen", help="archivo .csv o .jsonl")
+    sub.add_argument("archivo")
+    sub.add_argument("--tipo", choices=ingesta.TIPOS, help="tipo de la entrada (por defecto según la extensión)")
+    sub.add_argument("--formato", type=int, choices=generador.FORMATOS, default=1)
+    sub.add_argument("--por-lote", type=int, default=generador.REGISTROS_POR_LOTE,
+                     help="filas ordenadas en memoria por corrida")
+    sub.add_argument("--estricto", action="store_true", help="cancelar ante la primera fila rechazada o repetida")
+    sub.add_argument("--codificacion", default="utf-8-sig")
+    sub.add_argument("--delimitador", default=",", help="separador del CSV")
+    sub = con_indices(sub)
+    sub.set_defaults(funcion=comando_ingerir)
+
+    sub = con_entrada_salida(subcomandos.add_parser(
+        "migrar", help="convertir un archivo del formato anterior (sin num_empleado)"), entrada=False)
+    sub.add_argument("origen", help="archivo de generador_registros.py")
+    sub.add_argument("archivo", help="destino (puede ser el mismo origen)")
+    sub.add_argument("--claves", help="archivo con un número de empleado por línea (por defecto se generan)")
+    sub.add_argument("--semilla", type=int, help="semilla de los números generados (por defecto la hora actual)")
+    sub.add_argument("--clave-min", type=int, default=generador.CLAVE_MIN)
+    sub.add_argument("--clave-max", type=int, help="número de empleado máximo al generarlos")
+    sub.add_argument("--formato", type=int, choices=generador.FORMATOS, default=1)
+    sub.add_argument("--por-lote", type=int, default=generador.REGISTROS_POR_LOTE,
+                     help="registros ordenados en memoria por corrida (con --claves desordenadas)")
+    sub = con_indices(sub)
+    sub.set_defaults(funcion=comando_migrar)
+
+    sub = con_servidor(con_entrada_salida(subcomandos.add_parser("leer", help="leer registros por posición")))
+    sub.add_argument("archivo")
+    sub.set_defaults(funcion=comando_leer)
+
+    sub = con_servidor(con_entrada_salida(subcomandos.add_parser("buscar", help="buscar por número de empleado")))
+    sub.add_argument("archivo")
+    sub.add_argument("--estrategia", choices=("auto",) + lector.ESTRATEGIAS, default="auto")
+    sub.set_defaults(funcion=comando_buscar)
+
+    sub = con_servidor(con_entrada_salida(subcomandos.add_parser("rango", help="registros en rangos de números de empleado")))
+    sub.add_argument("archivo")
+    sub.add_argument("--desde", type=int, help="inicio del rango (sin leer consultas)")
+    sub.add_argument("--hasta", type=int, help="fin del rango (sin leer consultas)")
+    sub.set_defaults(funcion=comando_rango)
+
+    sub = con_entrada_salida(subcomandos.add_parser("info", help="información de archivos .bin"), entrada=False)
+    sub.add_argument("archivos", nargs="+")
+    sub.set_defaults(funcion=comando_info)
+
+    sub = con_entrada_salida(subcomandos.add_parser(
+        "estadisticas", help="conteos por provincia, edad y año de nacimiento"), entrada=False)
+    sub.add_argument("archivos", nargs="+")
+    sub.set_defaults(funcion=comando_estadisticas)
+    return parser
+
+
+def main(argv=None) -> int:
+    """Sin argumentos abre el menú; con un subcomando trabaja por lotes (JSONL)"""
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        menu_interactivo()
+        return 0
+
+    parser = crear_parser()
+    args = parser.parse_args(argv)
+    try:
+        entrada = sys.stdin if args.entrada == "-" else open(args.entrada, encoding="utf-8")
+    except OSError as e:
+        parser.error(f"no se puede abrir --entrada '{args.entrada}': {e.strerror}")
+    try:
+        salida = sys.stdout if args.salida == "-" else open(args.salida, "w", encoding="utf-8")
+    except OSError as e:
+        if entrada is not sys.stdin:
+            entrada.close()
+        parser.error(f"no se puede abrir --salida '{args.salida}': {e.strerror}")
+    try:
+        return args.funcion(args, entrada, salida)
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    finally:
+        if entrada is not sys.stdin:
+            entrada.close()
+        if salida is not sys.stdout:
+            salida.close()
+
+
 if __name__ == "__main__":
     try:
-        main()
+        sys.exit(main())
     except KeyboardInterrupt:
         print("\n\nPrograma interrumpido por el usuario. ¡Hasta luego!")
         sys.exit(0)
\ No newline at end of file
@@ -1,21 +1,65 @@
+import heapq
+import json
+import math
+import os
 import random
 import struct
+import sys
+import tempfile
 import time
+import zlib
+from array import array
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from datetime import date
+from itertools import islice
+from operator import itemgetter
 
-# --------- Estructura binaria ----------
-COUNT_STRUCT = struct.Struct(">I")  # un entero de 32 bits sin signo
 
-# tamaños (bytes)
-NAME_LEN = 40
-PROV_LEN = 20
-CANT_LEN = 20
-DIST_LEN = 20
+import metricas
+# Los formatos (.bin v1/v2, cola de agregados, índices auxiliares y
+# manifiesto) se definen una sola vez, en lector_con_busqueda
+from lector_con_busqueda import (
+    AGG_CANTIDAD_STRUCT, AGG_ENTRADA_STRUCT, AGG_MAGIC, AGG_PIE_STRUCT, AGG_VERSION,
+    BLM_EXTENSION, BLM_HEADER_STRUCT, BLM_MAGIC, BLM_VERSION,
+    CANT_LEN, COUNT_STRUCT, DICC_CANTIDAD_STRUCT, DICC_LARGO_STRUCT, DIST_LEN,
+    IDX_EXTENSION, IDX_HEADER_STRUCT, IDX_MAGIC, IDX_VERSION, KEY_STRUCT,
+    MANIFIESTO_EXTENSION, MANIFIESTO_VERSION, NAME_LEN,
+    POS_DIRECTA, POS_EXTENSION, POS_HASH, POS_HEADER_STRUCT, POS_MAGIC, POS_VERSION,
+    PROV_LEN, RECORD_SIZE, RECORD_SIZE_V2, RECORD_STRUCT, RECORD_STRUCT_V2,
+    UBI_CANTIDAD_STRUCT, UBI_EXTENSION, UBI_HEADER_STRUCT, UBI_MAGIC, UBI_VALOR_STRUCT, UBI_VERSION,
+    V2_HEADER_STRUCT, V2_MAGIC, V2_VERSION,
+    leer_disposicion, olvidar_indices, ranura_hash)
 
-# estructura de registros ACTUALIZADA con numero_empleado al final
-# nombre(40s), edad(B), fecha_ordinal(I), provincia(20s), canton(20s), distrito(20s), numero_empleado(I)
-RECORD_STRUCT = struct.Struct(f">{NAME_LEN}s B I {PROV_LEN}s {CANT_LEN}s {DIST_LEN}s I")
-RECORD_SIZE = RECORD_STRUCT.size
+FORMATOS = (1, 2)
+
+# --------- Rango de números de empleado ----------
+CLAVE_MIN = 1
+CLAVE_MAX = 100000                 # rango por defecto: 1..100000
+CLAVE_MAX_PERMITIDA = 2**32 - 1    # máximo que cabe en el campo I de RECORD_STRUCT
+
+# --------- Parámetros de los índices auxiliares ----------
+REGISTROS_POR_BLOQUE_INDICE = 4096 // RECORD_SIZE  # .idx: aprox. una página de 4 KiB
+FACTOR_TABLA_DIRECTA = 4       # .pos: acceso directo si el rango de claves es <= 4 ranuras por registro
+TASA_FALSOS_POSITIVOS = 0.01   # .blm: 1% de falsos positivos por defecto
+
+REGISTROS_POR_TROZO_CONTEO = 4096  # registros por Counter.update al contar los agregados
+
+# edad, fecha ordinal y provincia de un registro ya empaquetado (desde el byte NAME_LEN)
+_CAMPOS_AGREGADOS = {1: struct.Struct(f">B I {PROV_LEN}s"), 2: struct.Struct(">B I H")}
+# Los mismos campos, saltando el resto del registro (para iter_unpack sobre un bloque)
+_REGISTRO_AGREGADOS = {
+    formato: struct.Struct(f">{NAME_LEN}x {campos.format[1:]} {tamano - NAME_LEN - campos.size}x")
+    for formato, campos, tamano in ((1, _CAMPOS_AGREGADOS[1], RECORD_SIZE), (2, _CAMPOS_AGREGADOS[2], RECORD_SIZE_V2))
+}
+
+# --------- Generación por lotes (memoria acotada) ----------
+REGISTROS_POR_LOTE = 100_000      # registros ordenados en memoria por corrida
+MAX_CORRIDAS_ABIERTAS = 64        # corridas que se mezclan a la vez con heapq.merge
+TAM_BUFFER_E_S = 1 << 20          # lecturas/escrituras de 1 MiB sobre las corridas
+
+# --------- Escritura masiva ----------
+REGISTROS_POR_BUFFER = (4 << 20) // RECORD_SIZE  # buffer de escritura de ~4 MiB
 
 
 NOMBRES = [
@@ -46,6 +90,277 @@ def pack_fixed_str(text: str, size: int) -> bytes:
     return b.ljust(size, b"\0")
 
 
+class _CatalogoCodificado(dict):
+    """
+    Cadenas de un catálogo ya codificadas en UTF-8 y rellenadas a su tamaño
+    fijo. Una cadena que no está en el catálogo se codifica la primera vez
+    que aparece y queda guardada.
+    """
+
+    def __init__(self, textos, size: int):
+        super().__init__((texto, pack_fixed_str(texto, size)) for texto in textos)
+        self.size = size
+
+    def __missing__(self, texto: str) -> bytes:
+        codificado = self[texto] = pack_fixed_str(texto, self.size)
+        return codificado
+
+
+# Catálogos de ubicación codificados una sola vez (no en cada registro)
+_PROVINCIAS_CODIFICADAS = _CatalogoCodificado((prov for prov, _ in PROVINCIAS), PROV_LEN)
+_CANTONES_CODIFICADOS = _CatalogoCodificado((canton for _, cantones in PROVINCIAS for canton in cantones), CANT_LEN)
+_DISTRITOS_CODIFICADOS = _CatalogoCodificado(DISTRITOS, DIST_LEN)
+
+# Diccionario de ubicaciones del formato v2: provincias, cantones y
+# distritos del catálogo, sin repetir (un mismo texto tiene un solo código)
+DICCIONARIO_UBICACION = tuple(dict.fromkeys(
+    [prov for prov, _ in PROVINCIAS]
+    + [canton for _, cantones in PROVINCIAS for canton in cantones]
+    + DISTRITOS))
+
+
+class _CodigosUbicacion(dict):
+    """Texto de ubicación -> código del diccionario v2; falla con textos fuera del diccionario"""
+
+    def __missing__(self, texto: str) -> int:
+        raise ValueError(f"La ubicación '{texto}' no está en el diccionario del formato v2.")
+
+
+_CODIGOS_UBICACION = _CodigosUbicacion((texto, i) for i, texto in enumerate(DICCIONARIO_UBICACION))
+
+
+def cabecera_v2(n: int) -> bytes:
+    """Cabecera completa de un archivo v2 (incluye el diccionario de ubicaciones)"""
+    diccionario = bytearray(DICC_CANTIDAD_STRUCT.pack(len(DICCIONARIO_UBICACION)))
+    for texto in DICCIONARIO_UBICACION:
+        codificado = texto.encode("utf-8")
+        diccionario += DICC_LARGO_STRUCT.pack(len(codificado)) + codificado
+    return V2_HEADER_STRUCT.pack(V2_MAGIC, V2_VERSION, n, len(diccionario)) + diccionario
+
+
+def escribir_cabecera(f, n: int, formato: int = 1):
+    """Escribe la cabecera de un .bin del formato indicado"""
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato desconocido: {formato}. Use 1 o 2.")
+    f.write(COUNT_STRUCT.pack(n) if formato == 1 else cabecera_v2(n))
+
+
+def empaquetar_agregados(n: int, provincias: dict, edades: dict, fechas: dict) -> bytes:
+    """
+    Cola de agregados de un .bin de n registros a partir de los conteos por
+    provincia, por edad y por fecha de nacimiento (ordinal)
+    """
+    por_anio = Counter()
+    for ordinal, cantidad in fechas.items():
+        por_anio[date.fromordinal(ordinal).year] += cantidad
+    datos = bytearray(AGG_CANTIDAD_STRUCT.pack(len(provincias)))
+    for texto, cantidad in sorted(provincias.items()):
+        codificado = texto.encode("utf-8")
+        datos += DICC_LARGO_STRUCT.pack(len(codificado)) + codificado + COUNT_STRUCT.pack(cantidad)
+    for conteo in (edades, por_anio):
+        datos += AGG_CANTIDAD_STRUCT.pack(len(conteo))
+        for valor, cantidad in sorted(conteo.items()):
+            datos += AGG_ENTRADA_STRUCT.pack(valor, cantidad)
+    return bytes(datos) + AGG_PIE_STRUCT.pack(AGG_MAGIC, AGG_VERSION, n, len(datos))
+
+
+def tamano_archivo(n: int, formato: int = 1) -> int:
+    """Tamaño total en bytes de un .bin con n registros"""
+    if formato == 2:
+        return len(cabecera_v2(n)) + n * RECORD_SIZE_V2
+    return COUNT_STRUCT.size + n * RECORD_SIZE
+
+
+class EscritorRegistros:
+    """
+    Escritura masiva de registros en un archivo ya abierto.
+    Empaqueta cada registro con RECORD_STRUCT.pack_into (o RECORD_STRUCT_V2
+    con formato=2) directamente en un bytearray preasignado y lo escribe al
+    archivo en trozos grandes.
+    Se usa con 'with' (o llamando a vaciar()) para escribir lo pendiente.
+    Con agregados=True también cuenta los registros por provincia, edad y
+    fecha de nacimiento mientras los escribe; escribir_agregados() agrega
+    la cola con esos conteos después del último registro.
+    """
+
+    def __init__(self, f, registros_por_buffer: int = REGISTROS_POR_BUFFER, formato: int = 1,
+                 agregados: bool = False):
+        if formato not in FORMATOS:
+            raise ValueError(f"Formato desconocido: {formato}. Use 1 o 2.")
+        self._f = f
+        self.formato = formato
+        self._tamano = RECORD_SIZE if formato == 1 else RECORD_SIZE_V2
+        self._buffer = bytearray(registros_por_buffer * self._tamano)
+        self._vista = memoryview(self._buffer)
+        self._pos = 0
+        self.cantidad = 0  # registros escritos
+        self.segundos_escritura = 0.0  # tiempo en escrituras al archivo (solo con métricas activas)
+        # Conteos por provincia, edad y fecha ordinal (None si no se piden)
+        self.conteos = (Counter(), Counter(), Counter()) if agregados else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.vaciar()
+
+    def agregar(self, reg: dict):
+        """Empaqueta un registro (diccionario) en el buffer"""
+        self.agregar_todos((reg,))
+
+    def agregar_todos(self, registros):
+        """Empaqueta en el buffer todos los registros (diccionarios) de un iterable"""
+        if self.conteos is not None:
+            registros = self._contar(registros)
+        if self.formato == 2:
+            self._agregar_todos_v2(registros)
+            return
+
+        # Variables locales: este ciclo es el camino caliente de la escritura
+        buffer = self._buffer
+        tope = len(buffer)
+        pack_into = RECORD_STRUCT.pack_into
+        provincias = _PROVINCIAS_CODIFICADAS
+        cantones = _CANTONES_CODIFICADOS
+        distritos = _DISTRITOS_CODIFICADOS
+        pos = self._pos
+        cantidad = 0
+
+        for reg in registros:
+            # El formato 40s ya recorta y rellena con nulos, igual que pack_fixed_str
+            pack_into(buffer, pos,
+                      reg['nombre'].encode("utf-8"),
+                      reg['edad'],
+                      reg['fecha_ordinal'],
+                      provincias[reg['provincia']],
+                      cantones[reg['canton']],
+                      distritos[reg['distrito']],
+                      reg['num_empleado'])
+            pos += RECORD_SIZE
+            cantidad += 1
+            if pos == tope:
+                self._escribir(buffer)
+                pos = 0
+
+        self._pos = pos
+        self.cantidad += cantidad
+
+    def _agregar_todos_v2(self, registros):
+        """Igual que agregar_todos, con la ubicación como códigos del diccionario"""
+        buffer = self._buffer
+        tope = len(buffer)
+        pack_into = RECORD_STRUCT_V2.pack_into
+        codigos = _CODIGOS_UBICACION
+        pos = self._pos
+        cantidad = 0
+
+        for reg in registros:
+            pack_into(buffer, pos,
+                      reg['nombre'].encode("utf-8"),
+                      reg['edad'],
+                      reg['fecha_ordinal'],
+                      codigos[reg['provincia']],
+                      codigos[reg['canton']],
+                      codigos[reg['distrito']],
+                      reg['num_empleado'])
+            pos += RECORD_SIZE_V2
+            cantidad += 1
+            if pos == tope:
+                self._escribir(buffer)
+                pos = 0
+
+        self._pos = pos
+        self.cantidad += cantidad
+
+    def _contar(self, registros):
+        """
+        Pasa los registros sin cambios, sumándolos a los conteos por trozos
+        (Counter.update cuenta cada campo del trozo en C)
+        """
+        provincias, edades, fechas = self.conteos
+        registros = iter(registros)
+        while True:
+            trozo = list(islice(registros, REGISTROS_POR_TROZO_CONTEO))
+            if not trozo:
+                return
+            provincias.update(map(itemgetter('provincia'), trozo))
+            edades.update(map(itemgetter('edad'), trozo))
+            fechas.update(map(itemgetter('fecha_ordinal'), trozo))
+            yield from trozo
+
+    def agregar_empaquetado(self, packed: bytes):
+        """Copia al buffer un registro que ya está empaquetado (del mismo formato)"""
+        if self.conteos is not None:
+            edad, fecha_ordinal, provincia = _CAMPOS_AGREGADOS[self.formato].unpack_from(packed, NAME_LEN)
+            provincia = (DICCIONARIO_UBICACION[provincia] if self.formato == 2
+                         else provincia.split(b"\0", 1)[0].decode("utf-8", errors="replace"))
+            self.conteos[0][provincia] += 1
+            self.conteos[1][edad] += 1
+            self.conteos[2][fecha_ordinal] += 1
+        self._vista[self._pos:self._pos + self._tamano] = packed
+        self._pos += self._tamano
+        self.cantidad += 1
+        if self._pos == len(self._buffer):
+            self.vaciar()
+
+    def agregar_bloque(self, datos: bytes):
+        """
+        Escribe de una vez un bloque de registros ya empaquetados y contiguos
+        (del mismo formato), sin copiarlos uno a uno al buffer
+        """
+        if len(datos) % self._tamano:
+            raise ValueError(f"El bloque no tiene registros completos de {self._tamano} bytes.")
+        if self.conteos is not None:
+            provincias, edades, fechas = self.conteos
+            campos = list(_REGISTRO_AGREGADOS[self.formato].iter_unpack(datos))
+            edades.update(map(itemgetter(0), campos))
+            fechas.update(map(itemgetter(1), campos))
+            for provincia, cantidad in Counter(map(itemgetter(2), campos)).items():
+                provincia = (DICCIONARIO_UBICACION[provincia] if self.formato == 2
+                             else provincia.split(b"\0", 1)[0].decode("utf-8", errors="replace"))
+                provincias[provincia] += cantidad
+        self.vaciar()
+        self._escribir(datos)
+        self.cantidad += len(datos) // self._tamano
+
+    def vaciar(self):
+        """Escribe al archivo lo que haya en el buffer"""
+        if self._pos:
+            self._escribir(self._vista[:self._pos])
+            self._pos = 0
+
+    def escribir_agregados(self):
+        """Escribe lo pendiente y, a continuación, la cola de agregados de lo escrito"""
+        self.vaciar()
+        self._f.write(cola_agregados(self.cantidad, self.conteos, self.formato))
+
+    def _escribir(self, datos):
+        """Escribe un trozo del buffer al archivo (midiendo el tiempo si hay métricas)"""
+        if not metricas.activas:
+            self._f.write(datos)
+            return
+        inicio = time.perf_counter()
+        self._f.write(datos)
+        segundos = time.perf_counter() - inicio
+        self.segundos_escritura += segundos
+        metricas.sumar_fase("escribir", segundos)
+        metricas.sumar("bytes_escritos", len(datos))
+
+
+def cola_agregados(n: int, conteos: tuple, formato: int = 1) -> bytes:
+    """
+    Cola de agregados para los conteos de EscritorRegistros. En v1 la
+    provincia se cuenta como queda guardada (recortada a PROV_LEN bytes).
+    """
+    provincias, edades, fechas = conteos
+    if formato == 1:
+        guardadas = Counter()
+        for texto, cantidad in provincias.items():
+            guardadas[pack_fixed_str(texto, PROV_LEN).split(b"\0", 1)[0].decode("utf-8", errors="replace")] += cantidad
+        provincias = guardadas
+    return empaquetar_agregados(n, provincias, edades, fechas)
+
+
 def random_birthdate(rng: random.Random) -> date:
     """Genera una fecha de nacimiento aleatoria"""
     y = rng.randint(1950, 2010)
@@ -54,12 +369,71 @@ def random_birthdate(rng: random.Random) -> date:
     return date(y, m, d)
 
 
-def generar_lista_registros(n: int, rng: random.Random) -> list:
+def validar_rango_claves(n: int, clave_min: int, clave_max: int):
+    """Verifica que quepan n números de empleado únicos en clave_min..clave_max"""
+    if not 0 <= clave_min <= clave_max <= CLAVE_MAX_PERMITIDA:
+        raise ValueError(f"Rango de números de empleado inválido: {clave_min}..{clave_max} "
+                         f"(debe estar dentro de 0..{CLAVE_MAX_PERMITIDA}).")
+    if n > clave_max - clave_min + 1:
+        raise ValueError(f"No se pueden generar {n} números de empleado únicos en el rango "
+                         f"{clave_min}..{clave_max} ({clave_max - clave_min + 1} disponibles).")
+
+
+def generar_claves_unicas(n: int, rng: random.Random, clave_min: int = CLAVE_MIN, clave_max: int = CLAVE_MAX) -> list:
+    """
+    Elige n números de empleado distintos del rango, en orden aleatorio.
+    Muestreo sin reemplazo: O(n) en tiempo y memoria sin importar el tamaño
+    del rango.
+    """
+    validar_rango_claves(n, clave_min, clave_max)
+    return rng.sample(range(clave_min, clave_max + 1), n)
+
+
+def generar_claves_ordenadas(n: int, rng: random.Random, clave_min: int = CLAVE_MIN, clave_max: int = CLAVE_MAX):
+    """
+    Produce n números de empleado distintos en orden ascendente.
+    El rango se divide en n tramos consecutivos del mismo tamaño (±1) y se
+    elige una clave al azar dentro de cada tramo, así que no hace falta
+    ordenar ni recordar las claves anteriores (memoria O(1)).
+    """
+    validar_rango_claves(n, clave_min, clave_max)
+    return _claves_por_tramos(n, rng, clave_min, clave_max - clave_min + 1)
+
+
+def _claves_por_tramos(n: int, rng: random.Random, clave_min: int, espacio: int,
+                       desde_tramo: int = 0, hasta_tramo: int = None):
+    """
+    Una clave al azar en cada uno de los n tramos del rango (ver
+    generar_claves_ordenadas); solo los tramos desde_tramo..hasta_tramo-1
+    """
+    for i in range(desde_tramo, n if hasta_tramo is None else hasta_tramo):
+        desde = clave_min + i * espacio // n
+        hasta = clave_min + (i + 1) * espacio // n - 1
+        yield rng.randint(desde, hasta)
+
+
+def generar_lista_registros(n: int, rng: random.Random, clave_min: int = CLAVE_MIN,
+                            clave_max: int = CLAVE_MAX) -> list:
     """Genera n registros como lista de diccionarios con numeros de empleado unicos"""
-    lista = []
-    numeros_empleado_generados = set()
-    
-    for i in range(1, n + 1):
+    return list(generar_registros(n, rng, clave_min, clave_max))
+
+
+def generar_registros(n: int, rng: random.Random, clave_min: int = CLAVE_MIN,
+                      clave_max: int = CLAVE_MAX, ordenados: bool = False):
+    """
+    Genera (uno a uno) n registros como diccionarios con numeros de empleado unicos
+    Con 'ordenados' los registros salen ya ordenados por número de empleado.
+    """
+    if ordenados:
+        claves = generar_claves_ordenadas(n, rng, clave_min, clave_max)
+    else:
+        claves = iter(generar_claves_unicas(n, rng, clave_min, clave_max))
+    return _crear_registros(rng, claves, 1, n)
+
+
+def _crear_registros(rng: random.Random, claves, primero: int, ultimo: int):
+    """Registros numerados primero..ultimo (en el nombre) con las claves dadas, en orden"""
+    for i in range(primero, ultimo + 1):
         # Generar datos aleatorios
         prov, cantones = rng.choice(PROVINCIAS)
         canton = rng.choice(cantones)
@@ -73,12 +447,8 @@ def generar_lista_registros(n: int, rng: random.Random) -> list:
         nombre = f"{rng.choice(NOMBRES)} {i}"
         fecha_ordinal = nac.toordinal()
         
-        # Generar numero de empleado UNICO
-        while True:
-            num_empleado = rng.randint(1, 100000)  # Entero positivo
-            if num_empleado not in numeros_empleado_generados:
-                numeros_empleado_generados.add(num_empleado)
-                break
+        # Numero de empleado UNICO (ya elegido)
+        num_empleado = next(claves)
         
         registro = {
             'nombre': nombre,
@@ -89,29 +459,515 @@ def generar_lista_registros(n: int, rng: random.Random) -> list:
             'distrito': distrito,
             'num_empleado': num_empleado
         }
-        lista.append(registro)
-    
-    return lista
+        yield registro
 
 
-def guardar_registros(filename: str, registros: list):
-    """Guarda los registros ordenados en el archivo binario"""
+def _generar_fragmento(filename: str, n: int, desde: int, hasta: int, semilla, clave_min: int,
+                       clave_max: int, formato: int, offset: int, agregados: bool = False):
+    """
+    Genera los registros desde..hasta-1 (0-based) de un archivo de n registros
+    y los escribe en 'offset'. Se ejecuta en un proceso trabajador.
+    Retorna los conteos del fragmento (con agregados=True) o None.
+    """
+    # Flujo aleatorio propio y reproducible para este fragmento
+    rng = random.Random(f"{semilla}:{desde}:{hasta}")
+    claves = _claves_por_tramos(n, rng, clave_min, clave_max - clave_min + 1, desde, hasta)
+    with open(filename, "r+b") as f:
+        f.seek(offset)
+        with EscritorRegistros(f, formato=formato, agregados=agregados) as escritor:
+            escritor.agregar_todos(_crear_registros(rng, claves, desde + 1, hasta))
+    return escritor.conteos
+
+
+def generar_archivo_paralelo(filename: str, n: int, semilla, trabajadores: int = None,
+                             indice_cada: int = None, clave_min: int = CLAVE_MIN,
+                             clave_max: int = CLAVE_MAX, formato: int = 1, agregados: bool = False,
+                             **indices):
+    """
+    Genera y guarda n registros ordenados repartiendo el trabajo entre
+    procesos. Los registros se dividen en un fragmento contiguo por
+    trabajador; cada uno usa los mismos tramos de claves que
+    generar_claves_ordenadas, así que los rangos de números de empleado
+    son disjuntos y el archivo queda ordenado. Cada fragmento tiene su
+    propio generador aleatorio derivado de 'semilla' y se escribe en su
+    posición del archivo: el resultado es el mismo para la misma semilla y
+    la misma cantidad de trabajadores. Con 'agregados' cada trabajador
+    cuenta su fragmento y al final se escribe la cola con los conteos
+    sumados. 'indices' son los demás parámetros de guardar_indices.
+    """
+    validar_rango_claves(n, clave_min, clave_max)  # antes de crear el archivo
+    trabajadores = max(1, min(trabajadores or os.cpu_count() or 1, n or 1))
+    tamano = RECORD_SIZE if formato == 1 else RECORD_SIZE_V2
+
+    with open(filename, "wb") as f:
+        escribir_cabecera(f, n, formato)
+        inicio_datos = f.tell()
+        f.truncate(inicio_datos + n * tamano)  # cada trabajador escribe su parte
+
+    limites = [i * n // trabajadores for i in range(trabajadores + 1)]
+    # Los trabajadores generan y escriben a la vez: se mide como una sola fase
+    with metricas.fase("generar"), ProcessPoolExecutor(max_workers=trabajadores) as ejecutor:
+        tareas = [ejecutor.submit(_generar_fragmento, filename, n, desde, hasta, semilla,
+                                  clave_min, clave_max, formato, inicio_datos + desde * tamano, agregados)
+                  for desde, hasta in zip(limites, limites[1:])]
+        conteos = [tarea.result() for tarea in tareas]  # propaga el error de cualquier trabajador
+
+    if agregados:
+        totales = (Counter(), Counter(), Counter())
+        for conteo in conteos:
+            for total, parcial in zip(totales, conteo):
+                total.update(parcial)
+        with open(filename, "r+b") as f:
+            f.seek(inicio_datos + n * tamano)
+            f.write(cola_agregados(n, totales, formato))
+
+    guardar_indices(filename, indice_cada, **indices)
+
+
+def _generar_particion(ruta: str, n: int, desde: int, hasta: int, semilla, clave_min: int,
+                       clave_max: int, formato: int, agregados: bool, indices: dict) -> int:
+    """
+    Escribe la partición con los registros desde..hasta-1 (0-based) de un
+    conjunto de n registros como un .bin completo, con sus índices. Se
+    ejecuta en un proceso trabajador; usa el mismo flujo aleatorio que
+    _generar_fragmento para ese tramo.
+    """
+    rng = random.Random(f"{semilla}:{desde}:{hasta}")
+    claves = _claves_por_tramos(n, rng, clave_min, clave_max - clave_min + 1, desde, hasta)
+    with open(ruta, "wb") as f:
+        escribir_cabecera(f, hasta - desde, formato)
+        with EscritorRegistros(f, formato=formato, agregados=agregados) as escritor:
+            escritor.agregar_todos(_crear_registros(rng, claves, desde + 1, hasta))
+            if agregados:
+                escritor.escribir_agregados()
+    guardar_indices(ruta, **indices)
+    return escritor.cantidad
+
+
+def generar_conjunto_particionado(manifiesto: str, n: int, semilla, particiones: int,
+                                  trabajadores: int = None, clave_min: int = CLAVE_MIN,
+                                  clave_max: int = CLAVE_MAX, formato: int = 1,
+                                  agregados: bool = False, **indices):
+    """
+    Genera n registros como un conjunto particionado: 'particiones' archivos
+    .bin (base-0000.bin, base-0001.bin, ...) con rangos contiguos de
+    num_empleado, y el manifiesto que los lista (debe terminar en
+    MANIFIESTO_EXTENSION). Las particiones se escriben a la vez en procesos
+    trabajadores, cada una con sus propios índices ('indices' son los
+    parámetros de guardar_indices). El rango de claves de cada partición es
+    el de sus tramos de generar_claves_ordenadas, así que el conjunto tiene
+    los mismos registros que generar_archivo_paralelo con la misma semilla
+    y tantos trabajadores como particiones. El manifiesto se escribe al
+    final y de forma atómica: nunca apunta a particiones incompletas.
+    """
+    if not manifiesto.endswith(MANIFIESTO_EXTENSION):
+        raise ValueError(f"El manifiesto debe terminar en '{MANIFIESTO_EXTENSION}'.")
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato desconocido: {formato}. Use 1 o 2.")
+    validar_rango_claves(n, clave_min, clave_max)
+    particiones = max(1, min(particiones, n or 1))
+    trabajadores = max(1, min(trabajadores or os.cpu_count() or 1, particiones))
+    espacio = clave_max - clave_min + 1
+    base = manifiesto[:-len(MANIFIESTO_EXTENSION)]
+    limites = [i * n // particiones for i in range(particiones + 1)]
+
+    entradas = []
+    with metricas.fase("generar"), ProcessPoolExecutor(max_workers=trabajadores) as ejecutor:
+        tareas = []
+        for i, (desde, hasta) in enumerate(zip(limites, limites[1:])):
+            ruta = f"{base}-{i:04d}.bin"
+            tareas.append(ejecutor.submit(_generar_particion, ruta, n, desde, hasta, semilla, clave_min,
+                                          clave_max, formato, agregados, indices))
+            entradas.append({
+                'archivo': os.path.basename(ruta),
+                'clave_min': clave_min + desde * espacio // n if n else clave_min,
+                'clave_max': clave_min + hasta * espacio // n - 1 if n else clave_max,
+                'num_registros': hasta - desde
+            })
+        for tarea in tareas:
+            tarea.result()  # propaga el error de cualquier trabajador
+
+    datos = {'version': MANIFIESTO_VERSION, 'formato': formato, 'particiones': entradas}
+    directorio = os.path.dirname(os.path.abspath(manifiesto))
+    fd, temporal = tempfile.mkstemp(suffix=".tmp", dir=directorio)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(datos, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+    os.replace(temporal, manifiesto)
+
+
+def guardar_indice_bloques(filename: str, registros_por_bloque: int = REGISTROS_POR_BLOQUE_INDICE):
+    """
+    Escribe el índice de bloques (filename + '.idx') de un .bin ya ordenado.
+    Guarda la primera clave de cada bloque de 'registros_por_bloque'
+    registros junto con la cantidad de registros, el tamaño y el mtime del
+    .bin, para que el lector pueda descartar un índice desactualizado.
+    """
+    if registros_por_bloque < 1:
+        raise ValueError("La cantidad de registros por bloque debe ser al menos 1.")
+
+    claves = bytearray()
+    with open(filename, "rb") as f:
+        n, inicio, tamano, _ = _disposicion(f)
+        for pos in range(0, n, registros_por_bloque):
+            # num_empleado son los últimos 4 bytes del primer registro del bloque
+            f.seek(inicio + (pos + 1) * tamano - KEY_STRUCT.size)
+            claves += f.read(KEY_STRUCT.size)
+        st = os.fstat(f.fileno())
+
+    with open(filename + IDX_EXTENSION, "wb") as idx:
+        idx.write(IDX_HEADER_STRUCT.pack(IDX_MAGIC, IDX_VERSION, registros_por_bloque,
+                                         n, st.st_size, st.st_mtime_ns))
+        idx.write(claves)
+
+
+def guardar_indice_ubicacion(filename: str):
+    """
+    Escribe el índice de ubicación (filename + '.ubi') de un .bin.
+    Recorre el archivo una vez y, para cada provincia, cantón y distrito
+    distinto, guarda un bitmap comprimido con las posiciones que lo tienen.
+    Incluye cantidad de registros, tamaño y mtime del .bin para que el
+    lector descarte un índice desactualizado.
+    """
+    # provincia, cantón, distrito: valor del campo (texto en bytes en v1,
+    # código del diccionario en v2) -> bytearray
+    bitmaps = ({}, {}, {})
+    with open(filename, "rb") as f:
+        n, inicio, tamano, diccionario = _disposicion(f)
+        estructura = RECORD_STRUCT if diccionario is None else RECORD_STRUCT_V2
+        f.seek(inicio)
+        tamano_bitmap = (n + 7) // 8
+        pos = 0
+        while pos < n:
+            bloque = f.read(min(REGISTROS_POR_BUFFER, n - pos) * tamano)
+            if len(bloque) < tamano:
+                raise IOError("El archivo está truncado: faltan registros.")
+            bloque = bloque[:len(bloque) - len(bloque) % tamano]
+            for _, _, _, prov_b, canton_b, dist_b, _ in estructura.iter_unpack(bloque):
+                byte, bit = pos >> 3, 1 << (pos & 7)
+                for tabla, valor in zip(bitmaps, (prov_b, canton_b, dist_b)):
+                    bitmap = tabla.get(valor)
+                    if bitmap is None:
+                        bitmap = tabla[valor] = bytearray(tamano_bitmap)
+                    bitmap[byte] |= bit
+                pos += 1
+        st = os.fstat(f.fileno())
+
+    with open(filename + UBI_EXTENSION, "wb") as ubi:
+        ubi.write(UBI_HEADER_STRUCT.pack(UBI_MAGIC, UBI_VERSION, n, st.st_size, st.st_mtime_ns))
+        for tabla in bitmaps:
+            if diccionario is None:
+                por_texto = {valor.split(b"\0", 1)[0]: bitmap for valor, bitmap in tabla.items()}
+            else:
+                por_texto = {diccionario[codigo].encode("utf-8"): bitmap for codigo, bitmap in tabla.items()}
+            ubi.write(UBI_CANTIDAD_STRUCT.pack(len(por_texto)))
+            for texto, bitmap in sorted(por_texto.items()):
+                comprimido = zlib.compress(bytes(bitmap))
+                ubi.write(UBI_VALOR_STRUCT.pack(len(texto), len(comprimido)))
+                ubi.write(texto)
+                ubi.write(comprimido)
+
+
+def _leer_claves(filename: str) -> tuple:
+    """Lee en una pasada todos los num_empleado de un .bin; retorna (array('I'), os.stat_result)"""
+    claves = array("I")
+    with open(filename, "rb") as f:
+        n, _, tamano, _ = _disposicion(f)
+        desplazamiento = tamano - KEY_STRUCT.size
+        while len(claves) < n:
+            bloque = f.read(min(REGISTROS_POR_BUFFER, n - len(claves)) * tamano)
+            if len(bloque) < tamano:
+                raise IOError("El archivo está truncado: faltan registros.")
+            for inicio in range(desplazamiento, len(bloque) - KEY_STRUCT.size + 1, tamano):
+                claves.append(KEY_STRUCT.unpack_from(bloque, inicio)[0])
+        st = os.fstat(f.fileno())
+    return claves, st
+
+
+def guardar_filtro_bloom(filename: str, tasa_falsos_positivos: float = TASA_FALSOS_POSITIVOS):
+    """
+    Escribe el filtro de Bloom (filename + '.blm') de todos los num_empleado
+    de un .bin. Los bits y la cantidad de funciones hash se calculan para que
+    una clave inexistente pase el filtro con probabilidad
+    'tasa_falsos_positivos' (entre 0 y 1, sin incluirlos).
+    """
+    if not 0 < tasa_falsos_positivos < 1:
+        raise ValueError("La tasa de falsos positivos debe estar entre 0 y 1.")
+
+    claves, st = _leer_claves(filename)
+    n = len(claves)
+    bits = max(8, math.ceil(-max(n, 1) * math.log(tasa_falsos_positivos) / math.log(2) ** 2))
+    funciones = max(1, round(bits / max(n, 1) * math.log(2)))
+    contenido = bytearray((bits + 7) // 8)
+    for clave in claves:
+        # Mismo doble hashing que posiciones_bloom, sin crear una lista por clave
+        h1 = (clave * 0x9E3779B1) & 0xFFFFFFFF
+        h2 = (((clave ^ (clave >> 16)) * 0x85EBCA6B) & 0xFFFFFFFF) | 1
+        for _ in range(funciones):
+            bit = h1 % bits
+            contenido[bit >> 3] |= 1 << (bit & 7)
+            h1 += h2
+
+    with open(filename + BLM_EXTENSION, "wb") as blm:
+        blm.write(BLM_HEADER_STRUCT.pack(BLM_MAGIC, BLM_VERSION, bits, funciones,
+                                         n, st.st_size, st.st_mtime_ns))
+        blm.write(contenido)
+
+
+def guardar_indice_posiciones(filename: str):
+    """
+    Escribe la tabla de posiciones (filename + '.pos') de un .bin en una sola
+    pasada: num_empleado -> posición. Si el rango de claves es denso usa una
+    tabla de acceso directo; si es disperso, una tabla hash con sondeo lineal
+    de al menos el doble de ranuras que registros.
+    """
+    claves, st = _leer_claves(filename)
+    n = len(claves)
+    base = min(claves) if claves else 0
+    espacio = max(claves) - base + 1 if claves else 0
+    if espacio <= FACTOR_TABLA_DIRECTA * n:
+        tipo, parametro = POS_DIRECTA, base
+        tabla = array("I", bytes(4 * espacio))
+        for posicion, clave in enumerate(claves, 1):
+            tabla[clave - base] = posicion
+    else:
+        tipo, parametro = POS_HASH, max(1, (2 * n - 1).bit_length())
+        mascara = (1 << parametro) - 1
+        tabla = array("I", bytes(8 << parametro))
+        for posicion, clave in enumerate(claves, 1):
+            ranura = ranura_hash(clave, parametro)
+            while tabla[2 * ranura + 1]:
+                ranura = (ranura + 1) & mascara
+            tabla[2 * ranura] = clave
+            tabla[2 * ranura + 1] = posicion
+    ranuras = len(tabla) if tipo == POS_DIRECTA else len(tabla) // 2
+    if sys.byteorder == "little":
+        tabla.byteswap()  # la tabla se guarda en big-endian
+
+    with open(filename + POS_EXTENSION, "wb") as pos_f:
+        pos_f.write(POS_HEADER_STRUCT.pack(POS_MAGIC, POS_VERSION, tipo, parametro, ranuras,
+                                           n, st.st_size, st.st_mtime_ns))
+        tabla.tofile(pos_f)
+
+
+def guardar_indices(filename: str, indice_cada: int = None, indice_ubicacion: bool = False,
+                    indice_posiciones: bool = False, filtro_bloom: float = None):
+    """
+    Escribe los índices auxiliares pedidos para un .bin ya escrito
+    'filtro_bloom' es la tasa de falsos positivos del filtro (None = sin filtro).
+    """
+    with metricas.fase("indices"):
+        if indice_cada:
+            guardar_indice_bloques(filename, indice_cada)
+        if indice_ubicacion:
+            guardar_indice_ubicacion(filename)
+        if indice_posiciones:
+            guardar_indice_posiciones(filename)
+        if filtro_bloom is not None:
+            guardar_filtro_bloom(filename, filtro_bloom)
+    # Que los lectores de este proceso vean los índices recién escritos
+    olvidar_indices(filename)
+
+
+def _disposicion(f) -> tuple:
+    """(num_registros, inicio de los datos, tamaño de registro, diccionario o None) de un .bin abierto"""
+    tamano = os.fstat(f.fileno()).st_size
+
+    def leer(offset, cantidad):
+        f.seek(offset)
+        return f.read(cantidad)
+
+    disposicion = leer_disposicion(leer, tamano)
+    f.seek(disposicion['inicio_datos'])
+    return (disposicion['num_registros'], disposicion['inicio_datos'],
+            disposicion['tamano_registro'], disposicion['diccionario'])
+
+
+def empaquetar_registro(reg: dict, formato: int = 1) -> bytes:
+    """Convierte un registro (diccionario) en sus bytes con RECORD_STRUCT (o RECORD_STRUCT_V2)"""
+    if formato == 2:
+        return RECORD_STRUCT_V2.pack(
+            reg['nombre'].encode("utf-8"),
+            reg['edad'],
+            reg['fecha_ordinal'],
+            _CODIGOS_UBICACION[reg['provincia']],
+            _CODIGOS_UBICACION[reg['canton']],
+            _CODIGOS_UBICACION[reg['distrito']],
+            reg['num_empleado']
+        )
+    return RECORD_STRUCT.pack(
+        reg['nombre'].encode("utf-8"),
+        reg['edad'],
+        reg['fecha_ordinal'],
+        _PROVINCIAS_CODIFICADAS[reg['provincia']],
+        _CANTONES_CODIFICADOS[reg['canton']],
+        _DISTRITOS_CODIFICADOS[reg['distrito']],
+        reg['num_empleado']
+    )
+
+
+def clave_empaquetada(packed: bytes) -> bytes:
+    """
+    Clave de ordenamiento de un registro empaquetado: los 4 bytes de
+    num_empleado en big-endian, que se ordenan igual que el número
+    """
+    return packed[-KEY_STRUCT.size:]
+
+
+def escribir_corrida(lote: list, directorio: str) -> str:
+    """Ordena un lote de registros empaquetados y lo guarda en un archivo temporal"""
+    with metricas.fase("ordenar"):
+        lote.sort(key=clave_empaquetada)
+    with metricas.fase("escribir"):
+        fd, ruta = tempfile.mkstemp(suffix=".run", dir=directorio)
+        with os.fdopen(fd, "wb", buffering=TAM_BUFFER_E_S) as f:
+            f.write(b"".join(lote))
+    return ruta
+
+
+def leer_corrida(ruta: str, tamano_registro: int = RECORD_SIZE):
+    """Lee una corrida en bloques grandes y produce sus registros empaquetados"""
+    por_lectura = (TAM_BUFFER_E_S // tamano_registro) * tamano_registro
+    with open(ruta, "rb") as f:
+        while True:
+            bloque = f.read(por_lectura)
+            if not bloque:
+                break
+            for inicio in range(0, len(bloque), tamano_registro):
+                yield bloque[inicio:inicio + tamano_registro]
+
+
+def mezclar_corridas(corridas: list, directorio: str, tamano_registro: int = RECORD_SIZE):
+    """
+    Mezcla (k-way merge con heapq.merge) las corridas ordenadas y produce
+    los registros empaquetados en orden. Si hay más de MAX_CORRIDAS_ABIERTAS
+    corridas, primero se mezclan por grupos en corridas intermedias.
+    """
+    while len(corridas) > MAX_CORRIDAS_ABIERTAS:
+        siguientes = []
+        for i in range(0, len(corridas), MAX_CORRIDAS_ABIERTAS):
+            grupo = corridas[i:i + MAX_CORRIDAS_ABIERTAS]
+            fd, ruta = tempfile.mkstemp(suffix=".run", dir=directorio)
+            with os.fdopen(fd, "wb", buffering=TAM_BUFFER_E_S) as f:
+                for packed in heapq.merge(*(leer_corrida(r, tamano_registro) for r in grupo),
+                                          key=clave_empaquetada):
+                    f.write(packed)
+            for r in grupo:
+                os.remove(r)
+            siguientes.append(ruta)
+        corridas = siguientes
+
+    return heapq.merge(*(leer_corrida(r, tamano_registro) for r in corridas), key=clave_empaquetada)
+
+
+def generar_archivo_por_lotes(filename: str, n: int, rng: random.Random,
+                              registros_por_lote: int = REGISTROS_POR_LOTE,
+                              indice_cada: int = None, clave_min: int = CLAVE_MIN,
+                              clave_max: int = CLAVE_MAX, claves_ordenadas: bool = True,
+                              indice_ubicacion: bool = False, formato: int = 1,
+                              indice_posiciones: bool = False, filtro_bloom: float = None,
+                              agregados: bool = False):
+    """
+    Genera y guarda n registros ordenados sin tenerlos todos en memoria.
+    Con 'claves_ordenadas' (por defecto) los números de empleado se eligen
+    ya en orden ascendente y cada lote se escribe directamente al .bin.
+    Si no, se generan claves en orden aleatorio: cada lote se ordena y se
+    escribe como una corrida temporal de registros empaquetados, y al final
+    las corridas se mezclan en el .bin. El resultado tiene exactamente el
+    mismo formato que guardar_registros. Con 'agregados' los conteos se
+    hacen durante la escritura y se guardan en la cola del .bin.
+    """
+    validar_rango_claves(n, clave_min, clave_max)  # antes de crear el archivo
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato desconocido: {formato}. Use 1 o 2.")
+    registros = generar_registros(n, rng, clave_min, clave_max, ordenados=claves_ordenadas)
+
+    # Las fases se miden por diferencia: generar (y empaquetar) es el tiempo
+    # total menos lo que se pasó ordenando y escribiendo
+    inicio = time.perf_counter()
+    if claves_ordenadas:
+        with open(filename, "wb") as f:
+            escribir_cabecera(f, n, formato)
+            with EscritorRegistros(f, formato=formato, agregados=agregados) as escritor:
+                escritor.agregar_todos(registros)
+                if agregados:
+                    escritor.escribir_agregados()
+        if metricas.activas:
+            metricas.sumar_fase("generar", time.perf_counter() - inicio - escritor.segundos_escritura)
+    else:
+        directorio = os.path.dirname(os.path.abspath(filename))
+        with tempfile.TemporaryDirectory(prefix="corridas_", dir=directorio) as tmp:
+            corridas = []
+            lote = []
+            en_corridas = 0.0
+            for reg in registros:
+                lote.append(empaquetar_registro(reg, formato))
+                if len(lote) == registros_por_lote:
+                    inicio_corrida = time.perf_counter()
+                    corridas.append(escribir_corrida(lote, tmp))
+                    en_corridas += time.perf_counter() - inicio_corrida
+                    lote = []
+            if lote:
+                inicio_corrida = time.perf_counter()
+                corridas.append(escribir_corrida(lote, tmp))
+                en_corridas += time.perf_counter() - inicio_corrida
+            lote = None
+            if metricas.activas:
+                metricas.sumar_fase("generar", time.perf_counter() - inicio - en_corridas)
+
+            inicio = time.perf_counter()
+            tamano = RECORD_SIZE if formato == 1 else RECORD_SIZE_V2
+            with open(filename, "wb") as f:
+                escribir_cabecera(f, n, formato)
+                with EscritorRegistros(f, formato=formato, agregados=agregados) as escritor:
+                    for packed in mezclar_corridas(corridas, tmp, tamano):
+                        escritor.agregar_empaquetado(packed)
+                    if agregados:
+                        escritor.escribir_agregados()
+            if metricas.activas:
+                metricas.sumar_fase("mezclar", time.perf_counter() - inicio - escritor.segundos_escritura)
+
+    guardar_indices(filename, indice_cada, indice_ubicacion, indice_posiciones, filtro_bloom)
+
+
+def leer_primeros_registros(filename: str, cantidad: int) -> list:
+    """Retorna (num_empleado, nombre) de los primeros registros de un .bin"""
+    primeros = []
+    with open(filename, "rb") as f:
+        n, _, tamano, diccionario = _disposicion(f)
+        estructura = RECORD_STRUCT if diccionario is None else RECORD_STRUCT_V2
+        for _ in range(min(n, cantidad)):
+            campos = estructura.unpack(f.read(tamano))
+            primeros.append((campos[-1], campos[0].split(b"\0", 1)[0].decode("utf-8", errors="replace")))
+    return primeros
+
+
+def guardar_registros(filename: str, registros: list, indice_cada: int = None,
+                      indice_ubicacion: bool = False, formato: int = 1,
+                      indice_posiciones: bool = False, filtro_bloom: float = None,
+                      agregados: bool = False):
+    """
+    Guarda los registros ordenados en el archivo binario
+    Si se indica 'indice_cada', también escribe el índice de bloques (.idx)
+    con una entrada cada 'indice_cada' registros; con 'indice_ubicacion',
+    el índice de provincia/cantón/distrito (.ubi); con 'indice_posiciones',
+    la tabla num_empleado -> posición (.pos); con 'filtro_bloom' (tasa de
+    falsos positivos), el filtro de Bloom de los num_empleado (.blm). Con
+    formato=2 usa el formato compacto (ubicación como códigos de un diccionario).
+    Con 'agregados', agrega la cola de conteos por provincia, edad y año de
+    nacimiento después del último registro.
+    """
     with open(filename, "wb") as f:
         # Escribir cabecera con cantidad de registros
-        f.write(COUNT_STRUCT.pack(len(registros)))
+        escribir_cabecera(f, len(registros), formato)
         
-        # Escribir cada registro
-        for reg in registros:
-            packed = RECORD_STRUCT.pack(
-                pack_fixed_str(reg['nombre'], NAME_LEN),
-                reg['edad'],
-                reg['fecha_ordinal'],
-                pack_fixed_str(reg['provincia'], PROV_LEN),
-                pack_fixed_str(reg['canton'], CANT_LEN),
-                pack_fixed_str(reg['distrito'], DIST_LEN),
-                reg['num_empleado']
-            )
-            f.write(packed)
+        # Escribir cada registro (empaquetado en bloque)
+        with EscritorRegistros(f, formato=formato, agregados=agregados) as escritor:
+            escritor.agregar_todos(registros)
+            if agregados:
+                escritor.escribir_agregados()
+
+    guardar_indices(filename, indice_cada, indice_ubicacion, indice_posiciones, filtro_bloom)
 
 
 def main():
@@ -125,30 +981,53 @@ def main():
     if not filename.endswith('.bin'):
         filename += '.bin'
     
+    respuesta = input(f"Número de empleado máximo (Enter = {CLAVE_MAX}): ").strip()
+    clave_max = int(respuesta) if respuesta else CLAVE_MAX
+    validar_rango_claves(n, CLAVE_MIN, clave_max)
+    formato = 2 if input("¿Usar formato compacto v2? (s/N): ").strip().lower() == 's' else 1
+    respuesta = input("Procesos en paralelo (Enter = 1): ").strip()
+    trabajadores = int(respuesta) if respuesta else 1
+    agregados = input("¿Guardar estadísticas precalculadas? (s/N): ").strip().lower() == 's'
+    
     seed = int(time.time())
     rng = random.Random(seed)
     
     print(f"Seed usada: {seed}")
-    print(f"Tamaño del registro: {RECORD_SIZE} bytes")
-    print(f"Tamaño total del archivo: {COUNT_STRUCT.size + (n * RECORD_SIZE)} bytes")
-    
-    print("\nGenerando registros aleatorios...")
-    registros = generar_lista_registros(n, rng)
+    print(f"Tamaño del registro: {RECORD_SIZE if formato == 1 else RECORD_SIZE_V2} bytes")
+    print(f"Tamaño total del archivo: {tamano_archivo(n, formato)} bytes")
     
-    print("Ordenando por número de empleado (ascendente)...")
-    registros.sort(key=lambda r: r['num_empleado'])
-    
-    print("Guardando en archivo...")
-    guardar_registros(filename, registros)
+    if trabajadores > 1:
+        # Un fragmento ordenado por proceso, escrito directamente en su lugar
+        print(f"\nGenerando en {trabajadores} procesos...")
+        generar_archivo_paralelo(filename, n, seed, trabajadores, clave_max=clave_max, formato=formato,
+                                 agregados=agregados)
+        primeros = leer_primeros_registros(filename, 5)
+    elif n > REGISTROS_POR_LOTE:
+        # Archivos grandes: lotes ordenados en disco y mezcla final (memoria acotada)
+        print(f"\nGenerando por lotes de {REGISTROS_POR_LOTE} registros (memoria acotada)...")
+        generar_archivo_por_lotes(filename, n, rng, clave_max=clave_max, formato=formato,
+                                  agregados=agregados)
+        primeros = leer_primeros_registros(filename, 5)
+    else:
+        print("\nGenerando registros aleatorios...")
+        with metricas.fase("generar"):
+            registros = generar_lista_registros(n, rng, clave_max=clave_max)
+        
+        print("Ordenando por número de empleado (ascendente)...")
+        with metricas.fase("ordenar"):
+            registros.sort(key=lambda r: r['num_empleado'])
+        
+        print("Guardando en archivo...")
+        guardar_registros(filename, registros, formato=formato, agregados=agregados)
+        primeros = [(reg['num_empleado'], reg['nombre']) for reg in registros[:5]]
     
     print(f"\n¡OK! {n} registros escritos en '{filename}'")
     print("Los registros están ordenados por número de empleado.")
     
     # Mostrar primeros 5 registros como ejemplo
     print("\nPrimeros 5 registros (ya ordenados):")
-    for i, reg in enumerate(registros[:5]):
-        print(f"  {i+1}. Empleado #{reg['num_empleado']}: {reg['nombre']}")
-
+    for i, (num_empleado, nombre) in enumerate(primeros):
+        print(f"  {i+1}. Empleado #{num_empleado}: {nombre}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
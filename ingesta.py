@@ -0,0 +1,258 @@
+"""
+Ingesta de exportaciones reales (CSV o JSONL) al formato binario ordenado
+Lee la entrada fila por fila, valida cada una y la empaqueta con
+RECORD_STRUCT (o RECORD_STRUCT_V2), ordena por num_empleado con memoria
+acotada (corridas ordenadas en disco y mezcla final, igual que
+generador_ordenado.generar_archivo_por_lotes), rechaza los números de
+empleado repetidos y escribe un .bin que lector_con_busqueda lee igual que
+uno generado.
+Columnas: nombre, edad (opcional, si falta se calcula de la fecha),
+fecha_nacimiento (AAAA-MM-DD o DD/MM/AAAA), provincia, canton, distrito y
+num_empleado.
+"""
+
+import csv
+import json
+import os
+import struct
+import tempfile
+import time
+from datetime import date, datetime
+
+import generador_ordenado as generador
+import metricas
+
+CAMPOS_OBLIGATORIOS = ("nombre", "fecha_nacimiento", "provincia", "canton", "distrito", "num_empleado")
+FORMATOS_FECHA = ("%Y-%m-%d", "%d/%m/%Y")
+TIPOS = ("csv", "jsonl")
+MAX_MENSAJES = 20  # rechazos y advertencias que el reporte guarda con detalle
+
+
+def detectar_tipo(ruta: str) -> str:
+    """Tipo de entrada según la extensión del archivo"""
+    extension = os.path.splitext(ruta)[1].lower()
+    if extension in (".jsonl", ".ndjson"):
+        return "jsonl"
+    if extension == ".csv":
+        return "csv"
+    raise ValueError(f"No se reconoce el tipo de '{ruta}'. Indique 'csv' o 'jsonl'.")
+
+
+def leer_filas(ruta: str, tipo: str, codificacion: str = "utf-8-sig", delimitador: str = ","):
+    """
+    Produce (número de línea, fila) sin cargar el archivo completo. La fila
+    es un diccionario, o un ValueError si la línea JSON no se pudo leer.
+    """
+    with open(ruta, encoding=codificacion, newline="") as f:
+        if tipo == "csv":
+            filas = csv.DictReader(f, delimiter=delimitador)
+            faltantes = [campo for campo in CAMPOS_OBLIGATORIOS if campo not in (filas.fieldnames or ())]
+            if faltantes:
+                raise ValueError(f"Faltan columnas en '{ruta}': {', '.join(faltantes)}.")
+            for fila in filas:
+                yield filas.line_num, fila
+        elif tipo == "jsonl":
+            for numero, linea in enumerate(f, 1):
+                if not linea.strip():
+                    continue
+                try:
+                    fila = json.loads(linea)
+                    if not isinstance(fila, dict):
+                        raise ValueError("se esperaba un objeto")
+                except ValueError as e:
+                    fila = ValueError(f"JSON inválido: {e}")
+                yield numero, fila
+        else:
+            raise ValueError(f"Tipo de entrada desconocido: {tipo}. Opciones: {', '.join(TIPOS)}.")
+
+
+def recortar_utf8(texto: str, tamano: int) -> tuple:
+    """
+    Recorta un texto para que su UTF-8 quepa en 'tamano' bytes sin partir
+    ningún carácter. Retorna (texto, True si se recortó).
+    """
+    codificado = texto.encode("utf-8")
+    if len(codificado) <= tamano:
+        return texto, False
+    return codificado[:tamano].decode("utf-8", errors="ignore"), True
+
+
+def _fecha(valor) -> date:
+    """Fecha de nacimiento en alguno de los FORMATOS_FECHA"""
+    texto = str(valor).strip()
+    for formato in FORMATOS_FECHA:
+        try:
+            return datetime.strptime(texto, formato).date()
+        except ValueError:
+            pass
+    raise ValueError(f"fecha_nacimiento inválida: {texto!r}")
+
+
+def _entero(fila: dict, campo: str, minimo: int, maximo: int) -> int:
+    valor = fila[campo]
+    try:
+        numero = int(str(valor).strip())
+    except ValueError:
+        raise ValueError(f"{campo} inválido: {valor!r}")
+    if not minimo <= numero <= maximo:
+        raise ValueError(f"{campo} fuera de rango ({minimo}..{maximo}): {numero}")
+    return numero
+
+
+def validar_fila(fila: dict, formato: int = 1) -> tuple:
+    """
+    Convierte una fila en un registro del generador (con fecha_ordinal).
+    Lanza ValueError si falta un campo o algún valor no es válido.
+    Retorna (registro, campos que se recortaron al tamaño fijo).
+    En v1 la ubicación se recorta como el nombre; en v2 tiene que estar en
+    el diccionario (lo verifica generador_ordenado.empaquetar_registro).
+    """
+    faltantes = [campo for campo in CAMPOS_OBLIGATORIOS if fila.get(campo) in (None, "")]
+    if faltantes:
+        raise ValueError(f"faltan {', '.join(faltantes)}")
+    num_empleado = _entero(fila, 'num_empleado', 0, generador.CLAVE_MAX_PERMITIDA)
+    nacimiento = _fecha(fila['fecha_nacimiento'])
+    if fila.get('edad') in (None, ""):
+        hoy = date.today()
+        edad = max(0, min(255, hoy.year - nacimiento.year - ((hoy.month, hoy.day) < (nacimiento.month, nacimiento.day))))
+    else:
+        edad = _entero(fila, 'edad', 0, 255)
+
+    recortados = []
+    nombre, recortado = recortar_utf8(str(fila['nombre']).strip(), generador.NAME_LEN)
+    if recortado:
+        recortados.append('nombre')
+    registro = {'nombre': nombre, 'edad': edad, 'fecha_ordinal': nacimiento.toordinal(),
+                'num_empleado': num_empleado}
+    for campo, tamano in (('provincia', generador.PROV_LEN), ('canton', generador.CANT_LEN),
+                          ('distrito', generador.DIST_LEN)):
+        texto = str(fila[campo]).strip()
+        if formato == 1:
+            texto, recortado = recortar_utf8(texto, tamano)
+            if recortado:
+                recortados.append(campo)
+        registro[campo] = texto
+    return registro, recortados
+
+
+def ingerir(entrada: str, filename: str, formato: int = 1, tipo: str = None,
+            registros_por_lote: int = generador.REGISTROS_POR_LOTE, estricto: bool = False,
+            codificacion: str = "utf-8-sig", delimitador: str = ",", agregados: bool = False,
+            **indices) -> dict:
+    """
+    Carga un CSV o JSONL en un .bin ordenado por num_empleado.
+    Las filas inválidas se rechazan y, de cada num_empleado repetido, se
+    conserva la primera fila de la entrada. Con 'estricto', la primera fila
+    rechazada o repetida cancela la ingesta y el destino no se modifica.
+    El .bin se escribe en un temporal y reemplaza al destino de forma
+    atómica; 'indices' son los parámetros de guardar_indices.
+    Retorna el reporte: filas leídas, escritos, rechazadas, duplicadas,
+    recortadas (con advertencia de UTF-8), mensajes (los primeros
+    MAX_MENSAJES), segundos y filas_por_s.
+    """
+    if formato not in generador.FORMATOS:
+        raise ValueError(f"Formato desconocido: {formato}. Use 1 o 2.")
+    if registros_por_lote < 1:
+        raise ValueError("La cantidad de registros por lote debe ser al menos 1.")
+    tipo = tipo or detectar_tipo(entrada)
+    tamano = generador.RECORD_SIZE if formato == 1 else generador.RECORD_SIZE_V2
+    reporte = {'filas': 0, 'escritos': 0, 'rechazadas': 0, 'duplicadas': 0, 'recortadas': 0, 'mensajes': []}
+
+    def anotar(mensaje: str):
+        if len(reporte['mensajes']) < MAX_MENSAJES:
+            reporte['mensajes'].append(mensaje)
+
+    inicio = time.perf_counter()
+    directorio = os.path.dirname(os.path.abspath(filename))
+    with tempfile.TemporaryDirectory(prefix="ingesta_", dir=directorio) as tmp:
+        # 1) Validar, empaquetar y guardar corridas ordenadas de registros_por_lote filas
+        corridas = []
+        lote = []
+        for linea, fila in leer_filas(entrada, tipo, codificacion, delimitador):
+            reporte['filas'] += 1
+            try:
+                if isinstance(fila, Exception):
+                    raise fila
+                registro, recortados = validar_fila(fila, formato)
+                packed = generador.empaquetar_registro(registro, formato)
+            except (ValueError, struct.error) as e:
+                mensaje = f"Línea {linea} rechazada: {e}"
+                if estricto:
+                    raise ValueError(mensaje)
+                reporte['rechazadas'] += 1
+                anotar(mensaje)
+                continue
+            if recortados:
+                reporte['recortadas'] += 1
+                anotar(f"Advertencia, línea {linea}: {', '.join(recortados)} no cabe en su tamaño fijo "
+                       f"y se recortó (UTF-8)")
+            lote.append(packed)
+            if len(lote) == registros_por_lote:
+                corridas.append(generador.escribir_corrida(lote, tmp))
+                lote = []
+
+        # 2) Todo cupo en un lote: se ordena en memoria; si no, mezcla de corridas
+        if corridas:
+            if lote:
+                corridas.append(generador.escribir_corrida(lote, tmp))
+            lote = None
+            ordenados = generador.mezclar_corridas(corridas, tmp, tamano)
+        else:
+            with metricas.fase("ordenar"):
+                lote.sort(key=generador.clave_empaquetada)
+            ordenados = lote
+
+        # 3) Escribir sin repetidos (la mezcla es estable: la primera fila va primero)
+        fd, temporal = tempfile.mkstemp(suffix=".tmp", dir=directorio)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                generador.escribir_cabecera(f, 0, formato)  # la cantidad se corrige al final
+                with generador.EscritorRegistros(f, formato=formato, agregados=agregados) as escritor:
+                    anterior = None
+                    for packed in ordenados:
+                        clave = generador.clave_empaquetada(packed)
+                        if clave == anterior:
+                            mensaje = (f"num_empleado {generador.KEY_STRUCT.unpack(clave)[0]} repetido: "
+                                       f"se conserva la primera fila")
+                            if estricto:
+                                raise ValueError(mensaje)
+                            reporte['duplicadas'] += 1
+                            anotar(mensaje)
+                            continue
+                        anterior = clave
+                        escritor.agregar_empaquetado(packed)
+                    if agregados:
+                        escritor.escribir_agregados()
+                f.seek(0)
+                generador.escribir_cabecera(f, escritor.cantidad, formato)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporal, filename)
+        except BaseException:
+            os.remove(temporal)
+            raise
+
+    generador.guardar_indices(filename, **indices)
+    segundos = time.perf_counter() - inicio
+    reporte['escritos'] = escritor.cantidad
+    reporte['segundos'] = round(segundos, 3)
+    reporte['filas_por_s'] = round(reporte['filas'] / segundos) if segundos > 0 else None
+    return reporte
+
+
+if __name__ == "__main__":
+    print("=== INGESTA DE EMPLEADOS (CSV / JSONL) ===")
+    entrada = input("Archivo de entrada (.csv o .jsonl): ").strip()
+    salida = input("Archivo .bin de salida: ").strip()
+    try:
+        resultado = ingerir(entrada, salida)
+        print(f"¡OK! {resultado['escritos']} registros escritos en '{salida}' "
+              f"({resultado['filas_por_s']} filas/s).")
+        print(f"Rechazadas: {resultado['rechazadas']}, repetidas: {resultado['duplicadas']}, "
+              f"recortadas: {resultado['recortadas']}")
+        for mensaje in resultado['mensajes']:
+            print(f"  {mensaje}")
+    except FileNotFoundError:
+        print(f"Error: El archivo '{entrada}' no existe.")
+    except Exception as e:
+        print(f"Error en la ingesta: {e}")
@@ -1,5 +1,21 @@
+import json
+import math
+import mmap
+import os
+import queue
 import struct
+import sys
+import threading
+import time
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date
+from operator import itemgetter
+
+import metricas
 
 COUNT_STRUCT = struct.Struct(">I")
 
@@ -11,120 +27,1824 @@ DIST_LEN = 20
 RECORD_STRUCT = struct.Struct(f">{NAME_LEN}s B I {PROV_LEN}s {CANT_LEN}s {DIST_LEN}s I")
 RECORD_SIZE = RECORD_STRUCT.size
 
+# --------- Formato v2 (compacto) ----------
+# Cabecera: magic, versión, cantidad de registros y largo del diccionario;
+# el diccionario guarda los textos de ubicación (>H cantidad y, por cada
+# texto, >B largo + UTF-8). Provincia, cantón y distrito se guardan como
+# códigos >H del diccionario; num_empleado sigue siendo el último campo.
+V2_HEADER_STRUCT = struct.Struct(">4s B I I")
+V2_MAGIC = b"EMP2"
+V2_VERSION = 2
+DICC_CANTIDAD_STRUCT = struct.Struct(">H")
+DICC_LARGO_STRUCT = struct.Struct(">B")
+RECORD_STRUCT_V2 = struct.Struct(f">{NAME_LEN}s B I H H H I")
+RECORD_SIZE_V2 = RECORD_STRUCT_V2.size
+
+# --------- Formato anterior (generador_registros.py) ----------
+# Misma cabecera >I que v1, pero los registros no tienen num_empleado.
+# No se puede buscar en él: se convierte con migracion.py.
+RECORD_STRUCT_LEGADO = struct.Struct(f">{NAME_LEN}s B I {PROV_LEN}s {CANT_LEN}s {DIST_LEN}s")
+RECORD_SIZE_LEGADO = RECORD_STRUCT_LEGADO.size
+
+# Estrategias de búsqueda disponibles en buscar_por_empleado ("auto" usa la
+# tabla de posiciones o el índice de bloques si existen y están al día, si no "binaria")
+ESTRATEGIAS = ("binaria", "interpolacion", "indice", "directa")
+
+# Pasos seguidos sin reducir el intervalo a la mitad antes de que la
+# búsqueda por interpolación se rinda y continúe como búsqueda binaria
+MAX_PASOS_LENTOS = 2
+
+# num_empleado son los últimos 4 bytes de cada registro
+KEY_STRUCT = struct.Struct(">I")
+
+# Lecturas secuenciales (rangos y recorridos) en bloques de ~1 MiB
+REGISTROS_POR_LECTURA = (1 << 20) // RECORD_SIZE
+
+# Índice de bloques (.idx) escrito por generador_ordenado.guardar_indice_bloques
+IDX_HEADER_STRUCT = struct.Struct(">4s B I I Q q")
+IDX_MAGIC = b"EIDX"
+IDX_VERSION = 1
+IDX_EXTENSION = ".idx"
+
+# Índice de ubicación (.ubi) escrito por generador_ordenado.guardar_indice_ubicacion
+UBI_HEADER_STRUCT = struct.Struct(">4s B I Q q")
+UBI_MAGIC = b"EUBI"
+UBI_VERSION = 1
+UBI_EXTENSION = ".ubi"
+UBI_CANTIDAD_STRUCT = struct.Struct(">H")
+UBI_VALOR_STRUCT = struct.Struct(">B I")
+CAMPOS_UBICACION = ("provincia", "canton", "distrito")
+
+# Tabla de posiciones (.pos) escrita por generador_ordenado.guardar_indice_posiciones
+# magic, versión, tipo de tabla, parámetro (clave base o bits del hash),
+# cantidad de ranuras, cantidad de registros, tamaño y mtime (ns) del .bin
+POS_HEADER_STRUCT = struct.Struct(">4s B B I I I Q q")
+POS_MAGIC = b"EPOS"
+POS_VERSION = 1
+POS_EXTENSION = ".pos"
+POS_DIRECTA = 0   # una ranura >I por clave de base..base+ranuras-1 (0 = no existe)
+POS_HASH = 1      # 2**bits ranuras (clave >I, posición >I) con sondeo lineal
+
+# Filtro de Bloom (.blm) escrito por generador_ordenado.guardar_filtro_bloom
+# magic, versión, cantidad de bits, cantidad de funciones hash, cantidad de
+# registros, tamaño y mtime (ns) del .bin; siguen los bits del filtro
+BLM_HEADER_STRUCT = struct.Struct(">4s B Q B I Q q")
+BLM_MAGIC = b"EBLM"
+BLM_VERSION = 1
+BLM_EXTENSION = ".blm"
+
+# Archivo de cambios (.delta) escrito por actualizaciones.py: magic y versión,
+# y luego operaciones en orden: b"+" + registro (RECORD_STRUCT, alta o
+# reemplazo) o b"-" + num_empleado (KEY_STRUCT, baja). Se aplica sobre el .bin
+# al leer hasta que una compactación lo incorpora.
+DELTA_HEADER_STRUCT = struct.Struct(">4s B")
+DELTA_MAGIC = b"EDLT"
+DELTA_VERSION = 1
+DELTA_EXTENSION = ".delta"
+OP_INSERTAR = b"+"
+OP_ELIMINAR = b"-"
+
+# Agregados precalculados: cola opcional después del último registro, escrita
+# por generador_ordenado con agregados=True. Tres listas de conteos, cada una
+# con su cantidad >H: por provincia (>B largo + UTF-8, >I cantidad), por edad
+# y por año de nacimiento (>I valor, >I cantidad). Termina con AGG_PIE_STRUCT:
+# magic, versión, cantidad de registros (debe coincidir con la cabecera) y
+# largo de las listas, para poder ubicarla desde el final del archivo.
+AGG_PIE_STRUCT = struct.Struct(">4s B I I")
+AGG_MAGIC = b"EAGG"
+AGG_VERSION = 1
+AGG_CANTIDAD_STRUCT = struct.Struct(">H")
+AGG_ENTRADA_STRUCT = struct.Struct(">I I")
+
+# Conjunto particionado: un manifiesto JSON (generador_ordenado.generar_conjunto_particionado)
+# con la lista de particiones, cada una un .bin normal con un rango contiguo
+# de num_empleado; los rangos están ordenados y no se solapan
+MANIFIESTO_EXTENSION = ".manifiesto"
+MANIFIESTO_VERSION = 1
+HILOS_PARTICIONES = 8             # hilos para repartir rangos y lotes entre particiones
+REGISTROS_POR_TROZO_RANGO = 1024  # registros que entrega cada partición por vez en un rango
+TROZOS_EN_ESPERA = 4              # trozos leídos por adelantado por partición
+
+# Consultas al filtro de Bloom y búsquedas evitadas, sumadas entre todas las sesiones
+_CONTADORES_BLOOM = {'consultas': 0, 'fallos_evitados': 0}
+
+# Índices ya cargados en memoria: (ruta absoluta, extensión) -> (firma del .bin, índice)
+_INDICES_CARGADOS = {}
+
+# Caché de bloques (ver CacheBloques)
+REGISTROS_POR_BLOQUE_CACHE = 4096 // RECORD_SIZE  # bloques de aprox. una página
+PRESUPUESTO_CACHE = 8 << 20                       # 8 MiB por defecto
+NIVELES_FIJOS = 6                                 # niveles de la búsqueda binaria que no se expulsan
+
 
 def unpack_fixed_str(b: bytes) -> str:
     """Convierte bytes a string, eliminando caracteres nulos"""
     return b.split(b"\0", 1)[0].decode("utf-8", errors="replace")
 
 
-def leer_cabecera(filename: str) -> int:
-    """Lee la cabecera del archivo y retorna el número de registros"""
+def _construir_registro(campos: tuple) -> dict:
+    """Convierte la tupla desempaquetada de RECORD_STRUCT en un diccionario"""
+    nombre_b, edad, fecha_ord, prov_b, canton_b, dist_b, num_empleado = campos
+    return {
+        'nombre': unpack_fixed_str(nombre_b),
+        'edad': int(edad),
+        'fecha_nacimiento': date.fromordinal(fecha_ord),
+        'provincia': unpack_fixed_str(prov_b),
+        'canton': unpack_fixed_str(canton_b),
+        'distrito': unpack_fixed_str(dist_b),
+        'num_empleado': num_empleado
+    }
+
+
+def _cargar_indice_bloques(filename: str, firma: tuple):
+    """
+    Carga el índice de bloques de un .bin si existe y corresponde a 'firma'
+    (cantidad de registros, tamaño y mtime del .bin). El índice se lee del
+    disco una sola vez por proceso mientras el .bin no cambie.
+    Retorna (registros_por_bloque, primeras_claves) o None si no hay índice
+    válido.
+    """
+    ruta = (os.path.abspath(filename), IDX_EXTENSION)
+    cargado = _INDICES_CARGADOS.get(ruta)
+    if cargado is not None and cargado[0] == firma:
+        return cargado[1]
+
+    indice = None
+    try:
+        with open(filename + IDX_EXTENSION, "rb") as f:
+            datos = f.read()
+        magic, version, por_bloque, n, tamano, mtime_ns = IDX_HEADER_STRUCT.unpack_from(datos, 0)
+        claves = array("I")
+        claves.frombytes(datos[IDX_HEADER_STRUCT.size:])
+        if sys.byteorder == "little":
+            claves.byteswap()  # el índice se guarda en big-endian
+        bloques_esperados = -(-n // por_bloque) if por_bloque else -1
+        if (magic, version) == (IDX_MAGIC, IDX_VERSION) and (n, tamano, mtime_ns) == firma \
+                and len(claves) == bloques_esperados:
+            indice = (por_bloque, claves)
+    except (OSError, struct.error, ValueError):
+        indice = None  # sin índice o índice dañado: se usa la búsqueda normal
+
+    _INDICES_CARGADOS[ruta] = (firma, indice)
+    return indice
+
+
+def _cargar_indice_ubicacion(filename: str, firma: tuple):
+    """
+    Carga el índice de ubicación de un .bin si existe y corresponde a 'firma'.
+    Retorna una tupla con un diccionario por campo (ver CAMPOS_UBICACION)
+    texto -> bitmap (int, bit i = posición i+1), o None si no hay índice válido.
+    """
+    ruta = (os.path.abspath(filename), UBI_EXTENSION)
+    cargado = _INDICES_CARGADOS.get(ruta)
+    if cargado is not None and cargado[0] == firma:
+        return cargado[1]
+
+    indice = None
+    try:
+        with open(filename + UBI_EXTENSION, "rb") as f:
+            datos = f.read()
+        magic, version, n, tamano, mtime_ns = UBI_HEADER_STRUCT.unpack_from(datos, 0)
+        if (magic, version) == (UBI_MAGIC, UBI_VERSION) and (n, tamano, mtime_ns) == firma:
+            offset = UBI_HEADER_STRUCT.size
+            campos = []
+            for _ in CAMPOS_UBICACION:
+                (cantidad,) = UBI_CANTIDAD_STRUCT.unpack_from(datos, offset)
+                offset += UBI_CANTIDAD_STRUCT.size
+                valores = {}
+                for _ in range(cantidad):
+                    largo_texto, largo_bitmap = UBI_VALOR_STRUCT.unpack_from(datos, offset)
+                    offset += UBI_VALOR_STRUCT.size
+                    texto = datos[offset:offset + largo_texto].decode("utf-8", errors="replace")
+                    offset += largo_texto
+                    bitmap = zlib.decompress(datos[offset:offset + largo_bitmap])
+                    offset += largo_bitmap
+                    valores[texto] = int.from_bytes(bitmap, "little")
+                campos.append(valores)
+            indice = tuple(campos)
+    except (OSError, struct.error, ValueError, zlib.error):
+        indice = None  # sin índice o índice dañado: se recorre el archivo
+
+    _INDICES_CARGADOS[ruta] = (firma, indice)
+    return indice
+
+
+def ranura_hash(clave: int, bits: int) -> int:
+    """Ranura inicial de una clave en una tabla hash de 2**bits ranuras (hash de Fibonacci)"""
+    return ((clave * 0x9E3779B1) & 0xFFFFFFFF) >> (32 - bits)
+
+
+def cargar_cambios(filename: str):
+    """
+    Carga el archivo de cambios (.delta) de un .bin como memtable ordenada.
+    Se vuelve a leer solo si el .delta cambió (tamaño o mtime).
+    Retorna (claves ordenadas, diccionario clave -> registro o None si se
+    eliminó), o None si no hay cambios pendientes.
+    Una última operación incompleta (escritura interrumpida) se ignora.
+    """
+    ruta = filename + DELTA_EXTENSION
+    try:
+        st = os.stat(ruta)
+    except FileNotFoundError:
+        return None
+    clave_cache = (os.path.abspath(filename), DELTA_EXTENSION)
+    firma = (st.st_size, st.st_mtime_ns)
+    cargado = _INDICES_CARGADOS.get(clave_cache)
+    if cargado is not None and cargado[0] == firma:
+        return cargado[1]
+
+    with open(ruta, "rb") as f:
+        datos = f.read()
+    magic, version = DELTA_HEADER_STRUCT.unpack_from(datos, 0)
+    if (magic, version) != (DELTA_MAGIC, DELTA_VERSION):
+        raise ValueError(f"El archivo de cambios '{ruta}' no es válido.")
+
+    memtable = {}
+    offset = DELTA_HEADER_STRUCT.size
+    while offset < len(datos):
+        op = datos[offset:offset + 1]
+        offset += 1
+        if op == OP_INSERTAR and offset + RECORD_SIZE <= len(datos):
+            registro = _construir_registro(RECORD_STRUCT.unpack_from(datos, offset))
+            registro['posicion'] = None  # todavía no está en el .bin
+            memtable[registro['num_empleado']] = registro
+            offset += RECORD_SIZE
+        elif op == OP_ELIMINAR and offset + KEY_STRUCT.size <= len(datos):
+            memtable[KEY_STRUCT.unpack_from(datos, offset)[0]] = None
+            offset += KEY_STRUCT.size
+        else:
+            break  # operación desconocida o incompleta: se descarta el resto
+
+    cambios = (sorted(memtable), memtable) if memtable else None
+    _INDICES_CARGADOS[clave_cache] = (firma, cambios)
+    return cambios
+
+
+def olvidar_indices(filename: str):
+    """
+    Descarta los índices auxiliares guardados en memoria para un .bin (por
+    ejemplo, después de escribir uno nuevo sin modificar el .bin)
+    """
+    ruta = os.path.abspath(filename)
+    for clave in [clave for clave in _INDICES_CARGADOS if clave[0] == ruta]:
+        del _INDICES_CARGADOS[clave]
+
+
+def posiciones_bloom(clave: int, bits: int, funciones: int):
+    """Bits del filtro de Bloom que corresponden a una clave (doble hashing)"""
+    h1 = (clave * 0x9E3779B1) & 0xFFFFFFFF
+    h2 = (((clave ^ (clave >> 16)) * 0x85EBCA6B) & 0xFFFFFFFF) | 1
+    return [(h1 + i * h2) % bits for i in range(funciones)]
+
+
+def _cargar_filtro_bloom(filename: str, firma: tuple):
+    """
+    Carga el filtro de Bloom de un .bin si existe y corresponde a 'firma'.
+    Retorna (cantidad de bits, cantidad de funciones, bits en bytes) o None.
+    """
+    ruta = (os.path.abspath(filename), BLM_EXTENSION)
+    cargado = _INDICES_CARGADOS.get(ruta)
+    if cargado is not None and cargado[0] == firma:
+        return cargado[1]
+
+    filtro = None
+    try:
+        with open(filename + BLM_EXTENSION, "rb") as f:
+            datos = f.read()
+        magic, version, bits, funciones, n, tamano, mtime_ns = BLM_HEADER_STRUCT.unpack_from(datos, 0)
+        contenido = datos[BLM_HEADER_STRUCT.size:]
+        if (magic, version) == (BLM_MAGIC, BLM_VERSION) and (n, tamano, mtime_ns) == firma \
+                and bits > 0 and funciones > 0 and len(contenido) == (bits + 7) // 8:
+            filtro = (bits, funciones, contenido)
+    except (OSError, struct.error, ValueError):
+        filtro = None  # sin filtro o filtro dañado: se busca siempre
+
+    _INDICES_CARGADOS[ruta] = (firma, filtro)
+    return filtro
+
+
+def _cargar_indice_posiciones(filename: str, firma: tuple):
+    """
+    Carga la tabla de posiciones de un .bin si existe y corresponde a 'firma'.
+    Retorna (tipo, parámetro, tabla) con la tabla como array('I'), o None si
+    no hay tabla válida.
+    """
+    ruta = (os.path.abspath(filename), POS_EXTENSION)
+    cargado = _INDICES_CARGADOS.get(ruta)
+    if cargado is not None and cargado[0] == firma:
+        return cargado[1]
+
+    indice = None
+    try:
+        with open(filename + POS_EXTENSION, "rb") as f:
+            datos = f.read()
+        magic, version, tipo, parametro, ranuras, n, tamano, mtime_ns = POS_HEADER_STRUCT.unpack_from(datos, 0)
+        tabla = array("I")
+        tabla.frombytes(datos[POS_HEADER_STRUCT.size:])
+        if sys.byteorder == "little":
+            tabla.byteswap()  # la tabla se guarda en big-endian
+        por_ranura = 1 if tipo == POS_DIRECTA else 2
+        if (magic, version) == (POS_MAGIC, POS_VERSION) and (n, tamano, mtime_ns) == firma \
+                and tipo in (POS_DIRECTA, POS_HASH) and len(tabla) == ranuras * por_ranura \
+                and (tipo == POS_DIRECTA or (1 <= parametro <= 32 and ranuras == 1 << parametro)):
+            indice = (tipo, parametro, tabla)
+    except (OSError, struct.error, ValueError):
+        indice = None  # sin tabla o tabla dañada: se usa la búsqueda normal
+
+    _INDICES_CARGADOS[ruta] = (firma, indice)
+    return indice
+
+
+def _coincide_ubicacion(registro: dict, filtros: dict) -> bool:
+    """True si el registro cumple los filtros de ubicación (los None no filtran)"""
+    return all(valor is None or registro[campo] == valor for campo, valor in filtros.items())
+
+
+def _posiciones_de_bitmap(bitmap: int):
+    """Produce en orden las posiciones (1-based) de los bits encendidos de un bitmap"""
+    datos = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, "little")
+    for indice_byte, byte in enumerate(datos):
+        if byte:
+            base = indice_byte * 8 + 1
+            for bit in range(8):
+                if byte >> bit & 1:
+                    yield base + bit
+
+
+class CacheBloques:
+    """
+    Caché LRU de bloques de registros, compartida entre sesiones y archivos.
+    Cada bloque tiene 'registros_por_bloque' registros consecutivos alineados
+    al inicio de los datos. Cuando los bytes guardados superan el
+    presupuesto se expulsan los bloques usados hace más tiempo, excepto los
+    que contienen los primeros 'niveles_fijos' niveles de la búsqueda
+    binaria, que se consultan en todas las búsquedas y quedan fijos.
+    Si el tamaño o el mtime de un archivo cambian, sus bloques se descartan.
+    """
+
+    def __init__(self, presupuesto_bytes: int = PRESUPUESTO_CACHE,
+                 registros_por_bloque: int = REGISTROS_POR_BLOQUE_CACHE,
+                 niveles_fijos: int = NIVELES_FIJOS):
+        if registros_por_bloque < 1:
+            raise ValueError("La cantidad de registros por bloque debe ser al menos 1.")
+        self.presupuesto_bytes = presupuesto_bytes
+        self.registros_por_bloque = registros_por_bloque
+        self.niveles_fijos = niveles_fijos
+        self._bloques = OrderedDict()  # (ruta, bloque) -> bytes, del menos al más reciente
+        self._fijos = {}               # (ruta, bloque) -> bytes que no se expulsan
+        self._archivos = {}            # ruta -> (firma, disposición, bloques a fijar)
+        self._lock = threading.Lock()
+        self.bytes_usados = 0
+        # Aciertos por hilo (el camino de acierto no toma el lock); se suman en 'aciertos'
+        self._local = threading.local()
+        self._aciertos_por_hilo = []
+        self.fallos = 0
+        self.expulsiones = 0
+
+    @property
+    def aciertos(self) -> int:
+        """Aciertos de todos los hilos"""
+        return sum(contador[0] for contador in self._aciertos_por_hilo)
+
+    def _contador_aciertos(self) -> list:
+        """Contador de aciertos del hilo actual (se crea la primera vez)"""
+        contador = [0]
+        self._local.aciertos = contador
+        with self._lock:
+            self._aciertos_por_hilo.append(contador)
+        return contador
+
+    def abrir(self, ruta: str, firma: tuple, leer_cabecera) -> dict:
+        """
+        Registra un archivo con su firma (tamaño, mtime) y retorna la
+        disposición de su cabecera (ver leer_disposicion); solo llama a
+        leer_cabecera() si no la tiene guardada. Si la firma cambió,
+        descarta los bloques viejos.
+        """
+        with self._lock:
+            datos = self._archivos.get(ruta)
+            if datos is not None and datos[0] == firma:
+                return datos[1]
+            self._descartar(ruta)
+
+        disposicion = leer_cabecera()
+        a_fijar = self._bloques_de_niveles(disposicion['num_registros'], disposicion['tamano_registro'])
+        with self._lock:
+            self._archivos[ruta] = (firma, disposicion, a_fijar)
+        return disposicion
+
+    def _bloques_de_niveles(self, n: int, tamano_registro: int) -> set:
+        """Bloques que tocan los primeros niveles_fijos niveles de una búsqueda binaria en 1..n"""
+        bloques = set()
+        intervalos = [(1, n)]
+        # Los bloques fijos no pueden ocupar más de la mitad del presupuesto
+        max_fijos = self.presupuesto_bytes // 2 // (self.registros_por_bloque * tamano_registro)
+        for _ in range(self.niveles_fijos):
+            if len(bloques) + len(intervalos) > max_fijos:
+                break
+            siguientes = []
+            for inferior, superior in intervalos:
+                if inferior > superior:
+                    continue
+                medio = (inferior + superior) // 2
+                bloques.add((medio - 1) // self.registros_por_bloque)
+                siguientes.append((inferior, medio - 1))
+                siguientes.append((medio + 1, superior))
+            intervalos = siguientes
+        return bloques
+
+    def obtener(self, ruta: str, bloque: int, cargar) -> bytes:
+        """Retorna el bloque pedido; si no está guardado lo lee con cargar(bloque)"""
+        clave = (ruta, bloque)
+        # Camino de acierto sin lock: get y move_to_end ya son atómicos
+        datos = self._fijos.get(clave)
+        if datos is None:
+            datos = self._bloques.get(clave)
+            if datos is not None:
+                try:
+                    self._bloques.move_to_end(clave)
+                except KeyError:
+                    pass  # otro hilo lo acaba de expulsar; igual sirve esta vez
+        if datos is not None:
+            # Cada hilo suma solo en su contador, así no se pierden aciertos
+            try:
+                self._local.aciertos[0] += 1
+            except AttributeError:
+                self._contador_aciertos()[0] += 1
+            return datos
+
+        datos = cargar(bloque)
+
+        with self._lock:
+            self.fallos += 1
+            archivo = self._archivos.get(ruta)
+            tabla = self._fijos if archivo is not None and bloque in archivo[2] else self._bloques
+            previo = tabla.get(clave)  # otro hilo pudo cargar el mismo bloque
+            tabla[clave] = datos
+            self.bytes_usados += len(datos) - (len(previo) if previo is not None else 0)
+            while self.bytes_usados > self.presupuesto_bytes and self._bloques:
+                _, expulsado = self._bloques.popitem(last=False)
+                self.bytes_usados -= len(expulsado)
+                self.expulsiones += 1
+        return datos
+
+    def _descartar(self, ruta: str):
+        """Quita todos los bloques de un archivo (se llama con el lock tomado)"""
+        self._archivos.pop(ruta, None)
+        for tabla in (self._bloques, self._fijos):
+            for clave in [c for c in tabla if c[0] == ruta]:
+                self.bytes_usados -= len(tabla.pop(clave))
+
+    def invalidar(self, ruta: str = None):
+        """Descarta los bloques de un archivo, o de todos si no se indica la ruta"""
+        with self._lock:
+            rutas = [os.path.abspath(ruta)] if ruta is not None else list(self._archivos)
+            for r in rutas:
+                self._descartar(r)
+
+    def estadisticas(self) -> dict:
+        """Contadores de uso de la caché"""
+        with self._lock:
+            return {
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'expulsiones': self.expulsiones,
+                'bloques': len(self._bloques),
+                'bloques_fijos': len(self._fijos),
+                'bytes_usados': self.bytes_usados,
+                'presupuesto_bytes': self.presupuesto_bytes
+            }
+
+
+# Caché compartida por las funciones del módulo (leer_por_posicion, buscar_por_empleado, ...)
+CACHE_COMPARTIDA = CacheBloques()
+
+
+def _construir_registro_v2(campos: tuple, diccionario: tuple) -> dict:
+    """Convierte la tupla desempaquetada de RECORD_STRUCT_V2 en un diccionario"""
+    nombre_b, edad, fecha_ord, prov, canton, dist, num_empleado = campos
+    return {
+        'nombre': unpack_fixed_str(nombre_b),
+        'edad': int(edad),
+        'fecha_nacimiento': date.fromordinal(fecha_ord),
+        'provincia': diccionario[prov],
+        'canton': diccionario[canton],
+        'distrito': diccionario[dist],
+        'num_empleado': num_empleado
+    }
+
+
+def _tamano_agregados(leer, tamano_archivo: int, fin_datos: int, n: int) -> int:
+    """
+    Tamaño de la cola de agregados que empieza en 'fin_datos' (0 si no hay
+    una válida: sin magic, de otra cantidad de registros o de otro largo)
+    """
+    if tamano_archivo < fin_datos + AGG_PIE_STRUCT.size:
+        return 0
+    try:
+        magic, version, cantidad, largo = AGG_PIE_STRUCT.unpack(
+            leer(tamano_archivo - AGG_PIE_STRUCT.size, AGG_PIE_STRUCT.size))
+    except struct.error:
+        return 0
+    if (magic, version, cantidad) == (AGG_MAGIC, AGG_VERSION, n) \
+            and fin_datos + largo + AGG_PIE_STRUCT.size == tamano_archivo:
+        return largo + AGG_PIE_STRUCT.size
+    return 0
+
+
+def es_formato_legado(n: int, tamano_archivo: int) -> bool:
+    """
+    True si un archivo con n registros en la cabecera mide exactamente lo
+    de n registros del formato anterior (sin num_empleado)
+    """
+    return n > 0 and tamano_archivo == COUNT_STRUCT.size + n * RECORD_SIZE_LEGADO
+
+
+def leer_disposicion(leer, tamano_archivo: int) -> dict:
+    """
+    Detecta el formato de un archivo de empleados (v1 o v2) a partir de su
+    cabecera. 'leer(offset, cantidad)' debe retornar bytes del archivo.
+    Retorna un diccionario con formato, num_registros, inicio_datos,
+    tamano_registro, diccionario (textos de ubicación, solo en v2) y
+    tamano_agregados (bytes de la cola de agregados, 0 si no tiene).
+    Los archivos del formato anterior (sin num_empleado) se rechazan con
+    ValueError en vez de leerse como v1 desalineados.
+    """
+    if tamano_archivo < COUNT_STRUCT.size:
+        raise IOError("El archivo es demasiado pequeño para contener la cabecera.")
+    inicio = leer(0, COUNT_STRUCT.size)
+    (n,) = COUNT_STRUCT.unpack(inicio)
+
+    # Un v1 que empiece con los bytes del magic tendría que medir exactamente
+    # lo de sus registros (más la cola de agregados, si la tiene)
+    fin_v1 = COUNT_STRUCT.size + n * RECORD_SIZE
+    agregados_v1 = _tamano_agregados(leer, tamano_archivo, fin_v1, n)
+    if not agregados_v1 and es_formato_legado(n, tamano_archivo):
+        raise ValueError(f"El archivo tiene el formato anterior sin num_empleado ({n} registros de "
+                         f"{RECORD_SIZE_LEGADO} bytes). Conviértalo con migracion.py.")
+    if inicio != V2_MAGIC or tamano_archivo == fin_v1 or agregados_v1:
+        return {'formato': 1, 'num_registros': n, 'inicio_datos': COUNT_STRUCT.size,
+                'tamano_registro': RECORD_SIZE, 'diccionario': None, 'tamano_agregados': agregados_v1}
+
+    if tamano_archivo < V2_HEADER_STRUCT.size:
+        raise IOError("Cabecera v2 incompleta.")
+    _, version, n, largo_diccionario = V2_HEADER_STRUCT.unpack(leer(0, V2_HEADER_STRUCT.size))
+    if version != V2_VERSION:
+        raise ValueError(f"Versión de formato no soportada: {version}.")
+    datos = leer(V2_HEADER_STRUCT.size, largo_diccionario)
+    if len(datos) != largo_diccionario:
+        raise IOError("Diccionario v2 incompleto.")
+    (cantidad,) = DICC_CANTIDAD_STRUCT.unpack_from(datos, 0)
+    offset = DICC_CANTIDAD_STRUCT.size
+    textos = []
+    for _ in range(cantidad):
+        (largo,) = DICC_LARGO_STRUCT.unpack_from(datos, offset)
+        offset += DICC_LARGO_STRUCT.size
+        textos.append(datos[offset:offset + largo].decode("utf-8", errors="replace"))
+        offset += largo
+    inicio_datos = V2_HEADER_STRUCT.size + largo_diccionario
+    return {'formato': 2, 'num_registros': n, 'inicio_datos': inicio_datos,
+            'tamano_registro': RECORD_SIZE_V2, 'diccionario': tuple(textos),
+            'tamano_agregados': _tamano_agregados(leer, tamano_archivo,
+                                                  inicio_datos + n * RECORD_SIZE_V2, n)}
+
+
+def leer_disposicion_archivo(filename: str) -> dict:
+    """
+    leer_disposicion de un archivo por su nombre, leyendo solo la cabecera
+    (sin abrir una sesión ni cargar el archivo de cambios)
+    """
     try:
         with open(filename, "rb") as f:
-            f.seek(0)
-            (n,) = COUNT_STRUCT.unpack(f.read(COUNT_STRUCT.size))
-            return n
+            def leer(offset: int, cantidad: int) -> bytes:
+                f.seek(offset)
+                return f.read(cantidad)
+            return leer_disposicion(leer, os.fstat(f.fileno()).st_size)
     except FileNotFoundError:
         raise FileNotFoundError(f"Archivo '{filename}' no encontrado.")
-    except Exception as e:
-        raise Exception(f"Error al leer cabecera: {e}")
 
+def _leer_agregados(datos: bytes) -> dict:
+    """Conteos guardados en la cola de agregados (sin el pie)"""
+    offset = 0
+    (cantidad,) = AGG_CANTIDAD_STRUCT.unpack_from(datos, offset)
+    offset += AGG_CANTIDAD_STRUCT.size
+    por_provincia = {}
+    for _ in range(cantidad):
+        (largo,) = DICC_LARGO_STRUCT.unpack_from(datos, offset)
+        offset += DICC_LARGO_STRUCT.size
+        texto = datos[offset:offset + largo].decode("utf-8", errors="replace")
+        offset += largo
+        por_provincia[texto] = COUNT_STRUCT.unpack_from(datos, offset)[0]
+        offset += COUNT_STRUCT.size
+    listas = []
+    for _ in range(2):  # por edad y por año de nacimiento
+        (cantidad,) = AGG_CANTIDAD_STRUCT.unpack_from(datos, offset)
+        offset += AGG_CANTIDAD_STRUCT.size
+        listas.append(dict(AGG_ENTRADA_STRUCT.iter_unpack(
+            datos[offset:offset + cantidad * AGG_ENTRADA_STRUCT.size])))
+        offset += cantidad * AGG_ENTRADA_STRUCT.size
+    return {'por_provincia': por_provincia, 'por_edad': listas[0], 'por_anio_nacimiento': listas[1]}
 
-def leer_por_posicion(filename: str, posicion_1based: int) -> dict:
+
+def _sumar_registro(estadisticas: dict, registro: dict, signo: int):
+    """Suma (signo 1) o descuenta (signo -1) un registro de los conteos"""
+    estadisticas['num_registros'] += signo
+    for conteo, valor in (('por_provincia', registro['provincia']), ('por_edad', registro['edad']),
+                          ('por_anio_nacimiento', registro['fecha_nacimiento'].year)):
+        valores = estadisticas[conteo]
+        valores[valor] = valores.get(valor, 0) + signo
+        if not valores[valor]:
+            del valores[valor]
+
+
+class _SondeosPorHilo:
     """
-    Lee un registro del archivo por su posición (1-based)
-    Retorna un diccionario con los datos del registro
+    ultimos_sondeos guardado por hilo: varios hilos pueden buscar en la
+    misma sesión y cada uno ve los sondeos de su propia búsqueda
     """
-    # Leer cabecera para obtener cantidad de registros
-    n = leer_cabecera(filename)
-    
-    if posicion_1based < 1 or posicion_1based > n:
-        raise ValueError(f"Posición inválida: {posicion_1based}. Debe estar entre 1 y {n}.")
-    
-    with open(filename, "rb") as f:
-        # Calcular offset (cabecera + (posicion-1) * tamaño_registro)
-        header_size = COUNT_STRUCT.size
-        offset = header_size + (posicion_1based - 1) * RECORD_SIZE
+
+    @property
+    def ultimos_sondeos(self) -> int:
+        return getattr(self._sondeos, 'valor', 0)
+
+    @ultimos_sondeos.setter
+    def ultimos_sondeos(self, valor: int):
+        self._sondeos.valor = valor
+
+
+class ArchivoEmpleados(_SondeosPorHilo):
+    """
+    Sesión de lectura sobre un archivo de empleados.
+    Abre el archivo una sola vez, lo mapea en memoria (mmap) y guarda la
+    cantidad de registros de la cabecera para todas las consultas.
+    Con 'cache' (una CacheBloques) no se mapea el archivo: las lecturas
+    puntuales pasan por la caché de bloques y el archivo solo se abre si
+    hace falta leer algo que no está guardado.
+    Se puede usar con 'with' para cerrarlo automáticamente.
+    """
+
+    def __init__(self, filename: str, usar_indice: bool = True, cache: CacheBloques = None):
+        self.filename = filename
+        self._indice = None
+        self._posiciones = None
+        self._bloom = None
+        self._cambios = None
+        self._cache = cache
+        self._f = None
+        self._mm = None
+        self._sondeos = threading.local()
+        self.ultimos_sondeos = 0  # cantidad de sondeos de la última búsqueda (de este hilo)
+        self.fallos_evitados = 0  # búsquedas descartadas por el filtro de Bloom
+        try:
+            if cache is None:
+                self._f = open(filename, "rb")
+                st = os.fstat(self._f.fileno())
+            else:
+                st = os.stat(filename)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Archivo '{filename}' no encontrado.")
+
+        try:
+            self.tamano_real = st.st_size
+            if self.tamano_real < COUNT_STRUCT.size:
+                raise IOError("El archivo es demasiado pequeño para contener la cabecera.")
+            if cache is None:
+                self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+                disposicion = leer_disposicion(self._leer_directo, self.tamano_real)
+            else:
+                self._ruta = os.path.abspath(filename)
+                disposicion = cache.abrir(self._ruta, (st.st_size, st.st_mtime_ns),
+                                          lambda: leer_disposicion(self._leer_directo, self.tamano_real))
+                self._clave_en = self._clave_en_cache
+                self._tamano_bloque = cache.registros_por_bloque * disposicion['tamano_registro']
+
+            # Formato del archivo: v1 (RECORD_STRUCT) o v2 (RECORD_STRUCT_V2 + diccionario)
+            self.formato = disposicion['formato']
+            self.num_registros = disposicion['num_registros']
+            self.inicio_datos = disposicion['inicio_datos']
+            self.tamano_registro = disposicion['tamano_registro']
+            self.tamano_agregados = disposicion['tamano_agregados']
+            self._diccionario = disposicion['diccionario']
+            self._offset_clave = self.tamano_registro - KEY_STRUCT.size
+            if self.formato == 2:
+                self._struct = RECORD_STRUCT_V2
+                diccionario = disposicion['diccionario']
+                self._decodificar = lambda campos: _construir_registro_v2(campos, diccionario)
+            else:
+                self._struct = RECORD_STRUCT
+                self._decodificar = _construir_registro
+
+            # Registros completos realmente presentes (protege contra archivos truncados)
+            self._n_completos = max(0, min(self.num_registros,
+                                           (self.tamano_real - self.inicio_datos) // self.tamano_registro))
+        except Exception as e:
+            self.cerrar()
+            raise Exception(f"Error al leer cabecera: {e}")
+
+        self._firma = (self.num_registros, st.st_size, st.st_mtime_ns)
+        if usar_indice:
+            self._indice = _cargar_indice_bloques(filename, self._firma)
+            self._posiciones = _cargar_indice_posiciones(filename, self._firma)
+            self._bloom = _cargar_filtro_bloom(filename, self._firma)
+        try:
+            self._cambios = cargar_cambios(filename)
+        except Exception:
+            self.cerrar()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.cerrar()
+
+    def cerrar(self):
+        """Libera el mapeo en memoria y cierra el archivo"""
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+    def _archivo(self):
+        """Archivo abierto para lecturas directas (se abre la primera vez que hace falta)"""
+        if self._f is None:
+            self._f = open(self.filename, "rb")
+        return self._f
+
+    def _leer_directo(self, offset: int, tamano: int) -> bytes:
+        """Lee bytes del archivo sin pasar por la caché"""
+        if self._mm is not None:
+            datos = self._mm[offset:offset + tamano]
+            if metricas.activas:
+                metricas.registrar_lectura(len(datos))
+            return datos
+        f = self._archivo()
         f.seek(offset)
-        
-        # Leer el registro
-        data = f.read(RECORD_SIZE)
-        if len(data) != RECORD_SIZE:
+        datos = f.read(tamano)
+        if metricas.activas:
+            metricas.registrar_lectura(len(datos), seeks=1, llamadas_sistema=2)
+        return datos
+
+    def _cargar_bloque(self, bloque: int) -> bytes:
+        tamano = self._tamano_bloque
+        return self._leer_directo(self.inicio_datos + bloque * tamano, tamano)
+
+    def _leer(self, offset: int, tamano: int) -> bytes:
+        """Lee bytes de la zona de registros (a través de la caché si la hay)"""
+        if self._cache is None:
+            datos = self._mm[offset:offset + tamano]
+            if metricas.activas:
+                metricas.registrar_lectura(len(datos))
+            return datos
+        cache = self._cache
+        tamano_bloque = self._tamano_bloque
+        relativo = offset - self.inicio_datos
+        partes = []
+        while tamano > 0:
+            bloque, desde = divmod(relativo, tamano_bloque)
+            datos = cache.obtener(self._ruta, bloque, self._cargar_bloque)[desde:desde + tamano]
+            if not datos:
+                break  # fin del archivo
+            partes.append(datos)
+            relativo += len(datos)
+            tamano -= len(datos)
+        return partes[0] if len(partes) == 1 else b"".join(partes)
+
+    def _offset(self, posicion_1based: int) -> int:
+        """Calcula el offset de un registro (cabecera + (posicion-1) * tamaño_registro)"""
+        return self.inicio_datos + (posicion_1based - 1) * self.tamano_registro
+
+    def _registro_en(self, posicion_1based: int) -> dict:
+        """Lee y decodifica el registro completo de una posición"""
+        datos = self._leer(self._offset(posicion_1based), self.tamano_registro)
+        return self._decodificar(self._struct.unpack(datos))
+
+    def leer_por_posicion(self, posicion_1based: int) -> dict:
+        """
+        Lee un registro por su posición (1-based)
+        Retorna un diccionario con los datos del registro
+        """
+        n = self.num_registros
+
+        if posicion_1based < 1 or posicion_1based > n:
+            raise ValueError(f"Posición inválida: {posicion_1based}. Debe estar entre 1 y {n}.")
+
+        offset = self._offset(posicion_1based)
+        if offset + self.tamano_registro > self.tamano_real:
             raise IOError("No se pudo leer el registro completo (archivo corrupto o truncado).")
-        
-        # Desempaquetar todos los campos (incluyendo el nuevo numero_empleado)
-        nombre_b, edad, fecha_ord, prov_b, canton_b, dist_b, num_empleado = RECORD_STRUCT.unpack(data)
-        
-        # Reconstruir fecha
-        fecha_nacimiento = date.fromordinal(fecha_ord)
-        
+
+        if not metricas.activas:
+            return self._registro_en(posicion_1based)
+        inicio = time.perf_counter()
+        registro = self._registro_en(posicion_1based)
+        metricas.registrar_llamada("leer_por_posicion", time.perf_counter() - inicio)
+        return registro
+
+    def buscar_por_empleado(self, num_empleado_buscado: int, traza=None, estrategia: str = "auto") -> dict or None:
+        """
+        Busca un empleado por número en el archivo ordenado
+        En cada sondeo solo se lee el num_empleado (4 bytes); el registro
+        completo se desempaqueta únicamente cuando se encuentra.
+        'estrategia' puede ser "auto", "binaria", "interpolacion", "indice" o
+        "directa" (ver ESTRATEGIAS). "directa" usa la tabla de posiciones
+        (.pos): una lectura por acierto y ninguna por fallo. "indice" usa el
+        índice de bloques. Sin la tabla o el índice correspondiente, o si
+        están desactualizados, se usa la búsqueda binaria; "auto" elige la
+        mejor disponible.
+        'traza' es una función opcional traza(posicion, num_empleado) que se
+        llama en cada comparación (por ejemplo, para mostrarla en pantalla).
+        Los cambios pendientes (.delta) tienen prioridad sobre el .bin; un
+        registro dado de alta ahí se retorna con 'posicion' None.
+        Si hay filtro de Bloom (.blm), se consulta antes de leer el archivo:
+        una clave que no está en el filtro se descarta sin ningún sondeo.
+        La cantidad de sondeos (lecturas) queda en self.ultimos_sondeos.
+        Retorna el registro si lo encuentra, None si no existe
+        """
+        if not metricas.activas:
+            return self._buscar(num_empleado_buscado, traza, estrategia)
+        inicio = time.perf_counter()
+        registro = self._buscar(num_empleado_buscado, traza, estrategia)
+        metricas.registrar_llamada("buscar_por_empleado", time.perf_counter() - inicio,
+                                   sondeos=self.ultimos_sondeos, encontrado=registro is not None)
+        return registro
+
+    def _buscar(self, num_empleado_buscado: int, traza, estrategia: str) -> dict or None:
+        """Cuerpo de buscar_por_empleado (sin métricas)"""
+        if estrategia not in ESTRATEGIAS and estrategia != "auto":
+            raise ValueError(f"Estrategia inválida: {estrategia}. Opciones: {', '.join(ESTRATEGIAS)}.")
+        if self._cambios is not None and num_empleado_buscado in self._cambios[1]:
+            self.ultimos_sondeos = 0
+            registro = self._cambios[1][num_empleado_buscado]
+            return dict(registro) if registro is not None else None
+        if self._bloom is not None and not self._puede_existir(num_empleado_buscado):
+            self.ultimos_sondeos = 0
+            return None
+
+        if estrategia in ("auto", "directa") and self._posiciones is not None:
+            registro = self._buscar_directa(num_empleado_buscado, traza)
+            if registro is not False:
+                return registro
+            # La tabla no coincide con el contenido: se descarta y se busca sin ella
+            self._posiciones = None
+            _INDICES_CARGADOS[(os.path.abspath(self.filename), POS_EXTENSION)] = (self._firma, None)
+        if estrategia == "directa":
+            estrategia = "auto"  # sin tabla de posiciones válida
+
+        if estrategia == "auto" or (estrategia == "indice" and self._indice is None):
+            # Sin índice de bloques válido se usa la búsqueda binaria
+            estrategia = "indice" if self._indice is not None else "binaria"
+
+        if estrategia == "binaria":
+            pos = self._buscar_binaria(num_empleado_buscado, traza)
+        elif estrategia == "interpolacion":
+            pos = self._buscar_interpolacion(num_empleado_buscado, traza)
+        else:  # "indice"
+            pos = self._buscar_con_indice(num_empleado_buscado, traza)
+            if pos is False:
+                # El índice no coincide con el contenido: se descarta y se busca sin él
+                self._indice = None
+                _INDICES_CARGADOS[(os.path.abspath(self.filename), IDX_EXTENSION)] = (self._firma, None)
+                pos = self._buscar_binaria(num_empleado_buscado, traza)
+
+        if pos is None:
+            return None  # No encontrado
+
+        # Encontrado, construir diccionario completo
+        registro = self._registro_en(pos)
+        registro['posicion'] = pos  # Guardamos la posición donde se encontró
+        return registro
+
+    def _puede_existir(self, clave: int) -> bool:
+        """Consulta el filtro de Bloom; False asegura que la clave no está en el archivo"""
+        bits, funciones, contenido = self._bloom
+        _CONTADORES_BLOOM['consultas'] += 1
+        for bit in posiciones_bloom(clave, bits, funciones):
+            if not contenido[bit >> 3] & (1 << (bit & 7)):
+                self.fallos_evitados += 1
+                _CONTADORES_BLOOM['fallos_evitados'] += 1
+                return False
+        return True
+
+    def _posicion_en_tabla(self, clave: int) -> int:
+        """Posición de la clave según la tabla de posiciones (0 si no existe)"""
+        tipo, parametro, tabla = self._posiciones
+        if tipo == POS_DIRECTA:
+            ranura = clave - parametro
+            return tabla[ranura] if 0 <= ranura < len(tabla) else 0
+
+        mascara = (1 << parametro) - 1
+        ranura = ranura_hash(clave, parametro)
+        for _ in range(mascara + 1):
+            posicion = tabla[2 * ranura + 1]
+            if posicion == 0 or tabla[2 * ranura] == clave:
+                return posicion
+            ranura = (ranura + 1) & mascara
+        return 0
+
+    def _buscar_directa(self, clave: int, traza) -> dict or None:
+        """
+        Búsqueda con la tabla de posiciones: la posición sale de memoria y
+        solo se lee el registro encontrado. Retorna el registro, None si no
+        existe, o False si la tabla no coincide con el archivo.
+        """
+        pos = self._posicion_en_tabla(clave)
+        if pos == 0:
+            self.ultimos_sondeos = 0
+            return None
+        if pos > self._n_completos:
+            return False
+
+        registro = self._registro_en(pos)
+        self.ultimos_sondeos = 1
+        if traza is not None:
+            traza(pos, registro['num_empleado'])
+        if registro['num_empleado'] != clave:
+            return False
+        registro['posicion'] = pos
+        return registro
+
+    def _buscar_binaria(self, clave: int, traza) -> int or None:
+        """Búsqueda binaria clásica; retorna la posición de la clave o None"""
+        inferior = 1
+        superior = self._n_completos
+        mm = self._mm
+        clave_en = self._clave_en
+        tamano = self.tamano_registro
+        base = self.inicio_datos - tamano + self._offset_clave  # offset de la clave en la posición 0
+        sondeos = 0
+
+        while inferior <= superior:
+            pos_media = (inferior + superior) // 2
+
+            # Leer solo el número de empleado en la posición media
+            if mm is not None:
+                (num_emp,) = KEY_STRUCT.unpack_from(mm, base + pos_media * tamano)
+            else:
+                num_emp = clave_en(pos_media)
+            sondeos += 1
+
+            if traza is not None:
+                traza(pos_media, num_emp)
+
+            if num_emp == clave:
+                self.ultimos_sondeos = sondeos
+                return pos_media
+            elif num_emp > clave:
+                superior = pos_media - 1
+            else:  # num_emp < clave
+                inferior = pos_media + 1
+
+        self.ultimos_sondeos = sondeos
+        return None
+
+    def _buscar_con_indice(self, clave: int, traza) -> int or None:
+        """
+        Búsqueda con el índice de bloques: se ubica el bloque en memoria
+        (bisect sobre las primeras claves) y se lee solo ese bloque del
+        archivo. Retorna la posición, None si no existe, o False si el
+        contenido del bloque contradice el índice.
+        """
+        por_bloque, primeras = self._indice
+        b = bisect_right(primeras, clave) - 1
+        if b < 0:
+            self.ultimos_sondeos = 0  # menor que la primera clave: sin lecturas
+            return None
+
+        inicio = b * por_bloque + 1
+        cantidad = min(por_bloque, self._n_completos - inicio + 1)
+        if cantidad < 1:
+            return False
+        offset = self._offset(inicio)
+        tamano = self.tamano_registro
+        offset_clave = self._offset_clave
+        bloque = self._leer(offset, cantidad * tamano)
+        self.ultimos_sondeos = 1
+
+        if KEY_STRUCT.unpack_from(bloque, offset_clave)[0] != primeras[b]:
+            return False
+
+        # Búsqueda binaria dentro del bloque ya leído
+        inferior = 0
+        superior = cantidad - 1
+        while inferior <= superior:
+            medio = (inferior + superior) // 2
+            (num_emp,) = KEY_STRUCT.unpack_from(bloque, medio * tamano + offset_clave)
+            if traza is not None:
+                traza(inicio + medio, num_emp)
+            if num_emp == clave:
+                return inicio + medio
+            elif num_emp > clave:
+                superior = medio - 1
+            else:
+                inferior = medio + 1
+
+        if inferior == cantidad and b + 1 < len(primeras) and self._clave_en(inicio + cantidad) != primeras[b + 1]:
+            return False  # la clave debería estar antes del bloque siguiente
+        return None
+
+    def _buscar_interpolacion(self, clave: int, traza) -> int or None:
+        """
+        Búsqueda por interpolación; retorna la posición de la clave o None
+        Estima la posición suponiendo claves distribuidas uniformemente entre
+        las claves conocidas de los extremos del intervalo, y acompaña cada
+        estimación con un sondeo de guarda a raíz(tamaño) posiciones. Si en
+        MAX_PASOS_LENTOS pasos el intervalo no se reduce al menos a la mitad
+        (claves poco uniformes), continúa con búsqueda binaria.
+        """
+        n = self._n_completos
+        if n == 0:
+            self.ultimos_sondeos = 0
+            return None
+
+        # Los extremos se sondean primero para conocer el rango de claves
+        clave_inf = self._clave_en(1)
+        sondeos = 1
+        if traza is not None:
+            traza(1, clave_inf)
+        if clave <= clave_inf:
+            self.ultimos_sondeos = sondeos
+            return 1 if clave == clave_inf else None
+
+        clave_sup = self._clave_en(n)
+        sondeos += 1
+        if traza is not None:
+            traza(n, clave_sup)
+        if clave >= clave_sup:
+            self.ultimos_sondeos = sondeos
+            return n if clave == clave_sup else None
+
+        # Invariante: clave_inf (en inferior-1) < clave < clave_sup (en superior+1)
+        inferior = 2
+        superior = n - 1
+        pasos_lentos = 0
+
+        while inferior <= superior:
+            tamano = superior - inferior + 1
+            if pasos_lentos < MAX_PASOS_LENTOS:
+                pos = (inferior - 1) + (clave - clave_inf) * (superior - inferior + 2) // (clave_sup - clave_inf)
+                pos = max(inferior, min(superior, pos))
+                paso = max(1, math.isqrt(tamano))  # error esperado de la estimación
+            else:
+                pos = (inferior + superior) // 2
+                paso = 0
+
+            num_emp = self._clave_en(pos)
+            sondeos += 1
+            if traza is not None:
+                traza(pos, num_emp)
+
+            if num_emp == clave:
+                self.ultimos_sondeos = sondeos
+                return pos
+            elif num_emp > clave:
+                superior = pos - 1
+                clave_sup = num_emp
+                guarda = pos - paso
+            else:  # num_emp < clave
+                inferior = pos + 1
+                clave_inf = num_emp
+                guarda = pos + paso
+
+            # Sondeo de guarda: acota el intervalo también por el otro lado,
+            # para que la estimación no se acerque a la clave de a poquitos
+            if paso and inferior <= guarda <= superior:
+                num_emp = self._clave_en(guarda)
+                sondeos += 1
+                if traza is not None:
+                    traza(guarda, num_emp)
+
+                if num_emp == clave:
+                    self.ultimos_sondeos = sondeos
+                    return guarda
+                elif num_emp > clave:
+                    superior = guarda - 1
+                    clave_sup = num_emp
+                else:
+                    inferior = guarda + 1
+                    clave_inf = num_emp
+
+            if superior - inferior + 1 > tamano // 2:
+                pasos_lentos += 1
+
+        self.ultimos_sondeos = sondeos
+        return None
+
+    def _clave_en(self, posicion_1based: int) -> int:
+        """Retorna el número de empleado guardado en una posición"""
+        return KEY_STRUCT.unpack_from(self._mm, self._offset(posicion_1based) + self._offset_clave)[0]
+
+    def _clave_en_cache(self, posicion_1based: int) -> int:
+        """Como _clave_en, pero leyendo el bloque desde la caché"""
+        cache = self._cache
+        bloque, indice = divmod(posicion_1based - 1, cache.registros_por_bloque)
+        datos = cache.obtener(self._ruta, bloque, self._cargar_bloque)
+        return KEY_STRUCT.unpack_from(datos, indice * self.tamano_registro + self._offset_clave)[0]
+
+    def buscar_muchos_por_empleado(self, claves) -> dict:
+        """
+        Busca varios números de empleado en una sola pasada hacia adelante.
+        Las claves se ordenan y, como el archivo está ordenado ascendentemente
+        por num_empleado, cada búsqueda arranca donde terminó la anterior:
+        se avanza con saltos que se duplican (galloping) hasta pasar la clave
+        y luego se hace búsqueda binaria solo dentro de ese tramo.
+        Retorna un diccionario clave -> registro (o None si no existe)
+        """
+        resultado = {}
+        n = self._n_completos
+        inicio = 1  # primera posición que todavía puede contener una clave pendiente
+        claves = set(claves)
+
+        if self._cambios is not None:
+            # Las claves con cambios pendientes se responden desde la memtable
+            memtable = self._cambios[1]
+            for clave in claves & memtable.keys():
+                registro = memtable[clave]
+                resultado[clave] = dict(registro) if registro is not None else None
+            claves -= memtable.keys()
+
+        for clave in sorted(claves):
+            if inicio > n or (self._bloom is not None and not self._puede_existir(clave)):
+                resultado[clave] = None
+                continue
+
+            # Galloping: duplicar el salto hasta encontrar una clave >= buscada
+            salto = 1
+            inferior = inicio
+            superior = inicio
+            while superior <= n and self._clave_en(superior) < clave:
+                inferior = superior + 1
+                superior = inicio + salto
+                salto *= 2
+            superior = min(superior, n)
+
+            # Búsqueda binaria del primer registro con clave >= buscada en [inferior, superior]
+            while inferior < superior:
+                pos_media = (inferior + superior) // 2
+                if self._clave_en(pos_media) < clave:
+                    inferior = pos_media + 1
+                else:
+                    superior = pos_media
+
+            inicio = inferior
+            if inferior <= n and self._clave_en(inferior) == clave:
+                registro = self._registro_en(inferior)
+                registro['posicion'] = inferior
+                resultado[clave] = registro
+                inicio = inferior + 1
+            else:
+                resultado[clave] = None
+
+        return resultado
+
+    def _limite_inferior(self, clave: int) -> int:
+        """Primera posición cuyo num_empleado es >= clave (n+1 si no hay ninguna)"""
+        inferior = 1
+        superior = self._n_completos + 1
+        while inferior < superior:
+            pos_media = (inferior + superior) // 2
+            if self._clave_en(pos_media) < clave:
+                inferior = pos_media + 1
+            else:
+                superior = pos_media
+        return inferior
+
+    def iterar_registros(self, desde_pos: int = 1, hasta_pos: int = None):
+        """
+        Recorre los registros de las posiciones desde_pos..hasta_pos (1-based,
+        inclusive; por defecto todo el archivo) leyendo bloques grandes.
+        Es un generador: la memoria usada no depende del tamaño del recorrido.
+        """
+        if hasta_pos is None:
+            hasta_pos = self._n_completos
+        if desde_pos < 1:
+            raise ValueError(f"Posición inválida: {desde_pos}. Debe ser al menos 1.")
+        hasta_pos = min(hasta_pos, self._n_completos)
+
+        pos = desde_pos
+        while pos <= hasta_pos:
+            cantidad = min(REGISTROS_POR_LECTURA, hasta_pos - pos + 1)
+            offset = self._offset(pos)
+            bloque = self._leer_directo(offset, cantidad * self.tamano_registro)
+            for campos in self._struct.iter_unpack(bloque):
+                registro = self._decodificar(campos)
+                registro['posicion'] = pos
+                pos += 1
+                yield registro
+
+    def rango_por_empleado(self, desde: int, hasta: int):
+        """
+        Produce, en orden, los registros con num_empleado entre 'desde' y
+        'hasta' (inclusive). El primero se ubica con búsqueda binaria y el
+        resto se lee secuencialmente en bloques grandes hasta pasar 'hasta'.
+        Los cambios pendientes (.delta) se mezclan en orden con el .bin.
+        """
+        if self._cambios is None:
+            yield from self._rango_base(desde, hasta)
+            return
+
+        claves, memtable = self._cambios
+        i = bisect_left(claves, desde)
+        fin = bisect_right(claves, hasta)
+        for registro in self._rango_base(desde, hasta):
+            clave = registro['num_empleado']
+            # Altas de la memtable anteriores a este registro
+            while i < fin and claves[i] < clave:
+                if memtable[claves[i]] is not None:
+                    yield dict(memtable[claves[i]])
+                i += 1
+            if i < fin and claves[i] == clave:
+                # Reemplazado o eliminado en la memtable
+                if memtable[clave] is not None:
+                    yield dict(memtable[clave])
+                i += 1
+            else:
+                yield registro
+        for clave in claves[i:fin]:
+            if memtable[clave] is not None:
+                yield dict(memtable[clave])
+
+    def _rango_base(self, desde: int, hasta: int):
+        """Igual que rango_por_empleado, solo con los registros del .bin"""
+        pos = self._limite_inferior(desde)
+        n = self._n_completos
+        while pos <= n:
+            cantidad = min(REGISTROS_POR_LECTURA, n - pos + 1)
+            offset = self._offset(pos)
+            bloque = self._leer_directo(offset, cantidad * self.tamano_registro)
+            for campos in self._struct.iter_unpack(bloque):
+                if campos[-1] > hasta:
+                    return
+                registro = self._decodificar(campos)
+                registro['posicion'] = pos
+                pos += 1
+                yield registro
+
+    def _bitmap_ubicacion(self, filtros: dict) -> int or None:
+        """
+        Intersección (AND) de los bitmaps del índice de ubicación para los
+        filtros dados; None si el archivo no tiene un índice de ubicación válido
+        """
+        indice = _cargar_indice_ubicacion(self.filename, self._firma)
+        if indice is None:
+            return None
+        resultado = (1 << self._n_completos) - 1  # sin filtros: todas las posiciones
+        for campo, valores in zip(CAMPOS_UBICACION, indice):
+            valor = filtros.get(campo)
+            if valor is not None:
+                resultado &= valores.get(valor, 0)
+        return resultado
+
+    def buscar_por_ubicacion(self, provincia: str = None, canton: str = None, distrito: str = None):
+        """
+        Produce, en orden de posición, los registros que tienen la provincia,
+        cantón y distrito indicados (los que se omiten no filtran).
+        Con índice de ubicación (.ubi) solo se leen las posiciones que
+        coinciden; sin él se recorre el archivo completo.
+        Los registros con cambios pendientes (.delta) se toman de la memtable
+        y van al final, en orden de num_empleado.
+        """
+        filtros = {'provincia': provincia, 'canton': canton, 'distrito': distrito}
+        memtable = self._cambios[1] if self._cambios is not None else {}
+        bitmap = self._bitmap_ubicacion(filtros)
+        if bitmap is None:
+            registros = (registro for registro in self.iterar_registros()
+                         if _coincide_ubicacion(registro, filtros))
+        else:
+            registros = (self._registro_con_posicion(pos) for pos in _posiciones_de_bitmap(bitmap))
+        for registro in registros:
+            if registro['num_empleado'] not in memtable:
+                yield registro
+
+        if self._cambios is not None:
+            for clave in self._cambios[0]:
+                registro = memtable[clave]
+                if registro is not None and _coincide_ubicacion(registro, filtros):
+                    yield dict(registro)
+
+    def _registro_con_posicion(self, pos: int) -> dict:
+        """Registro de una posición (1-based) con su 'posicion'"""
+        registro = self._registro_en(pos)
+        registro['posicion'] = pos
+        return registro
+
+    def contar_por_ubicacion(self, provincia: str = None, canton: str = None, distrito: str = None) -> int:
+        """
+        Cantidad de registros con la ubicación indicada (sin leerlos si hay
+        índice; de los cambios pendientes solo se leen los reemplazados)
+        """
+        filtros = {'provincia': provincia, 'canton': canton, 'distrito': distrito}
+        bitmap = self._bitmap_ubicacion(filtros)
+        if bitmap is None:
+            return sum(1 for _ in self.buscar_por_ubicacion(provincia, canton, distrito))
+
+        cantidad = bitmap.bit_count()
+        if self._cambios is not None:
+            claves, memtable = self._cambios
+            for clave in claves:
+                # El registro del .bin deja de contar: fue reemplazado o eliminado
+                pos = self._limite_inferior(clave)
+                if pos <= self._n_completos and self._clave_en(pos) == clave and bitmap >> (pos - 1) & 1:
+                    cantidad -= 1
+                if memtable[clave] is not None and _coincide_ubicacion(memtable[clave], filtros):
+                    cantidad += 1
+        return cantidad
+
+    def estadisticas(self) -> dict:
+        """
+        Conteos de registros por provincia, por edad y por año de nacimiento.
+        Si el archivo tiene la cola de agregados se leen de ahí sin tocar los
+        registros; si no, se calculan recorriendo el archivo en bloques con
+        iter_unpack (solo se cuentan los campos crudos; los textos y años se
+        obtienen al final, una vez por valor distinto). Los cambios
+        pendientes (.delta) se aplican encima.
+        'precalculadas' indica si se usó la cola de agregados.
+        """
+        if self.tamano_agregados:
+            datos = self._leer_directo(self.inicio_datos + self.num_registros * self.tamano_registro,
+                                       self.tamano_agregados - AGG_PIE_STRUCT.size)
+            resultado = _leer_agregados(datos)
+            resultado['num_registros'] = self.num_registros
+        else:
+            resultado = self._contar_registros()
+        resultado['precalculadas'] = bool(self.tamano_agregados)
+
+        if self._cambios is not None:
+            claves, memtable = self._cambios
+            for clave in claves:
+                pos = self._limite_inferior(clave)
+                if pos <= self._n_completos and self._clave_en(pos) == clave:
+                    _sumar_registro(resultado, self._registro_en(pos), -1)
+                if memtable[clave] is not None:
+                    _sumar_registro(resultado, memtable[clave], 1)
+
+        for conteo in ('por_provincia', 'por_edad', 'por_anio_nacimiento'):
+            resultado[conteo] = dict(sorted(resultado[conteo].items()))
+        return resultado
+
+    def _contar_registros(self) -> dict:
+        """Conteos de estadisticas() recorriendo todos los registros del .bin"""
+        provincias = Counter()
+        edades = Counter()
+        fechas = Counter()
+        campo_edad, campo_fecha, campo_provincia = itemgetter(1), itemgetter(2), itemgetter(3)
+        n = self._n_completos
+        pos = 1
+        while pos <= n:
+            cantidad = min(REGISTROS_POR_LECTURA, n - pos + 1)
+            campos = list(self._struct.iter_unpack(
+                self._leer_directo(self._offset(pos), cantidad * self.tamano_registro)))
+            # Counter.update cuenta en C: un recorrido por campo y por bloque
+            edades.update(map(campo_edad, campos))
+            fechas.update(map(campo_fecha, campos))
+            provincias.update(map(campo_provincia, campos))
+            pos += cantidad
+
+        por_provincia = Counter()
+        for valor, cantidad in provincias.items():
+            texto = self._diccionario[valor] if self.formato == 2 else unpack_fixed_str(valor)
+            por_provincia[texto] += cantidad
+        por_anio = Counter()
+        for ordinal, cantidad in fechas.items():
+            por_anio[date.fromordinal(ordinal).year] += cantidad
+        return {'num_registros': n, 'por_provincia': dict(por_provincia),
+                'por_edad': dict(edades), 'por_anio_nacimiento': dict(por_anio)}
+
+    def obtener_info_archivo(self) -> dict:
+        """Obtiene información básica del archivo"""
+        n = self.num_registros
         return {
-            'nombre': unpack_fixed_str(nombre_b),
-            'edad': int(edad),
-            'fecha_nacimiento': fecha_nacimiento,
-            'provincia': unpack_fixed_str(prov_b),
-            'canton': unpack_fixed_str(canton_b),
-            'distrito': unpack_fixed_str(dist_b),
-            'num_empleado': num_empleado
+            'num_registros': n,
+            'formato': self.formato,
+            'tamano_cabecera': self.inicio_datos,
+            'tamano_registro': self.tamano_registro,
+            'tamano_total': self.inicio_datos + (n * self.tamano_registro) + self.tamano_agregados,
+            'agregados': self.tamano_agregados > 0,
+            'indice_bloques': self._indice is not None,
+            'tabla_posiciones': self._posiciones is not None,
+            'filtro_bloom': self._bloom is not None,
+            'cambios_pendientes': len(self._cambios[0]) if self._cambios is not None else 0
         }
 
 
-def buscar_por_empleado(filename: str, num_empleado_buscado: int) -> dict or None:
+def cargar_manifiesto(filename: str) -> dict:
     """
-    Realiza búsqueda binaria por número de empleado
-    Retorna el registro si lo encuentra, None si no existe
+    Lee y valida el manifiesto de un conjunto particionado. Las rutas de las
+    particiones se resuelven respecto de la carpeta del manifiesto.
     """
     try:
-        # Leer cabecera
-        n = leer_cabecera(filename)
-        
-        inferior = 1
-        superior = n
-        
-        with open(filename, "rb") as f:
-            header_size = COUNT_STRUCT.size
-            
-            while inferior <= superior:
-                pos_media = (inferior + superior) // 2
-                
-                # Calcular offset y leer registro en posición media
-                offset = header_size + (pos_media - 1) * RECORD_SIZE
-                f.seek(offset)
-                data = f.read(RECORD_SIZE)
-                
-                if len(data) != RECORD_SIZE:
-                    return None  # Archivo corrupto
-                
-                # Desempaquetar (el último campo es num_empleado)
-                nombre_b, edad, fecha_ord, prov_b, canton_b, dist_b, num_emp = RECORD_STRUCT.unpack(data)
-                
-                print(f"  Comparando con posición {pos_media}: empleado #{num_emp}")  # Debug opcional
-                
-                if num_emp == num_empleado_buscado:
-                    # Encontrado, construir diccionario completo
-                    return {
-                        'nombre': unpack_fixed_str(nombre_b),
-                        'edad': edad,
-                        'fecha_nacimiento': date.fromordinal(fecha_ord),
-                        'provincia': unpack_fixed_str(prov_b),
-                        'canton': unpack_fixed_str(canton_b),
-                        'distrito': unpack_fixed_str(dist_b),
-                        'num_empleado': num_emp,
-                        'posicion': pos_media  # Guardamos la posición donde se encontró
-                    }
-                elif num_emp > num_empleado_buscado:
-                    superior = pos_media - 1
-                else:  # num_emp < num_empleado_buscado
-                    inferior = pos_media + 1
-        
-        return None  # No encontrado
-        
+        with open(filename, encoding="utf-8") as f:
+            manifiesto = json.load(f)
     except FileNotFoundError:
         raise FileNotFoundError(f"Archivo '{filename}' no encontrado.")
+    except ValueError as e:
+        raise ValueError(f"El manifiesto '{filename}' no es JSON válido: {e}")
+
+    if manifiesto.get('version') != MANIFIESTO_VERSION:
+        raise ValueError(f"Versión de manifiesto no soportada: {manifiesto.get('version')}.")
+    directorio = os.path.dirname(os.path.abspath(filename))
+    anterior = -1
+    for particion in manifiesto['particiones']:
+        if not anterior < particion['clave_min'] <= particion['clave_max']:
+            raise ValueError(f"Las particiones del manifiesto '{filename}' no están ordenadas "
+                             f"o se solapan ({particion['archivo']}).")
+        anterior = particion['clave_max']
+        particion['ruta'] = os.path.join(directorio, particion['archivo'])
+    return manifiesto
+
+
+class ConjuntoEmpleados(_SondeosPorHilo):
+    """
+    Sesión de lectura sobre un conjunto particionado (manifiesto + .bin).
+    Como cada partición tiene un rango contiguo de num_empleado y los
+    rangos están ordenados, una búsqueda va a una sola partición (bisect
+    sobre las claves mínimas del manifiesto) y las posiciones globales son
+    las de las particiones puestas una después de otra.
+    Los lotes y las estadísticas se reparten entre las particiones en un
+    pool de hilos, y cada rango en uno propio; los resultados salen en orden de
+    num_empleado. Las particiones se abren la primera vez que se usan.
+    Tiene la misma interfaz de consulta que ArchivoEmpleados.
+    """
+
+    def __init__(self, filename: str, usar_indice: bool = True, cache: CacheBloques = None,
+                 hilos: int = HILOS_PARTICIONES):
+        self.filename = filename
+        manifiesto = cargar_manifiesto(filename)
+        self.formato = manifiesto['formato']
+        self._particiones = manifiesto['particiones']
+        self._claves_min = [particion['clave_min'] for particion in self._particiones]
+        self._inicios = []  # registros de las particiones anteriores (posición global - local)
+        self.num_registros = 0
+        for particion in self._particiones:
+            self._inicios.append(self.num_registros)
+            self.num_registros += particion['num_registros']
+        self._usar_indice = usar_indice
+        self._cache = cache
+        self._hilos = hilos
+        self._sesiones = [None] * len(self._particiones)
+        self._lock = threading.Lock()
+        self._pool = None
+        self._sondeos = threading.local()
+        self.ultimos_sondeos = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.cerrar()
+
+    def cerrar(self):
+        """Cierra las particiones abiertas y el pool de hilos"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+        for i, sesion in enumerate(self._sesiones):
+            if sesion is not None:
+                sesion.cerrar()
+                self._sesiones[i] = None
+
+    def _sesion(self, i: int) -> ArchivoEmpleados:
+        """Sesión de la partición i (se abre la primera vez)"""
+        sesion = self._sesiones[i]
+        if sesion is not None:
+            return sesion
+        with self._lock:
+            if self._sesiones[i] is None:
+                particion = self._particiones[i]
+                sesion = ArchivoEmpleados(particion['ruta'], self._usar_indice, self._cache)
+                if sesion.num_registros != particion['num_registros']:
+                    sesion.cerrar()
+                    raise ValueError(f"La partición '{particion['archivo']}' tiene {sesion.num_registros} "
+                                     f"registros y el manifiesto dice {particion['num_registros']}.")
+                self._sesiones[i] = sesion
+            return self._sesiones[i]
+
+    def _pool_hilos(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self._hilos, thread_name_prefix="particion")
+            return self._pool
+
+    def _particion_de(self, clave: int) -> int or None:
+        """Índice de la única partición que puede contener la clave (None si ninguna)"""
+        i = bisect_right(self._claves_min, clave) - 1
+        if i < 0 or clave > self._particiones[i]['clave_max']:
+            return None
+        return i
+
+    def _particiones_en(self, desde: int, hasta: int) -> list:
+        """Índices de las particiones cuyo rango se cruza con desde..hasta"""
+        primera = max(0, bisect_right(self._claves_min, desde) - 1)
+        ultima = bisect_right(self._claves_min, hasta)
+        return [i for i in range(primera, ultima) if self._particiones[i]['clave_max'] >= desde]
+
+    def _a_global(self, registro: dict, i: int) -> dict:
+        """Pasa la posición de un registro de la partición i a posición global"""
+        if registro is not None and registro.get('posicion') is not None:
+            registro['posicion'] += self._inicios[i]
+        return registro
+
+    def leer_por_posicion(self, posicion_1based: int) -> dict:
+        """Lee un registro por su posición global (1-based)"""
+        n = self.num_registros
+        if posicion_1based < 1 or posicion_1based > n:
+            raise ValueError(f"Posición inválida: {posicion_1based}. Debe estar entre 1 y {n}.")
+        i = bisect_right(self._inicios, posicion_1based - 1) - 1
+        return self._sesion(i).leer_por_posicion(posicion_1based - self._inicios[i])
+
+    def buscar_por_empleado(self, num_empleado_buscado: int, traza=None, estrategia: str = "auto") -> dict or None:
+        """
+        Busca un empleado solo en la partición que corresponde a su número
+        (ver ArchivoEmpleados.buscar_por_empleado). Las posiciones de 'traza'
+        y del registro son globales.
+        """
+        if estrategia not in ESTRATEGIAS and estrategia != "auto":
+            raise ValueError(f"Estrategia inválida: {estrategia}. Opciones: {', '.join(ESTRATEGIAS)}.")
+        i = self._particion_de(num_empleado_buscado)
+        if i is None:
+            self.ultimos_sondeos = 0
+            return None
+        sesion = self._sesion(i)
+        if traza is not None:
+            inicio = self._inicios[i]
+            traza_local = traza
+            traza = lambda posicion, num_empleado: traza_local(posicion + inicio, num_empleado)
+        registro = sesion.buscar_por_empleado(num_empleado_buscado, traza, estrategia)
+        self.ultimos_sondeos = sesion.ultimos_sondeos
+        return self._a_global(registro, i)
+
+    def buscar_muchos_por_empleado(self, claves) -> dict:
+        """
+        Agrupa las claves por partición y busca cada grupo en un hilo
+        (ArchivoEmpleados.buscar_muchos_por_empleado). Retorna un diccionario
+        clave -> registro (o None), en orden de clave.
+        """
+        grupos = {}
+        resultado = {}
+        for clave in set(claves):
+            i = self._particion_de(clave)
+            if i is None:
+                resultado[clave] = None
+            else:
+                grupos.setdefault(i, []).append(clave)
+
+        def buscar_grupo(i):
+            encontrados = self._sesion(i).buscar_muchos_por_empleado(grupos[i])
+            return {clave: self._a_global(registro, i) for clave, registro in encontrados.items()}
+
+        if len(grupos) == 1:
+            resultado.update(buscar_grupo(next(iter(grupos))))
+        else:
+            for encontrados in self._pool_hilos().map(buscar_grupo, grupos):
+                resultado.update(encontrados)
+        return {clave: resultado[clave] for clave in sorted(resultado)}
+
+    def iterar_registros(self, desde_pos: int = 1, hasta_pos: int = None):
+        """Recorre los registros de las posiciones globales desde_pos..hasta_pos (1-based, inclusive)"""
+        if desde_pos < 1:
+            raise ValueError(f"Posición inválida: {desde_pos}. Debe ser al menos 1.")
+        hasta_pos = self.num_registros if hasta_pos is None else min(hasta_pos, self.num_registros)
+        for i, inicio in enumerate(self._inicios):
+            cantidad = self._particiones[i]['num_registros']
+            if inicio + cantidad < desde_pos or not cantidad:
+                continue
+            if inicio >= hasta_pos:
+                break
+            for registro in self._sesion(i).iterar_registros(max(1, desde_pos - inicio),
+                                                             min(cantidad, hasta_pos - inicio)):
+                yield self._a_global(registro, i)
+
+    def rango_por_empleado(self, desde: int, hasta: int):
+        """
+        Produce, en orden, los registros con num_empleado entre 'desde' y
+        'hasta'. Si el rango toca varias particiones, se leen a la vez en
+        hilos propios de este rango (cada una adelanta hasta
+        TROZOS_EN_ESPERA trozos) y los trozos se entregan partición por
+        partición, que ya es el orden de num_empleado.
+        Los hilos son propios porque esperan a que se consuma su cola:
+        en el pool compartido, rangos intercalados o abandonados bloquearían
+        a las demás consultas. Al cerrar el generador los hilos terminan.
+        """
+        indices = self._particiones_en(desde, hasta)
+        if len(indices) == 1:
+            for registro in self._sesion(indices[0]).rango_por_empleado(desde, hasta):
+                yield self._a_global(registro, indices[0])
+            return
+
+        cancelado = threading.Event()
+        colas = [queue.Queue(TROZOS_EN_ESPERA) for _ in indices]
+        # Los hilos toman las particiones en el mismo orden en que se
+        # consumen, así que con menos hilos que particiones no se traban
+        pendientes = queue.SimpleQueue()
+        for i, cola in zip(indices, colas):
+            pendientes.put((i, cola))
+
+        def trabajar():
+            while not cancelado.is_set():
+                try:
+                    i, cola = pendientes.get_nowait()
+                except queue.Empty:
+                    return
+                self._producir_rango(i, desde, hasta, cola, cancelado)
+
+        # Hilos daemon: un rango abandonado sin cerrar no impide salir del programa
+        for _ in range(min(self._hilos, len(indices))):
+            threading.Thread(target=trabajar, name="rango", daemon=True).start()
+        try:
+            for cola in colas:
+                while True:
+                    trozo = cola.get()
+                    if trozo is None:
+                        break
+                    if isinstance(trozo, Exception):
+                        raise trozo
+                    yield from trozo
+        finally:
+            cancelado.set()  # si se deja de consumir, los hilos terminan
+
+    def _producir_rango(self, i: int, desde: int, hasta: int, cola: queue.Queue, cancelado: threading.Event):
+        """Lee el rango de la partición i en trozos y los pone en 'cola' (None al terminar)"""
+        try:
+            trozo = []
+            for registro in self._sesion(i).rango_por_empleado(desde, hasta):
+                trozo.append(self._a_global(registro, i))
+                if len(trozo) == REGISTROS_POR_TROZO_RANGO:
+                    if not _poner_en_cola(cola, trozo, cancelado):
+                        return
+                    trozo = []
+            if trozo and not _poner_en_cola(cola, trozo, cancelado):
+                return
+            _poner_en_cola(cola, None, cancelado)
+        except Exception as e:
+            _poner_en_cola(cola, e, cancelado)
+
+    def buscar_por_ubicacion(self, provincia: str = None, canton: str = None, distrito: str = None):
+        """Produce, en orden de posición, los registros con la ubicación indicada"""
+        for i in range(len(self._particiones)):
+            for registro in self._sesion(i).buscar_por_ubicacion(provincia, canton, distrito):
+                yield self._a_global(registro, i)
+
+    def contar_por_ubicacion(self, provincia: str = None, canton: str = None, distrito: str = None) -> int:
+        """Cantidad de registros con la ubicación indicada (las particiones se cuentan en paralelo)"""
+        return sum(self._pool_hilos().map(
+            lambda i: self._sesion(i).contar_por_ubicacion(provincia, canton, distrito),
+            range(len(self._particiones))))
+
+    def estadisticas(self) -> dict:
+        """Suma de las estadísticas de las particiones (calculadas en paralelo)"""
+        resultado = {'num_registros': 0, 'por_provincia': Counter(), 'por_edad': Counter(),
+                     'por_anio_nacimiento': Counter(), 'precalculadas': True}
+        for parcial in self._pool_hilos().map(lambda i: self._sesion(i).estadisticas(),
+                                              range(len(self._particiones))):
+            resultado['num_registros'] += parcial['num_registros']
+            resultado['precalculadas'] = resultado['precalculadas'] and parcial['precalculadas']
+            for conteo in ('por_provincia', 'por_edad', 'por_anio_nacimiento'):
+                resultado[conteo].update(parcial[conteo])
+        for conteo in ('por_provincia', 'por_edad', 'por_anio_nacimiento'):
+            resultado[conteo] = dict(sorted(resultado[conteo].items()))
+        return resultado
+
+    def obtener_info_archivo(self) -> dict:
+        """Información del conjunto: totales y sumas de las particiones"""
+        infos = [self._sesion(i).obtener_info_archivo() for i in range(len(self._particiones))]
+        return {
+            'num_registros': self.num_registros,
+            'formato': self.formato,
+            'particiones': len(infos),
+            'archivos': [particion['ruta'] for particion in self._particiones],
+            'tamano_cabecera': sum(info['tamano_cabecera'] for info in infos),
+            'tamano_registro': RECORD_SIZE if self.formato == 1 else RECORD_SIZE_V2,
+            'tamano_total': sum(info['tamano_total'] for info in infos),
+            'agregados': all(info['agregados'] for info in infos),
+            'indice_bloques': all(info['indice_bloques'] for info in infos),
+            'tabla_posiciones': all(info['tabla_posiciones'] for info in infos),
+            'filtro_bloom': all(info['filtro_bloom'] for info in infos),
+            'cambios_pendientes': sum(info['cambios_pendientes'] for info in infos)
+        }
+
+
+def _poner_en_cola(cola: queue.Queue, elemento, cancelado: threading.Event) -> bool:
+    """Pone un elemento en una cola acotada; False si se canceló mientras esperaba lugar"""
+    while not cancelado.is_set():
+        try:
+            cola.put(elemento, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def abrir_sesion(filename: str, usar_indice: bool = True, cache: CacheBloques = None):
+    """
+    Sesión de lectura según el archivo: ConjuntoEmpleados para un manifiesto
+    (MANIFIESTO_EXTENSION) o ArchivoEmpleados para un .bin
+    """
+    if filename.endswith(MANIFIESTO_EXTENSION):
+        return ConjuntoEmpleados(filename, usar_indice, cache)
+    return ArchivoEmpleados(filename, usar_indice, cache)
+
+
+def leer_cabecera(filename: str) -> int:
+    """Lee la cabecera del archivo y retorna el número de registros"""
+    with abrir_sesion(filename, cache=CACHE_COMPARTIDA) as archivo:
+        return archivo.num_registros
+
+
+def leer_por_posicion(filename: str, posicion_1based: int) -> dict:
+    """
+    Lee un registro del archivo por su posición (1-based)
+    Retorna un diccionario con los datos del registro
+    """
+    with abrir_sesion(filename, cache=CACHE_COMPARTIDA) as archivo:
+        return archivo.leer_por_posicion(posicion_1based)
+
+
+def buscar_por_empleado(filename: str, num_empleado_buscado: int, traza=None, estrategia: str = "auto") -> dict or None:
+    """
+    Busca un empleado por número ("auto", "binaria", "interpolacion" o "indice")
+    Retorna el registro si lo encuentra, None si no existe
+    """
+    try:
+        with abrir_sesion(filename, cache=CACHE_COMPARTIDA) as archivo:
+            return archivo.buscar_por_empleado(num_empleado_buscado, traza, estrategia)
+    except ValueError:
+        raise
+    except FileNotFoundError:
+        raise
     except Exception as e:
         raise Exception(f"Error durante la búsqueda: {e}")
 
 
+def buscar_muchos_por_empleado(filename: str, claves) -> dict:
+    """
+    Busca muchos números de empleado con una sola apertura del archivo
+    Retorna un diccionario clave -> registro (o None si no existe)
+    """
+    try:
+        with abrir_sesion(filename, cache=CACHE_COMPARTIDA) as archivo:
+            return archivo.buscar_muchos_por_empleado(claves)
+    except FileNotFoundError:
+        raise
+    except Exception as e:
+        raise Exception(f"Error durante la búsqueda: {e}")
+
+
+def iterar_registros(filename: str, desde_pos: int = 1, hasta_pos: int = None):
+    """Recorre (como generador) los registros de desde_pos..hasta_pos, 1-based e inclusive"""
+    with abrir_sesion(filename) as archivo:
+        yield from archivo.iterar_registros(desde_pos, hasta_pos)
+
+
+def rango_por_empleado(filename: str, desde: int, hasta: int):
+    """Produce (como generador) los registros con num_empleado entre desde y hasta"""
+    with abrir_sesion(filename) as archivo:
+        yield from archivo.rango_por_empleado(desde, hasta)
+
+
+def buscar_por_ubicacion(filename: str, provincia: str = None, canton: str = None, distrito: str = None):
+    """Produce (como generador) los registros con la provincia, cantón y distrito indicados"""
+    with abrir_sesion(filename) as archivo:
+        yield from archivo.buscar_por_ubicacion(provincia, canton, distrito)
+
+
+def contar_por_ubicacion(filename: str, provincia: str = None, canton: str = None, distrito: str = None) -> int:
+    """Cantidad de registros con la provincia, cantón y distrito indicados"""
+    with abrir_sesion(filename) as archivo:
+        return archivo.contar_por_ubicacion(provincia, canton, distrito)
+
+
+def comparar_estrategias(filename: str, claves) -> dict:
+    """
+    Ejecuta la búsqueda de cada clave con todas las estrategias y
+    retorna, por estrategia, los sondeos totales, promedio y máximo
+    """
+    claves = list(claves)
+    resultado = {}
+    with ArchivoEmpleados(filename) as archivo:
+        for estrategia in ESTRATEGIAS:
+            if (estrategia == "indice" and archivo._indice is None) or \
+                    (estrategia == "directa" and archivo._posiciones is None):
+                continue
+            total = 0
+            maximo = 0
+            for clave in claves:
+                archivo.buscar_por_empleado(clave, estrategia=estrategia)
+                total += archivo.ultimos_sondeos
+                maximo = max(maximo, archivo.ultimos_sondeos)
+            resultado[estrategia] = {
+                'sondeos_totales': total,
+                'promedio': total / len(claves) if claves else 0.0,
+                'maximo': maximo
+            }
+    return resultado
+
+
+def mostrar_comparacion(posicion: int, num_empleado: int):
+    """Traza para buscar_por_empleado que muestra cada comparación"""
+    print(f"  Comparando con posición {posicion}: empleado #{num_empleado}")
+
+
 def mostrar_registro(registro: dict):
     """Muestra un registro formateado"""
     print("\n" + "="*50)
@@ -143,12 +1863,24 @@ def mostrar_registro(registro: dict):
 # Funciones para ser usadas por el controlador
 def obtener_info_archivo(filename: str) -> dict:
     """Obtiene información básica del archivo"""
-    n = leer_cabecera(filename)
-    return {
-        'num_registros': n,
-        'tamano_registro': RECORD_SIZE,
-        'tamano_total': COUNT_STRUCT.size + (n * RECORD_SIZE)
-    }
+    with abrir_sesion(filename, cache=CACHE_COMPARTIDA) as archivo:
+        return archivo.obtener_info_archivo()
+
+
+def estadisticas(filename: str) -> dict:
+    """Conteos por provincia, edad y año de nacimiento (ver ArchivoEmpleados.estadisticas)"""
+    with abrir_sesion(filename) as archivo:
+        return archivo.estadisticas()
+
+
+def estadisticas_cache() -> dict:
+    """Aciertos, fallos, expulsiones y uso de la caché compartida del módulo"""
+    return CACHE_COMPARTIDA.estadisticas()
+
+
+def estadisticas_bloom() -> dict:
+    """Consultas al filtro de Bloom y búsquedas de claves inexistentes que evitó"""
+    return dict(_CONTADORES_BLOOM)
 
 
 if __name__ == "__main__":
@@ -170,7 +1902,7 @@ if __name__ == "__main__":
         elif opcion == '2':
             num = int(input("Número de empleado: "))
             print("\nRealizando búsqueda binaria...")
-            registro = buscar_por_empleado(filename, num)
+            registro = buscar_por_empleado(filename, num, traza=mostrar_comparacion)
             if registro:
                 mostrar_registro(registro)
             else:
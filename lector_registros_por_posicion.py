@@ -1,3 +1,4 @@
+import os
 import struct
 from datetime import date
 
@@ -11,27 +12,46 @@ DIST_LEN = 20
 RECORD_STRUCT = struct.Struct(f">{NAME_LEN}s B I {PROV_LEN}s {CANT_LEN}s {DIST_LEN}s")
 RECORD_SIZE = RECORD_STRUCT.size
 
+# Los archivos nuevos (generador_ordenado.py) agregan num_empleado (I) al final del registro
+KEYED_RECORD_SIZE = RECORD_SIZE + struct.calcsize(">I")
+V2_MAGIC = b"EMP2"
+
 
 def unpack_fixed_str(b: bytes) -> str:
     return b.split(b"\0", 1)[0].decode("utf-8", errors="replace")
 
 
+def detect_record_size(header: bytes, n: int, file_size: int) -> int:
+    # Tamaño de registro según la cantidad de la cabecera y el tamaño del archivo:
+    # formato anterior (sin num_empleado) o v1 con num_empleado (quizás con cola de agregados)
+    if header == V2_MAGIC:
+        raise ValueError("El archivo usa el formato v2; léalo con lector_con_busqueda.py.")
+    if file_size == COUNT_STRUCT.size + n * RECORD_SIZE:
+        return RECORD_SIZE
+    if file_size >= COUNT_STRUCT.size + n * KEYED_RECORD_SIZE:
+        return KEYED_RECORD_SIZE
+    raise ValueError(f"El tamaño del archivo ({file_size} bytes) no corresponde a {n} registros "
+                     f"de {RECORD_SIZE} ni de {KEYED_RECORD_SIZE} bytes (archivo truncado o de otro formato).")
+
+
 def read_record_at(filename: str, position_1based: int):
     with open(filename, "rb") as f:
-        (n,) = COUNT_STRUCT.unpack(f.read(COUNT_STRUCT.size))
+        header = f.read(COUNT_STRUCT.size)
+        (n,) = COUNT_STRUCT.unpack(header)
+        record_size = detect_record_size(header, n, os.fstat(f.fileno()).st_size)
 
         if position_1based < 1 or position_1based > n:
             raise ValueError(f"Posición inválida: {position_1based}. Debe estar entre 1 y {n}.")
 
         header_size = COUNT_STRUCT.size
-        offset = header_size + (position_1based - 1) * RECORD_SIZE
+        offset = header_size + (position_1based - 1) * record_size
         f.seek(offset)
 
-        data = f.read(RECORD_SIZE)
-        if len(data) != RECORD_SIZE:
+        data = f.read(record_size)
+        if len(data) != record_size:
             raise IOError("No se pudo leer el registro completo (archivo corrupto o truncado).")
 
-        nombre_b, edad, fecha_ord, prov_b, canton_b, dist_b = RECORD_STRUCT.unpack(data)
+        nombre_b, edad, fecha_ord, prov_b, canton_b, dist_b = RECORD_STRUCT.unpack_from(data)
 
         # Reconstruir date (objeto real)
         fecha_nacimiento = date.fromordinal(fecha_ord)
@@ -0,0 +1,161 @@
+"""
+Métricas y trazas de lector_con_busqueda y generador_ordenado
+Cuenta sondeos por búsqueda, bytes leídos, seeks y llamadas al sistema,
+arma histogramas de latencia por operación y acumula el tiempo de cada fase
+de la generación (generar, ordenar, escribir, índices).
+Están desactivadas por defecto: los módulos solo consultan 'activas' antes
+de medir, así que apagadas casi no cuestan nada.
+Los observadores (agregar_observador) reciben cada evento como
+observador(evento, datos) para trazas a medida.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+activas = False
+
+_lock = threading.Lock()
+_contadores = {}
+_histogramas = {}     # operación -> lista de cantidades por cubeta (potencias de 2 en µs)
+_fases = {}           # fase -> [veces, segundos]
+_observadores = []
+
+
+def activar():
+    """Empieza a registrar métricas"""
+    global activas
+    activas = True
+
+
+def desactivar():
+    """Deja de registrar métricas (lo acumulado se conserva)"""
+    global activas
+    activas = False
+
+
+def reiniciar():
+    """Borra todo lo acumulado"""
+    with _lock:
+        _contadores.clear()
+        _histogramas.clear()
+        _fases.clear()
+
+
+def agregar_observador(observador):
+    """Registra una función observador(evento, datos) que recibe cada evento"""
+    _observadores.append(observador)
+
+
+def quitar_observador(observador):
+    """Quita un observador registrado con agregar_observador"""
+    _observadores.remove(observador)
+
+
+def _notificar(evento: str, datos: dict):
+    for observador in list(_observadores):
+        observador(evento, datos)
+
+
+def sumar(contador: str, cantidad: int = 1):
+    """Suma 'cantidad' a un contador"""
+    with _lock:
+        _contadores[contador] = _contadores.get(contador, 0) + cantidad
+
+
+def registrar_lectura(bytes_leidos: int, seeks: int = 0, llamadas_sistema: int = 0):
+    """Registra una lectura del archivo (desde mmap no hay seeks ni llamadas al sistema)"""
+    with _lock:
+        _contadores['lecturas'] = _contadores.get('lecturas', 0) + 1
+        _contadores['bytes_leidos'] = _contadores.get('bytes_leidos', 0) + bytes_leidos
+        _contadores['seeks'] = _contadores.get('seeks', 0) + seeks
+        _contadores['llamadas_sistema'] = _contadores.get('llamadas_sistema', 0) + llamadas_sistema
+    if _observadores:
+        _notificar("lectura", {'bytes': bytes_leidos, 'seeks': seeks, 'llamadas_sistema': llamadas_sistema})
+
+
+def registrar_llamada(operacion: str, segundos: float, **datos):
+    """
+    Registra la latencia de una llamada en el histograma de 'operacion'.
+    Si 'datos' trae 'sondeos', también se suman al contador de sondeos.
+    """
+    cubeta = int(segundos * 1e6).bit_length()  # cubeta i: menos de 2**i µs
+    with _lock:
+        histograma = _histogramas.setdefault(operacion, [])
+        if len(histograma) <= cubeta:
+            histograma.extend([0] * (cubeta + 1 - len(histograma)))
+        histograma[cubeta] += 1
+        if 'sondeos' in datos:
+            _contadores['sondeos'] = _contadores.get('sondeos', 0) + datos['sondeos']
+    if _observadores:
+        _notificar(operacion, dict(datos, segundos=segundos))
+
+
+@contextmanager
+def fase(nombre: str):
+    """Acumula el tiempo del bloque 'with' en la fase 'nombre' (si las métricas están activas)"""
+    if not activas:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        sumar_fase(nombre, time.perf_counter() - inicio)
+
+
+def sumar_fase(nombre: str, segundos: float):
+    """Suma tiempo a una fase medida por fuera de fase()"""
+    with _lock:
+        acumulado = _fases.setdefault(nombre, [0, 0.0])
+        acumulado[0] += 1
+        acumulado[1] += segundos
+    if _observadores:
+        _notificar("fase", {'fase': nombre, 'segundos': segundos})
+
+
+def _percentil(histograma: list, total: int, p: float) -> int:
+    """Cota superior (µs) del percentil p según las cubetas del histograma"""
+    objetivo = p * total
+    acumulado = 0
+    for cubeta, cantidad in enumerate(histograma):
+        acumulado += cantidad
+        if acumulado >= objetivo:
+            return 1 << cubeta
+    return 1 << len(histograma)
+
+
+def resumen() -> dict:
+    """Copia de todo lo acumulado: contadores, latencias por operación y fases"""
+    with _lock:
+        latencias = {}
+        for operacion, histograma in _histogramas.items():
+            total = sum(histograma)
+            latencias[operacion] = {
+                'llamadas': total,
+                'p50_us': _percentil(histograma, total, 0.50),
+                'p95_us': _percentil(histograma, total, 0.95),
+                'p99_us': _percentil(histograma, total, 0.99),
+                'histograma': list(histograma),
+            }
+        return {
+            'activas': activas,
+            'contadores': dict(_contadores),
+            'latencias': latencias,
+            'fases': {nombre: {'veces': veces, 'segundos': segundos}
+                      for nombre, (veces, segundos) in _fases.items()},
+        }
+
+
+def formatear_resumen(datos: dict = None) -> str:
+    """Texto legible del resumen (para mostrar en pantalla)"""
+    datos = resumen() if datos is None else datos
+    lineas = [f"Métricas: {'activas' if datos['activas'] else 'desactivadas'}"]
+    for nombre, valor in sorted(datos['contadores'].items()):
+        lineas.append(f"  {nombre}: {valor}")
+    for operacion, lat in sorted(datos['latencias'].items()):
+        lineas.append(f"  {operacion}: {lat['llamadas']} llamadas, p50 < {lat['p50_us']} µs, "
+                      f"p95 < {lat['p95_us']} µs, p99 < {lat['p99_us']} µs")
+    for nombre, fase_datos in sorted(datos['fases'].items()):
+        lineas.append(f"  fase {nombre}: {fase_datos['segundos']:.3f} s ({fase_datos['veces']} veces)")
+    return "\n".join(lineas)
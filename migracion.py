@@ -0,0 +1,240 @@
+"""
+Migración de archivos del formato anterior (generador_registros.py: registros
+de RECORD_SIZE_LEGADO bytes sin num_empleado) al formato ordenado con clave
+El archivo se convierte por bloques sin cargarlo completo. Los números de
+empleado se generan en orden ascendente (un tramo por registro, igual que
+generador_ordenado.generar_claves_ordenadas), así que el orden del archivo
+original se conserva y no hace falta ordenar; o se toman de un archivo de
+claves con un número por línea (la línea i es el registro i). Si esas
+claves no vienen ordenadas, los registros se ordenan con corridas en disco
+y mezcla final, igual que en generar_archivo_por_lotes.
+"""
+
+import os
+import random
+import tempfile
+import time
+from itertools import islice
+
+import generador_ordenado as generador
+import lector_con_busqueda as lector
+import metricas
+
+REGISTROS_POR_BLOQUE = (1 << 20) // lector.RECORD_SIZE_LEGADO  # bloques de aprox. 1 MiB
+
+
+def leer_cabecera_legado(filename: str) -> int:
+    """
+    Cantidad de registros de un archivo del formato anterior. Lanza
+    ValueError si el tamaño del archivo no corresponde a ese formato.
+    """
+    try:
+        tamano = os.path.getsize(filename)
+        with open(filename, "rb") as f:
+            cabecera = f.read(lector.COUNT_STRUCT.size)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Archivo '{filename}' no encontrado.")
+    if len(cabecera) < lector.COUNT_STRUCT.size:
+        raise ValueError("El archivo es demasiado pequeño para contener la cabecera.")
+    (n,) = lector.COUNT_STRUCT.unpack(cabecera)
+    if n == 0 and tamano == lector.COUNT_STRUCT.size:
+        return 0
+    if not lector.es_formato_legado(n, tamano):
+        raise ValueError(f"'{filename}' no tiene el formato anterior: {n} registros de "
+                         f"{lector.RECORD_SIZE_LEGADO} bytes medirían "
+                         f"{lector.COUNT_STRUCT.size + n * lector.RECORD_SIZE_LEGADO} bytes, no {tamano}.")
+    return n
+
+
+def leer_bloques_legado(filename: str, registros_por_bloque: int = REGISTROS_POR_BLOQUE):
+    """Produce los registros del formato anterior en bloques de bytes contiguos"""
+    por_lectura = registros_por_bloque * lector.RECORD_SIZE_LEGADO
+    with open(filename, "rb") as f:
+        f.seek(lector.COUNT_STRUCT.size)
+        while True:
+            bloque = f.read(por_lectura)
+            if not bloque:
+                return
+            yield bloque
+
+
+def leer_claves(ruta: str):
+    """Números de empleado de un archivo de claves (uno por línea; se saltan las líneas vacías)"""
+    try:
+        with open(ruta, encoding="utf-8") as f:
+            for linea, texto in enumerate(f, 1):
+                texto = texto.strip()
+                if not texto:
+                    continue
+                try:
+                    clave = int(texto)
+                except ValueError:
+                    raise ValueError(f"Línea {linea} del archivo de claves: número inválido {texto!r}.")
+                if not 0 <= clave <= generador.CLAVE_MAX_PERMITIDA:
+                    raise ValueError(f"Línea {linea} del archivo de claves: {clave} fuera de "
+                                     f"0..{generador.CLAVE_MAX_PERMITIDA}.")
+                yield clave
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Archivo de claves '{ruta}' no encontrado.")
+
+
+def _revisar_claves(ruta: str, n: int) -> bool:
+    """
+    Verifica que el archivo de claves tenga exactamente n claves válidas.
+    Retorna True si ya vienen en orden estrictamente ascendente.
+    """
+    cantidad = 0
+    ascendentes = True
+    anterior = -1
+    for clave in leer_claves(ruta):
+        cantidad += 1
+        if clave <= anterior:
+            ascendentes = False
+        anterior = clave
+    if cantidad != n:
+        raise ValueError(f"El archivo de claves tiene {cantidad} números de empleado y el archivo "
+                         f"a migrar tiene {n} registros.")
+    return ascendentes
+
+
+def codigo_ubicacion(texto: str) -> int:
+    """Código de un texto de ubicación en el diccionario del formato v2"""
+    try:
+        return generador.DICCIONARIO_UBICACION.index(texto)
+    except ValueError:
+        raise ValueError(f"La ubicación '{texto}' no está en el diccionario del formato v2.")
+
+
+def convertir_bloque(bloque: bytes, claves, formato: int = 1) -> bytes:
+    """
+    Convierte un bloque de registros del formato anterior al formato dado,
+    agregando a cada registro la siguiente clave de 'claves'
+    """
+    tamano = lector.RECORD_SIZE_LEGADO
+    cantidad = len(bloque) // tamano
+    claves = list(islice(claves, cantidad))
+    if len(claves) < cantidad:
+        raise ValueError("Faltan números de empleado para los registros del bloque.")
+    if formato == 1:
+        # Un registro v1 es el registro anterior con num_empleado al final
+        partes = [None] * (2 * cantidad)
+        partes[0::2] = [bloque[i:i + tamano] for i in range(0, len(bloque), tamano)]
+        partes[1::2] = map(generador.KEY_STRUCT.pack, claves)
+        return b"".join(partes)
+
+    codigos = {}  # bytes de la ubicación -> código del diccionario v2
+    pack = lector.RECORD_STRUCT_V2.pack
+    partes = []
+    for (nombre, edad, fecha_ordinal, provincia, canton, distrito), clave in zip(
+            lector.RECORD_STRUCT_LEGADO.iter_unpack(bloque), claves):
+        ubicacion = []
+        for texto in (provincia, canton, distrito):
+            codigo = codigos.get(texto)
+            if codigo is None:
+                codigo = codigos[texto] = codigo_ubicacion(lector.unpack_fixed_str(texto))
+            ubicacion.append(codigo)
+        partes.append(pack(nombre, edad, fecha_ordinal, *ubicacion, clave))
+    return b"".join(partes)
+
+
+def migrar(origen: str, filename: str, formato: int = 1, claves: str = None, semilla=None,
+           clave_min: int = generador.CLAVE_MIN, clave_max: int = None,
+           registros_por_lote: int = generador.REGISTROS_POR_LOTE, agregados: bool = False,
+           **indices) -> dict:
+    """
+    Convierte un archivo del formato anterior en un .bin ordenado por
+    num_empleado. Sin 'claves' los números se generan en orden ascendente
+    en clave_min..clave_max (por defecto hasta generador.CLAVE_MAX, o lo
+    justo para n registros) con la 'semilla' dada. Con 'claves' (ruta) se
+    toman de ese archivo; deben ser exactamente n y no repetirse.
+    El .bin se escribe en un temporal y reemplaza al destino de forma
+    atómica, así que 'filename' puede ser el mismo 'origen'; 'indices' son
+    los parámetros de guardar_indices.
+    Retorna num_registros, formato, claves ('generadas' o 'archivo'),
+    semilla, segundos y registros_por_s.
+    """
+    if formato not in generador.FORMATOS:
+        raise ValueError(f"Formato desconocido: {formato}. Use 1 o 2.")
+    if registros_por_lote < 1:
+        raise ValueError("La cantidad de registros por lote debe ser al menos 1.")
+    inicio = time.perf_counter()
+    n = leer_cabecera_legado(origen)
+    ordenadas = True
+    if claves is None:
+        semilla = int(time.time()) if semilla is None else semilla
+        if clave_max is None:
+            clave_max = max(generador.CLAVE_MAX, clave_min + n - 1)
+        secuencia = generador.generar_claves_ordenadas(n, random.Random(semilla), clave_min, clave_max)
+    else:
+        semilla = None
+        ordenadas = _revisar_claves(claves, n)
+        secuencia = leer_claves(claves)
+    tamano = generador.RECORD_SIZE if formato == 1 else generador.RECORD_SIZE_V2
+    bloques = (convertir_bloque(bloque, secuencia, formato) for bloque in leer_bloques_legado(origen))
+
+    directorio = os.path.dirname(os.path.abspath(filename))
+    with tempfile.TemporaryDirectory(prefix="migracion_", dir=directorio) as tmp:
+        ordenados = None
+        if not ordenadas:
+            # Claves en otro orden: corridas ordenadas y mezcla, como en generar_archivo_por_lotes
+            corridas = []
+            lote = []
+            for bloque in bloques:
+                lote.extend(bloque[i:i + tamano] for i in range(0, len(bloque), tamano))
+                while len(lote) >= registros_por_lote:
+                    corridas.append(generador.escribir_corrida(lote[:registros_por_lote], tmp))
+                    del lote[:registros_por_lote]
+            if lote:
+                corridas.append(generador.escribir_corrida(lote, tmp))
+            lote = None
+            ordenados = generador.mezclar_corridas(corridas, tmp, tamano)
+
+        fd, temporal = tempfile.mkstemp(suffix=".tmp", dir=directorio)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                generador.escribir_cabecera(f, n, formato)
+                with generador.EscritorRegistros(f, formato=formato, agregados=agregados) as escritor:
+                    if ordenados is None:
+                        with metricas.fase("convertir"):
+                            for bloque in bloques:
+                                escritor.agregar_bloque(bloque)
+                    else:
+                        anterior = None
+                        for packed in ordenados:
+                            clave = generador.clave_empaquetada(packed)
+                            if clave == anterior:
+                                raise ValueError(f"num_empleado {generador.KEY_STRUCT.unpack(clave)[0]} "
+                                                 f"repetido en el archivo de claves.")
+                            anterior = clave
+                            escritor.agregar_empaquetado(packed)
+                    if agregados:
+                        escritor.escribir_agregados()
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporal, filename)
+        except BaseException:
+            os.remove(temporal)
+            raise
+
+    generador.guardar_indices(filename, **indices)
+    segundos = time.perf_counter() - inicio
+    return {'num_registros': n, 'formato': formato, 'claves': 'generadas' if claves is None else 'archivo',
+            'semilla': semilla, 'segundos': round(segundos, 3),
+            'registros_por_s': round(n / segundos) if segundos > 0 else None}
+
+
+if __name__ == "__main__":
+    print("=== MIGRACIÓN DEL FORMATO ANTERIOR (SIN NÚMERO DE EMPLEADO) ===")
+    origen = input("Archivo a migrar: ").strip()
+    destino = input("Archivo .bin de salida: ").strip()
+    archivo_claves = input("Archivo de claves (Enter para generarlas): ").strip() or None
+    try:
+        resultado = migrar(origen, destino, claves=archivo_claves)
+        print(f"¡OK! {resultado['num_registros']} registros migrados a '{destino}' "
+              f"({resultado['registros_por_s']} registros/s).")
+        if resultado['semilla'] is not None:
+            print(f"Semilla de los números de empleado: {resultado['semilla']}")
+    except FileNotFoundError as e:
+        print(f"Error: {e}")
+    except Exception as e:
+        print(f"Error en la migración: {e}")
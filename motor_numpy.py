@@ -0,0 +1,199 @@
+"""
+Motor columnar con NumPy para los archivos de empleados
+Mapea un .bin de generador_ordenado directamente a un arreglo estructurado
+de NumPy (sin struct.unpack por registro) y permite búsquedas vectorizadas
+por num_empleado, filtros masivos y generación vectorizada de archivos.
+NumPy es opcional: el resto del sistema funciona sin este módulo.
+"""
+
+from datetime import date
+
+try:
+    import numpy as np
+except ImportError:  # NumPy es opcional
+    np = None
+
+import generador_ordenado as generador
+import lector_con_busqueda as lector
+
+
+def _requerir_numpy():
+    """Lanza un error claro si NumPy no está instalado"""
+    if np is None:
+        raise ImportError("El motor columnar necesita NumPy (pip install numpy).")
+
+
+if np is not None:
+    # Mismo orden, tamaños y endianness que RECORD_STRUCT (sin relleno)
+    DTYPE_REGISTRO = np.dtype([
+        ('nombre', f'S{lector.NAME_LEN}'),
+        ('edad', 'u1'),
+        ('fecha_ordinal', '>u4'),
+        ('provincia', f'S{lector.PROV_LEN}'),
+        ('canton', f'S{lector.CANT_LEN}'),
+        ('distrito', f'S{lector.DIST_LEN}'),
+        ('num_empleado', '>u4'),
+    ])
+    assert DTYPE_REGISTRO.itemsize == lector.RECORD_SIZE
+else:
+    DTYPE_REGISTRO = None
+
+
+def abrir_registros(filename: str, modo: str = "r"):
+    """
+    Mapea los registros de un .bin como arreglo estructurado (np.memmap)
+    'modo' es el de np.memmap: "r" solo lectura, "r+" para modificar en el sitio.
+    Solo admite el formato v1 (registros de tamaño RECORD_SIZE).
+    """
+    _requerir_numpy()
+    with lector.ArchivoEmpleados(filename, usar_indice=False) as datos:
+        if datos.formato != 1:
+            raise ValueError("El motor columnar solo admite archivos en formato v1.")
+        n = datos.num_registros
+    if n == 0:
+        return np.empty(0, dtype=DTYPE_REGISTRO)
+    return np.memmap(filename, dtype=DTYPE_REGISTRO, mode=modo,
+                     offset=lector.COUNT_STRUCT.size, shape=(n,))
+
+
+def desde_bytes(datos: bytes):
+    """Interpreta el contenido completo de un .bin v1 (cabecera incluida) sin copiarlo"""
+    _requerir_numpy()
+    if lector.leer_disposicion(lambda offset, cantidad: datos[offset:offset + cantidad],
+                               len(datos))['formato'] != 1:
+        raise ValueError("El motor columnar solo admite archivos en formato v1.")
+    (n,) = lector.COUNT_STRUCT.unpack_from(datos, 0)
+    return np.frombuffer(datos, dtype=DTYPE_REGISTRO, count=n, offset=lector.COUNT_STRUCT.size)
+
+
+def a_diccionario(registros, indice: int) -> dict:
+    """Convierte el registro en 'indice' (0-based) al diccionario de lector_con_busqueda"""
+    reg = registros[indice]
+    return {
+        'nombre': lector.unpack_fixed_str(reg['nombre']),
+        'edad': int(reg['edad']),
+        'fecha_nacimiento': date.fromordinal(int(reg['fecha_ordinal'])),
+        'provincia': lector.unpack_fixed_str(reg['provincia']),
+        'canton': lector.unpack_fixed_str(reg['canton']),
+        'distrito': lector.unpack_fixed_str(reg['distrito']),
+        'num_empleado': int(reg['num_empleado']),
+        'posicion': int(indice) + 1
+    }
+
+
+def buscar_posiciones(registros, claves):
+    """
+    Búsqueda vectorizada (searchsorted) de muchas claves a la vez
+    Retorna un arreglo con la posición 1-based de cada clave, o 0 si no existe
+    """
+    _requerir_numpy()
+    columna = registros['num_empleado']
+    claves = np.asarray(claves, dtype=np.int64)
+    indices = np.searchsorted(columna, claves)
+    dentro = indices < len(columna)
+    encontradas = np.zeros(len(claves), dtype=bool)
+    encontradas[dentro] = columna[indices[dentro]] == claves[dentro]
+    return np.where(encontradas, indices + 1, 0)
+
+
+def buscar_por_empleado(registros, num_empleado: int) -> dict or None:
+    """Busca un empleado con searchsorted; retorna el registro o None"""
+    (pos,) = buscar_posiciones(registros, [num_empleado])
+    return a_diccionario(registros, pos - 1) if pos else None
+
+
+def filtrar_por_edad(registros, minima: int, maxima: int):
+    """Registros con edad entre 'minima' y 'maxima' (inclusive)"""
+    edad = registros['edad']
+    return registros[(edad >= minima) & (edad <= maxima)]
+
+
+def filtrar_por_nacimiento(registros, desde: date, hasta: date):
+    """Registros nacidos entre las fechas 'desde' y 'hasta' (inclusive)"""
+    fecha = registros['fecha_ordinal']
+    return registros[(fecha >= desde.toordinal()) & (fecha <= hasta.toordinal())]
+
+
+def _tabla_inicio_mes(anio_min: int, anio_max: int):
+    """Ordinal del día 1 de cada mes, indexado por [anio - anio_min, mes - 1]"""
+    return np.array([[date(anio, mes, 1).toordinal() for mes in range(1, 13)]
+                     for anio in range(anio_min, anio_max + 1)], dtype=np.int64)
+
+
+def generar_arreglo(n: int, semilla: int, clave_min: int = generador.CLAVE_MIN,
+                    clave_max: int = generador.CLAVE_MAX):
+    """
+    Genera n registros aleatorios directamente en un arreglo estructurado,
+    ya ordenados por num_empleado (una clave al azar por tramo del rango,
+    como generador_ordenado.generar_claves_ordenadas)
+    """
+    _requerir_numpy()
+    generador.validar_rango_claves(n, clave_min, clave_max)
+    rng = np.random.default_rng(semilla)
+    registros = np.zeros(n, dtype=DTYPE_REGISTRO)
+    i = np.arange(n, dtype=np.int64)
+
+    # Números de empleado únicos y ordenados
+    espacio = clave_max - clave_min + 1
+    desde = clave_min + i * espacio // n
+    hasta = clave_min + (i + 1) * espacio // n
+    registros['num_empleado'] = desde + (rng.random(n) * (hasta - desde)).astype(np.int64)
+
+    # Ubicación: provincia, luego un cantón de esa provincia, y un distrito
+    provincias = np.array([prov.encode("utf-8") for prov, _ in generador.PROVINCIAS])
+    cantones = np.array([c.encode("utf-8") for _, cs in generador.PROVINCIAS for c in cs])
+    cantidad = np.array([len(cs) for _, cs in generador.PROVINCIAS])
+    primer_canton = np.concatenate(([0], np.cumsum(cantidad)[:-1]))
+    prov = rng.integers(0, len(provincias), n)
+    canton = primer_canton[prov] + (rng.random(n) * cantidad[prov]).astype(np.int64)
+    registros['provincia'] = provincias[prov]
+    registros['canton'] = cantones[canton]
+    registros['distrito'] = np.array([d.encode("utf-8") for d in generador.DISTRITOS])[
+        rng.integers(0, len(generador.DISTRITOS), n)]
+
+    # Fecha de nacimiento (1950-2010, días 1-28) y edad a la fecha de hoy
+    anio = rng.integers(1950, 2011, n)
+    mes = rng.integers(1, 13, n)
+    dia = rng.integers(1, 29, n)
+    registros['fecha_ordinal'] = _tabla_inicio_mes(1950, 2010)[anio - 1950, mes - 1] + dia - 1
+    hoy = date.today()
+    no_cumplio = (mes > hoy.month) | ((mes == hoy.month) & (dia > hoy.day))
+    registros['edad'] = np.clip(hoy.year - anio - no_cumplio, 0, 255)
+
+    # Nombre: nombre al azar + número de registro (el formato S40 recorta a 40 bytes)
+    nombres = np.array([(nombre + " ").encode("utf-8") for nombre in generador.NOMBRES])
+    registros['nombre'] = np.char.add(nombres[rng.integers(0, len(nombres), n)],
+                                      np.char.encode((i + 1).astype(str), "ascii"))
+    return registros
+
+
+def conteos_agregados(registros) -> tuple:
+    """Conteos por provincia, edad y fecha ordinal (np.unique por columna) para la cola de agregados"""
+    _requerir_numpy()
+    conteos = []
+    for campo in ('provincia', 'edad', 'fecha_ordinal'):
+        valores, cantidades = np.unique(registros[campo], return_counts=True)
+        if campo == 'provincia':
+            valores = [lector.unpack_fixed_str(valor) for valor in valores]
+        else:
+            valores = valores.tolist()
+        conteos.append(dict(zip(valores, cantidades.tolist())))
+    return tuple(conteos)
+
+
+def guardar_arreglo(filename: str, registros, indice_cada: int = None, indice_ubicacion: bool = False,
+                    indice_posiciones: bool = False, filtro_bloom: float = None, agregados: bool = False):
+    """
+    Guarda un arreglo estructurado como .bin (cabecera + un solo tofile)
+    Los registros deben estar ordenados por num_empleado. Con 'agregados'
+    también escribe la cola de conteos (calculados con np.unique).
+    """
+    _requerir_numpy()
+    registros = np.asarray(registros, dtype=DTYPE_REGISTRO)
+    with open(filename, "wb") as f:
+        f.write(generador.COUNT_STRUCT.pack(len(registros)))
+        registros.tofile(f)
+        if agregados:
+            f.write(generador.cola_agregados(len(registros), conteos_agregados(registros)))
+
+    generador.guardar_indices(filename, indice_cada, indice_ubicacion, indice_posiciones, filtro_bloom)
@@ -0,0 +1,348 @@
+"""
+Servidor local de búsquedas de empleados (asyncio)
+Abre cada archivo .bin una sola vez (mmap compartido) y atiende
+leer_por_posicion, buscar_por_empleado, rangos e información del archivo
+para varios procesos a la vez, por un socket Unix o TCP en localhost.
+
+Protocolo: cada mensaje es un entero >I con el largo seguido de un objeto
+JSON en UTF-8. Pedido: {"id": n, "op": "leer" | "buscar" | "rango" | "info",
+"archivo": ruta, ...}. Respuesta: {"id": n, "ok": true, "resultado": ...}
+o {"id": n, "ok": false, "error": texto}. Una conexión puede enviar varios
+pedidos sin esperar; las respuestas llevan el id del pedido.
+
+Los pedidos iguales que llegan a la vez se resuelven una sola vez, y las
+búsquedas por número de empleado se agrupan en lotes que se resuelven con
+buscar_muchos_por_empleado. Las lecturas se hacen en un pool de hilos para
+no bloquear el ciclo de eventos.
+
+Uso: python servidor.py archivo.bin [otro.bin ...] [--socket RUTA | --puerto N]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import lector_con_busqueda as lector
+
+LARGO_STRUCT = struct.Struct(">I")
+MAX_MENSAJE = 16 << 20              # 16 MiB por mensaje
+HOST = "127.0.0.1"
+PUERTO = 8765
+HILOS = 4
+MAX_LOTE = 1024                     # claves por lote de buscar_muchos_por_empleado
+MAX_RANGO = 100_000                 # registros por respuesta de un rango
+SEGUNDOS_VERIFICACION = 1.0         # cada cuánto se revisa si el .bin o el .delta cambiaron
+
+
+def registro_a_json(registro: dict) -> dict or None:
+    """Registro del lector con la fecha en formato ISO (serializable a JSON)"""
+    if registro is None:
+        return None
+    datos = dict(registro)
+    datos['fecha_nacimiento'] = registro['fecha_nacimiento'].isoformat()
+    return datos
+
+
+def valor_entero(valor, campo: str) -> int:
+    """Valor entero de un pedido o consulta; rechaza decimales y booleanos en vez de truncarlos"""
+    if isinstance(valor, bool) or (isinstance(valor, float) and not valor.is_integer()):
+        raise ValueError(f"{campo} debe ser un entero: {valor!r}")
+    if isinstance(valor, float):
+        return int(valor)
+    if isinstance(valor, str):
+        try:
+            return int(valor.strip())
+        except ValueError:
+            raise ValueError(f"{campo} debe ser un entero: {valor!r}")
+    if not isinstance(valor, int):
+        raise ValueError(f"{campo} debe ser un entero: {valor!r}")
+    return valor
+
+
+def _firma_archivo(filename: str) -> tuple:
+    """Tamaño y mtime del .bin y de su .delta (para notar regeneraciones y cambios)"""
+    firma = []
+    for ruta in (filename, filename + lector.DELTA_EXTENSION):
+        try:
+            st = os.stat(ruta)
+            firma.append((st.st_size, st.st_mtime_ns))
+        except FileNotFoundError:
+            firma.append(None)
+    return tuple(firma)
+
+
+class _ArchivoServido:
+    """Sesión abierta de un .bin (o conjunto particionado) y su cola de búsquedas pendientes"""
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.datos = None
+        self.firma = None
+        self.verificado = 0.0
+        self.lock = threading.Lock()  # solo para abrir o volver a abrir la sesión
+        self.en_curso = {}            # (op, argumentos) -> Future compartido
+        self.claves_pendientes = {}   # num_empleado -> Future del lote
+        self.lote_programado = False
+
+    def sesion(self, ahora: float) -> lector.ArchivoEmpleados:
+        """La sesión abierta; se vuelve a abrir si el archivo cambió"""
+        if self.datos is None or ahora - self.verificado >= SEGUNDOS_VERIFICACION:
+            self.verificado = ahora
+            firma = _firma_archivo(self.filename)
+            if self.datos is None or firma != self.firma:
+                # La sesión anterior no se cierra: algún hilo puede estar leyéndola;
+                # se libera cuando nadie la referencia.
+                self.datos = lector.abrir_sesion(self.filename)
+                self.firma = firma
+        return self.datos
+
+
+class ServidorEmpleados:
+    """Atiende pedidos para un conjunto fijo de archivos .bin"""
+
+    def __init__(self, archivos, hilos: int = HILOS):
+        self._archivos = {os.path.abspath(a): _ArchivoServido(a) for a in archivos}
+        self._pool = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="lector")
+        self.pedidos = 0
+        self.coalescidos = 0
+        self.lotes = 0
+
+    def _archivo(self, ruta: str) -> _ArchivoServido:
+        archivo = self._archivos.get(os.path.abspath(ruta or ""))
+        if archivo is None:
+            raise ValueError(f"El archivo '{ruta}' no está servido.")
+        return archivo
+
+    async def _en_pool(self, funcion, *argumentos):
+        return await asyncio.get_running_loop().run_in_executor(self._pool, funcion, *argumentos)
+
+    async def _una_vez(self, archivo: _ArchivoServido, clave: tuple, funcion, *argumentos):
+        """Ejecuta funcion en el pool; pedidos iguales simultáneos comparten el resultado"""
+        futuro = archivo.en_curso.get(clave)
+        if futuro is not None:
+            self.coalescidos += 1
+            return await asyncio.shield(futuro)  # cancelar a uno no cancela a los demás
+        futuro = asyncio.get_running_loop().create_future()
+        archivo.en_curso[clave] = futuro
+        try:
+            futuro.set_result(await self._en_pool(funcion, *argumentos))
+        except asyncio.CancelledError:
+            raise
+        except BaseException as e:
+            futuro.set_exception(e)
+        finally:
+            # Si esta tarea se canceló, los pedidos iguales que esperan no quedan colgados
+            if not futuro.done():
+                futuro.cancel()
+            del archivo.en_curso[clave]
+        return await futuro
+
+    async def _buscar(self, archivo: _ArchivoServido, num_empleado: int) -> dict:
+        """Encola la clave en el lote del archivo y espera su resultado"""
+        futuro = archivo.claves_pendientes.get(num_empleado)
+        if futuro is not None:
+            self.coalescidos += 1
+        else:
+            futuro = asyncio.get_running_loop().create_future()
+            archivo.claves_pendientes[num_empleado] = futuro
+            if not archivo.lote_programado:
+                archivo.lote_programado = True
+                # El lote corre en la próxima vuelta del ciclo: junta las claves
+                # de todos los pedidos que ya llegaron
+                asyncio.ensure_future(self._resolver_lote(archivo))
+        return await asyncio.shield(futuro)
+
+    async def _resolver_lote(self, archivo: _ArchivoServido):
+        """Resuelve en el pool todas las búsquedas acumuladas durante esta vuelta del ciclo"""
+        archivo.lote_programado = False
+        pendientes = archivo.claves_pendientes
+        archivo.claves_pendientes = {}
+        claves = list(pendientes)
+        for inicio in range(0, len(claves), MAX_LOTE):
+            grupo = claves[inicio:inicio + MAX_LOTE]
+            self.lotes += 1
+            try:
+                resultados = await self._en_pool(self._buscar_en_sesion, archivo, grupo)
+            except Exception as e:
+                for clave in grupo:
+                    pendientes[clave].set_exception(e)
+                continue
+            for clave in grupo:
+                pendientes[clave].set_result(resultados[clave])
+
+    @staticmethod
+    def _buscar_en_sesion(archivo: _ArchivoServido, claves: list) -> dict:
+        """Una clave: búsqueda normal (con sondeos); varias: buscar_muchos_por_empleado"""
+        with archivo.lock:
+            datos = archivo.sesion(time.monotonic())
+        # Las lecturas van sin el lock (ultimos_sondeos es por hilo)
+        if len(claves) == 1:
+            registro = datos.buscar_por_empleado(claves[0])
+            return {claves[0]: {'registro': registro_a_json(registro), 'sondeos': datos.ultimos_sondeos}}
+        encontrados = datos.buscar_muchos_por_empleado(claves)
+        return {clave: {'registro': registro_a_json(registro), 'sondeos': None}
+                for clave, registro in encontrados.items()}
+
+    @staticmethod
+    def _leer_en_sesion(archivo: _ArchivoServido, posicion: int) -> dict:
+        with archivo.lock:
+            datos = archivo.sesion(time.monotonic())
+        registro = datos.leer_por_posicion(posicion)
+        registro['posicion'] = posicion
+        return registro_a_json(registro)
+
+    @staticmethod
+    def _rango_en_sesion(archivo: _ArchivoServido, desde: int, hasta: int, limite: int) -> list:
+        with archivo.lock:
+            datos = archivo.sesion(time.monotonic())
+        registros = []
+        for registro in datos.rango_por_empleado(desde, hasta):
+            if len(registros) == limite:
+                break
+            registros.append(registro_a_json(registro))
+        return registros
+
+    @staticmethod
+    def _info_en_sesion(archivo: _ArchivoServido) -> dict:
+        with archivo.lock:
+            datos = archivo.sesion(time.monotonic())
+        return datos.obtener_info_archivo()
+
+    async def atender(self, pedido: dict):
+        """Resultado de un pedido (lanza ValueError si el pedido es inválido)"""
+        self.pedidos += 1
+        op = pedido.get('op')
+        archivo = self._archivo(pedido.get('archivo'))
+        if op == "buscar":
+            return await self._buscar(archivo, valor_entero(pedido['num_empleado'], 'num_empleado'))
+        if op == "leer":
+            posicion = valor_entero(pedido['posicion'], 'posicion')
+            return await self._una_vez(archivo, ("leer", posicion), self._leer_en_sesion, archivo, posicion)
+        if op == "rango":
+            desde, hasta = valor_entero(pedido['desde'], 'desde'), valor_entero(pedido['hasta'], 'hasta')
+            limite = min(valor_entero(pedido.get('limite', MAX_RANGO), 'limite'), MAX_RANGO)
+            return await self._una_vez(archivo, ("rango", desde, hasta, limite),
+                                       self._rango_en_sesion, archivo, desde, hasta, limite)
+        if op == "info":
+            return await self._una_vez(archivo, ("info",), self._info_en_sesion, archivo)
+        raise ValueError(f"Operación desconocida: {op}.")
+
+    async def _responder(self, pedido, escritor: asyncio.StreamWriter):
+        if not isinstance(pedido, dict):
+            escribir_mensaje(escritor, {'id': None, 'ok': False, 'error': "pedido inválido"})
+            return
+        id_pedido = pedido.get('id')
+        try:
+            respuesta = {'id': id_pedido, 'ok': True, 'resultado': await self.atender(pedido)}
+        except (ValueError, KeyError, TypeError, OSError) as e:
+            respuesta = {'id': id_pedido, 'ok': False, 'error': str(e)}
+        except Exception as e:
+            respuesta = {'id': id_pedido, 'ok': False, 'error': f"Error interno: {e}"}
+        escribir_mensaje(escritor, respuesta)
+
+    async def manejar_conexion(self, lector_stream: asyncio.StreamReader, escritor: asyncio.StreamWriter):
+        """Lee pedidos de una conexión y responde cada uno apenas está listo"""
+        tareas = set()
+        try:
+            while True:
+                cuerpo = await leer_cuerpo(lector_stream)
+                if cuerpo is None:
+                    break
+                try:
+                    pedido = json.loads(cuerpo)
+                except ValueError as e:
+                    # El mensaje llegó completo: se responde el error y la conexión sigue
+                    escribir_mensaje(escritor, {'id': None, 'ok': False, 'error': f"JSON inválido: {e}"})
+                    continue
+                tarea = asyncio.ensure_future(self._responder(pedido, escritor))
+                tareas.add(tarea)
+                tarea.add_done_callback(tareas.discard)
+            if tareas:
+                await asyncio.gather(*tareas)
+            await escritor.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass  # el cliente cortó la conexión o el largo del mensaje es inválido
+        finally:
+            escritor.close()
+
+    def cerrar(self):
+        """Cierra las sesiones abiertas y el pool de hilos"""
+        self._pool.shutdown(wait=True)
+        for archivo in self._archivos.values():
+            if archivo.datos is not None:
+                archivo.datos.cerrar()
+
+
+async def leer_cuerpo(stream: asyncio.StreamReader) -> bytes or None:
+    """
+    Lee el cuerpo de un mensaje (largo + JSON) sin decodificarlo; None si la
+    conexión terminó. Lanza ValueError si el largo supera MAX_MENSAJE.
+    """
+    try:
+        cabecera = await stream.readexactly(LARGO_STRUCT.size)
+    except asyncio.IncompleteReadError as e:
+        if e.partial:
+            raise
+        return None
+    (largo,) = LARGO_STRUCT.unpack(cabecera)
+    if largo > MAX_MENSAJE:
+        raise ValueError(f"Mensaje demasiado grande: {largo} bytes.")
+    return await stream.readexactly(largo)
+
+
+def escribir_mensaje(escritor: asyncio.StreamWriter, datos: dict):
+    """Escribe un mensaje (largo + JSON)"""
+    cuerpo = json.dumps(datos, ensure_ascii=False).encode("utf-8")
+    escritor.write(LARGO_STRUCT.pack(len(cuerpo)) + cuerpo)
+
+
+async def servir(archivos, socket_unix: str = None, host: str = HOST, puerto: int = PUERTO,
+                 hilos: int = HILOS, listo=None):
+    """
+    Abre los archivos y atiende pedidos hasta que se cancela la tarea.
+    'listo' es una función opcional que se llama con el servidor ya escuchando.
+    """
+    servidor = ServidorEmpleados(archivos, hilos)
+    for archivo in servidor._archivos.values():
+        archivo.sesion(time.monotonic())  # falla aquí si algún archivo no se puede abrir
+    if socket_unix:
+        if os.path.exists(socket_unix):
+            os.remove(socket_unix)
+        escucha = await asyncio.start_unix_server(servidor.manejar_conexion, path=socket_unix)
+    else:
+        escucha = await asyncio.start_server(servidor.manejar_conexion, host=host, port=puerto)
+    if listo is not None:
+        listo(servidor)
+    try:
+        async with escucha:
+            await escucha.serve_forever()
+    finally:
+        servidor.cerrar()
+        if socket_unix and os.path.exists(socket_unix):
+            os.remove(socket_unix)
+
+
+def main():
+    """Punto de entrada del servidor"""
+    parser = argparse.ArgumentParser(description="Servidor local de búsquedas de empleados")
+    parser.add_argument("archivos", nargs="+", help="archivos .bin a servir")
+    parser.add_argument("--socket", help="ruta del socket Unix (si no, TCP en localhost)")
+    parser.add_argument("--puerto", type=int, default=PUERTO, help="puerto TCP en 127.0.0.1")
+    parser.add_argument("--hilos", type=int, default=HILOS, help="hilos para las lecturas")
+    args = parser.parse_args()
+
+    donde = args.socket or f"{HOST}:{args.puerto}"
+    print(f"Sirviendo {', '.join(args.archivos)} en {donde} (Ctrl+C para terminar)")
+    try:
+        asyncio.run(servir(args.archivos, args.socket, HOST, args.puerto, args.hilos))
+    except KeyboardInterrupt:
+        print("\nServidor detenido.")
+
+
+if __name__ == "__main__":
+    main()